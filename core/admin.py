@@ -1,9 +1,14 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from . import busca, estatisticas, recalculo
+from .admin_fatos import (
+    ExclusaoFato, FatoAdmin, FiltroAnoDesempenho, FiltroAnoHabilidade,
+    FiltroDisciplina, FiltroEsfera, FiltroSerie,
+)
 from .models import (
     Localidade, Escola, Disciplina, Serie,
     DesempenhoEscola, MetaMunicipal, EvolucaoEscola,
     DesempenhoEsfera, Esfera,
-    Hab, ResultHab, ResultadoHabEscola
+    Hab, ResultadoHabEscola, EstatisticaHabilidade
 )
 
 # ---------------------------
@@ -18,11 +23,18 @@ class LocalidadeAdmin(admin.ModelAdmin):
 @admin.register(Escola)
 class EscolaAdmin(admin.ModelAdmin):
     list_display = ('nome', 'inep', 'localidade')
-    search_fields = ('nome', 'inep')
+    search_fields = ('nome', 'inep', 'bairrodistrito', 'gestor')
     list_filter = ('localidade',)
     autocomplete_fields = ['localidade']
     list_per_page = 50
 
+    def get_search_results(self, request, queryset, search_term):
+        # Índice de trigramas sem acentos (core/busca.py) no lugar de icontains
+        if len(search_term.strip()) < busca.TAMANHO_MINIMO:
+            return super().get_search_results(request, queryset, search_term)
+        ids = [e['id'] for e in busca.buscar(search_term, limite=None, alias=queryset.db)]
+        return queryset.filter(id__in=ids), False
+
 
 @admin.register(Disciplina)
 class DisciplinaAdmin(admin.ModelAdmin):
@@ -38,18 +50,48 @@ class SerieAdmin(admin.ModelAdmin):
 class EsferaAdmin(admin.ModelAdmin):
     search_fields = ('nome',)
 
+# ---------------------------
+# RECÁLCULO DOS CAMPOS DERIVADOS
+# ---------------------------
+
+def _recalcular(modeladmin, request, queryset):
+    try:
+        r = recalculo.recalcular(queryset)
+    except RuntimeError as erro:
+        modeladmin.message_user(request, str(erro), messages.ERROR)
+        return
+    etapas = ', '.join(f'{etapa}: {e["linhas"]}' for etapa, e in r['etapas'].items())
+    modeladmin.message_user(
+        request,
+        f'{r["linhas"]} linha(s) alterada(s) em {r["segundos"]:.2f}s '
+        f'(anos {", ".join(map(str, r["anos"]))}; {etapas})',
+        messages.SUCCESS,
+    )
+
+
+@admin.action(description='Recalcular campos derivados das linhas selecionadas')
+def recalcular_selecionados(modeladmin, request, queryset):
+    _recalcular(modeladmin, request, queryset)
+
+
+@admin.action(description='Recalcular campos derivados dos anos selecionados (todas as linhas)')
+def recalcular_anos(modeladmin, request, queryset):
+    anos = list(queryset.order_by().values_list('ano', flat=True).distinct())
+    _recalcular(modeladmin, request, queryset.model.objects.filter(ano__in=anos))
+
+
 # ---------------------------
 # DESEMPENHO ESCOLA
 # ---------------------------
 
 @admin.register(DesempenhoEscola)
-class DesempenhoEscolaAdmin(admin.ModelAdmin):
+class DesempenhoEscolaAdmin(FatoAdmin):
     list_display = ('escola', 'ano', 'disciplina', 'serie', 'proficiencia_media')
-    list_filter = ('ano', 'disciplina', 'serie')
+    list_filter = (FiltroAnoDesempenho, FiltroDisciplina, FiltroSerie)
     search_fields = ('escola__nome',)
     autocomplete_fields = ['escola', 'disciplina', 'serie']
     list_select_related = ('escola', 'disciplina', 'serie')
-    list_per_page = 50
+    actions = [recalcular_selecionados, recalcular_anos]
 
 
 @admin.register(MetaMunicipal)
@@ -67,11 +109,12 @@ class EvolucaoEscolaAdmin(admin.ModelAdmin):
 
 
 @admin.register(DesempenhoEsfera)
-class DesempenhoEsferaAdmin(admin.ModelAdmin):
+class DesempenhoEsferaAdmin(ExclusaoFato, admin.ModelAdmin):
     list_display = ('esfera', 'ano', 'disciplina', 'serie', 'proficiencia_media')
     list_filter = ('ano', 'disciplina', 'serie')
     autocomplete_fields = ['esfera', 'disciplina', 'serie']
     list_select_related = ('esfera', 'disciplina', 'serie')
+    actions = [recalcular_selecionados, recalcular_anos]
 
 # ---------------------------
 # HABILIDADES
@@ -80,57 +123,79 @@ class DesempenhoEsferaAdmin(admin.ModelAdmin):
 @admin.register(Hab)
 class HabAdmin(admin.ModelAdmin):
     list_display = ('cd_hab', 'dc_hab', 'serie', 'disciplina')
-    search_fields = ('cd_hab',)
+    search_fields = ('cd_hab', 'dc_hab')
     list_filter = ('serie', 'disciplina')
     ordering = ('disciplina', 'serie', 'cd_hab')
     list_per_page = 50
 
-# ---------------------------
-# RESULTADO POR HABILIDADE (ESFERA)
-# ---------------------------
-
-@admin.register(ResultHab)
-class ResultHabAdmin(admin.ModelAdmin):
-    list_display = ('ano', 'esfera', 'get_cd_hab', 'tx_acerto')
-    list_filter = ('ano', 'esfera')
-    search_fields = ('hab__cd_hab',)
-    autocomplete_fields = ['hab']
-    list_select_related = ('hab', 'esfera')
-    list_per_page = 50
-
-    def get_cd_hab(self, obj):
-        return obj.hab.cd_hab
-    get_cd_hab.short_description = 'Código'
+    def get_search_results(self, request, queryset, search_term):
+        # Código exato ou busca textual em português na descrição (core/busca.py)
+        if len(search_term.strip()) < busca.TAMANHO_MINIMO:
+            return super().get_search_results(request, queryset, search_term)
+        ids = [h['id'] for h in busca.buscar_habilidades(search_term, limite=None, alias=queryset.db)]
+        return queryset.filter(id__in=ids), False
 
 # ---------------------------
-# RESULTADO POR HABILIDADE (ESCOLA)
+# RESULTADO POR HABILIDADE (ESCOLA E ESFERA)
 # ---------------------------
 
 @admin.register(ResultadoHabEscola)
-class ResultadoHabEscolaAdmin(admin.ModelAdmin):
+class ResultadoHabEscolaAdmin(FatoAdmin):
     list_display = (
         'ano',
+        'nivel',
         'escola',
+        'esfera',
         'get_cd_hab',
-        'tx_acerto'
+        'get_tx_acerto'
     )
 
     list_filter = (
-        'ano',
-        'disciplina',
+        FiltroAnoHabilidade,
+        'nivel',
+        FiltroEsfera,
+        FiltroDisciplina,
     )
 
+    # Nome/INEP da escola (trigramas) ou código exato da habilidade
     search_fields = (
         'escola__nome',
         'hab__cd_hab',
     )
+    busca_habilidade = True
 
-    autocomplete_fields = ['hab']  # escola removido (performance)
+    autocomplete_fields = ['hab', 'escola']
 
-    list_select_related = ('escola', 'hab')
+    list_select_related = ('escola', 'esfera', 'hab')
 
-    list_per_page = 50
+    def delete_queryset(self, request, queryset):
+        # Sem post_delete em ResultadoHabEscola: as estatísticas das
+        # habilidades excluídas são recalculadas aqui
+        grupos = estatisticas.grupos_de(queryset)
+        super().delete_queryset(request, queryset)
+        estatisticas.agendar_grupos(grupos, queryset.db)
 
     def get_cd_hab(self, obj):
         return obj.hab.cd_hab
-    get_cd_hab.short_description = 'Código'
\ No newline at end of file
+    get_cd_hab.short_description = 'Código'
+
+    def get_tx_acerto(self, obj):
+        return obj.percentual
+    get_tx_acerto.short_description = 'Taxa de Acerto (%)'
+
+
+# ---------------------------
+# ESTATÍSTICAS PRÉ-AGREGADAS
+# ---------------------------
+
+@admin.register(EstatisticaHabilidade)
+class EstatisticaHabilidadeAdmin(admin.ModelAdmin):
+    list_display = (
+        'ano', 'serie', 'disciplina', 'hab', 'nivel', 'localidade',
+        'media', 'mediana', 'total_escolas', 'escolas_abaixo_50',
+    )
+    list_filter = ('ano', 'serie', 'disciplina', 'nivel')
+    search_fields = ('hab__cd_hab',)
+    list_select_related = ('serie', 'disciplina', 'hab', 'localidade')
+    readonly_fields = ('histograma', 'data_atualizacao')
+    list_per_page = 50
@@ -0,0 +1,269 @@
+"""
+Admin das tabelas fato (DesempenhoEscola, ResultadoHabEscola) com milhões
+de linhas.
+
+O ModelAdmin padrão custa, a cada página da lista:
+- um COUNT(*) exato (duas vezes, com show_full_result_count);
+- SELECT DISTINCT ano/disciplina na tabela fato para montar os filtros;
+- OFFSET proporcional ao número da página;
+- busca com icontains em joins (escola__nome).
+
+Aqui a contagem é estimada pelo planejador (pg_class.reltuples sem filtro,
+EXPLAIN com filtro) e só é exata quando pequena; a lista anda por cursor
+(`?antes=<id>` / `?depois=<id>`, ordem de id decrescente, sem OFFSET); as
+opções dos filtros vêm do cache de dimensões (core/dimensoes.py); e a busca
+resolve escolas pelo índice de trigramas (core/busca.py) e habilidades pelo
+código antes de filtrar a tabela fato por id. As exclusões invalidam o cache
+de dimensões só das escolas afetadas (ExclusaoFato).
+"""
+import json
+
+from django.contrib import admin
+from django.contrib.admin.views.main import PAGE_VAR, ChangeList
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from . import busca, dimensoes
+
+
+CURSOR_ANTES = 'antes'
+CURSOR_DEPOIS = 'depois'
+# Abaixo disso o COUNT(*) exato é barato e a lista mostra o número real
+LIMITE_CONTAGEM_EXATA = 10_000
+
+
+# ============================================================
+# CONTAGEM ESTIMADA
+# ============================================================
+
+def contagem_estimada(queryset):
+    """
+    Número aproximado de linhas do queryset segundo as estatísticas do
+    PostgreSQL (None fora do PostgreSQL ou sem estatísticas).
+    """
+    conexao = connections[queryset.db]
+    if conexao.vendor != 'postgresql':
+        return None
+    with conexao.cursor() as cursor:
+        if not queryset.query.where:
+            # Soma das folhas: a tabela pai particionada não tem reltuples
+            cursor.execute(
+                """
+                SELECT SUM(GREATEST(c.reltuples, 0))::bigint
+                FROM pg_partition_tree(%s::regclass) t
+                JOIN pg_class c ON c.oid = t.relid
+                WHERE t.isleaf
+                """,
+                [queryset.model._meta.db_table],
+            )
+            estimativa = cursor.fetchone()[0]
+            return estimativa or None
+        sql, params = queryset.order_by().values('pk').query.sql_with_params()
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plano = cursor.fetchone()[0]
+        if isinstance(plano, str):
+            plano = json.loads(plano)
+        return int(plano[0]['Plan']['Plan Rows'])
+
+
+class PaginadorEstimado(Paginator):
+    """Paginator cujo `count` é a estimativa do planejador quando ela é grande."""
+    estimado = False
+
+    @cached_property
+    def count(self):
+        estimativa = contagem_estimada(self.object_list)
+        if estimativa is None or estimativa < LIMITE_CONTAGEM_EXATA:
+            return self.object_list.count()
+        self.estimado = True
+        return estimativa
+
+
+# ============================================================
+# LISTA POR CURSOR
+# ============================================================
+
+class ChangeListCursor(ChangeList):
+    """
+    Lista ordenada por id decrescente que pagina por cursor: a próxima
+    página são as linhas com id menor que o último exibido, lidas pelo
+    índice da chave primária, seja qual for a profundidade.
+    """
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        for nome in (CURSOR_ANTES, CURSOR_DEPOIS):
+            lookup_params.pop(nome, None)
+        return lookup_params
+
+    def get_results(self, request):
+        # Mesmos atributos do ChangeList.get_results, mas sem a página do
+        # Paginator (OFFSET): só a consulta por cursor de _pagina vai ao banco
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        self.result_count = paginator.count
+        self.show_full_result_count = self.model_admin.show_full_result_count
+        self.full_result_count = self.root_queryset.count() if self.show_full_result_count else None
+        self.show_admin_actions = not self.show_full_result_count or bool(self.full_result_count)
+        self.can_show_all = self.result_count <= self.list_max_show_all
+        self.multi_page = self.result_count > self.list_per_page
+        self.paginator = paginator
+
+        self.cursor_anterior = self.cursor_proximo = None
+        if self.multi_page and not (self.show_all and self.can_show_all):
+            self.result_list = self._pagina(request.GET.get(CURSOR_ANTES), request.GET.get(CURSOR_DEPOIS))
+        else:
+            self.result_list = self.queryset._clone()
+
+        remover = [CURSOR_ANTES, CURSOR_DEPOIS, PAGE_VAR]
+        self.url_primeira = self.get_query_string(remove=remover)
+        self.url_anterior = self.url_proxima = None
+        if self.cursor_anterior is not None:
+            self.url_anterior = self.get_query_string({CURSOR_DEPOIS: self.cursor_anterior}, remover)
+        if self.cursor_proximo is not None:
+            self.url_proxima = self.get_query_string({CURSOR_ANTES: self.cursor_proximo}, remover)
+
+    def _pagina(self, antes, depois):
+        por_pagina = self.list_per_page
+        if depois and depois.isdigit():
+            # Página anterior: as `por_pagina` linhas logo acima do cursor
+            linhas = list(self.queryset.filter(pk__gt=depois).order_by('pk')[:por_pagina + 1])
+            ha_anteriores = len(linhas) > por_pagina
+            linhas = linhas[:por_pagina][::-1]
+            if linhas:
+                self.cursor_anterior = linhas[0].pk if ha_anteriores else None
+                self.cursor_proximo = linhas[-1].pk
+            return linhas
+
+        queryset = self.queryset.order_by('-pk')
+        if antes and antes.isdigit():
+            queryset = queryset.filter(pk__lt=antes)
+        linhas = list(queryset[:por_pagina + 1])
+        ha_proximas = len(linhas) > por_pagina
+        linhas = linhas[:por_pagina]
+        if linhas:
+            self.cursor_anterior = linhas[0].pk if antes else None
+            self.cursor_proximo = linhas[-1].pk if ha_proximas else None
+        return linhas
+
+
+# ============================================================
+# FILTROS PELO CACHE DE DIMENSÕES
+# ============================================================
+
+class FiltroDimensao(admin.SimpleListFilter):
+    """Filtro cujas opções vêm de core/dimensoes (nenhum SELECT DISTINCT na tabela fato)."""
+    campo = None
+
+    def opcoes(self):
+        raise NotImplementedError
+
+    def lookups(self, request, model_admin):
+        return self.opcoes()
+
+    def queryset(self, request, queryset):
+        valor = self.value()
+        if valor and valor.isdigit():
+            return queryset.filter(**{self.campo: int(valor)})
+        return queryset
+
+
+class FiltroAnoDesempenho(FiltroDimensao):
+    title = 'ano'
+    parameter_name = campo = 'ano'
+
+    def opcoes(self):
+        return [(ano, ano) for ano in dimensoes.anos_desempenho()]
+
+
+class FiltroAnoHabilidade(FiltroDimensao):
+    title = 'ano'
+    parameter_name = campo = 'ano'
+
+    def opcoes(self):
+        return [(ano, ano) for ano in dimensoes.anos_habilidades()]
+
+
+class FiltroSerie(FiltroDimensao):
+    title = 'série/ano'
+    parameter_name = 'serie'
+    campo = 'serie_id'
+
+    def opcoes(self):
+        return [(s.id, s.nome) for s in dimensoes.series()]
+
+
+class FiltroDisciplina(FiltroDimensao):
+    title = 'disciplina'
+    parameter_name = 'disciplina'
+    campo = 'disciplina_id'
+
+    def opcoes(self):
+        return [(d.id, d.nome) for d in dimensoes.disciplinas()]
+
+
+class FiltroEsfera(FiltroDimensao):
+    title = 'esfera'
+    parameter_name = 'esfera'
+    campo = 'esfera_id'
+
+    def opcoes(self):
+        return [(e.id, e.nome) for e in dimensoes.esferas()]
+
+
+# ============================================================
+# EXCLUSÕES
+# ============================================================
+
+class ExclusaoFato:
+    """
+    Mixin de ModelAdmin das tabelas fato: invalida o cache de dimensões das
+    escolas das linhas excluídas. As tabelas fato não têm receivers de
+    post_delete (ver core/dimensoes.py) para não desligar o fast-delete.
+    """
+
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, type(obj)._default_manager.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        queryset = queryset.order_by()
+        tem_escola = any(f.name == 'escola' for f in queryset.model._meta.fields)
+        escolas = set(queryset.values_list('escola_id', flat=True).distinct()) if tem_escola else {None}
+        super().delete_queryset(request, queryset)
+        if None in escolas:
+            # Linhas de esfera: invalidação global
+            transaction.on_commit(dimensoes.invalidar, using=queryset.db)
+        elif escolas:
+            transaction.on_commit(lambda: dimensoes.invalidar(escolas=escolas), using=queryset.db)
+
+
+# ============================================================
+# MODELADMIN BASE
+# ============================================================
+
+class FatoAdmin(ExclusaoFato, admin.ModelAdmin):
+    """
+    Base dos admins das tabelas fato. A busca aceita nome/INEP de escola
+    (índice de trigramas) e, com `busca_habilidade`, o código da habilidade.
+    """
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+    sortable_by = ()
+    ordering = ('-id',)
+    list_per_page = 50
+    busca_habilidade = False
+
+    def get_changelist(self, request, **kwargs):
+        return ChangeListCursor
+
+    def get_search_results(self, request, queryset, search_term):
+        termo = search_term.strip()
+        if not termo:
+            return queryset, False
+        escolas = [e['id'] for e in busca.buscar(termo, busca.LIMITE_MAXIMO, alias=queryset.db)]
+        filtro = Q(escola_id__in=escolas)
+        if self.busca_habilidade:
+            from .models import Hab
+            filtro |= Q(hab_id__in=Hab.objects.using(queryset.db).filter(cd_hab__iexact=termo).values('id'))
+        return queryset.filter(filtro), False
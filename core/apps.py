@@ -0,0 +1,29 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save, pre_delete
+
+
+class CoreConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'core'
+
+    def ready(self):
+        from . import dimensoes, estatisticas
+        from .models import Escola, ResultadoHabEscola
+
+        # Gravações nas dimensões invalidam todo o cache de dimensões
+        for nome in dimensoes.MODELOS_DIMENSAO:
+            model = self.get_model(nome)
+            post_save.connect(dimensoes.invalidar_dimensao, sender=model, dispatch_uid=f'invalidar_save_{nome}')
+            post_delete.connect(dimensoes.invalidar_dimensao, sender=model, dispatch_uid=f'invalidar_delete_{nome}')
+
+        # Nas tabelas fato, só a versão da escola da linha. Sem post_delete:
+        # as cascatas continuam em fast-delete (o admin invalida ao excluir)
+        for nome in dimensoes.MODELOS_FATO:
+            post_save.connect(
+                dimensoes.invalidar_fato, sender=self.get_model(nome), dispatch_uid=f'invalidar_save_{nome}'
+            )
+
+        # Edições avulsas de resultados mantêm EstatisticaHabilidade em dia
+        # (só as habilidades tocadas; exclusões pelo admin em ResultadoHabEscolaAdmin)
+        post_save.connect(estatisticas.agendar, sender=ResultadoHabEscola, dispatch_uid='estatisticas_save')
+        pre_delete.connect(estatisticas.agendar_escola, sender=Escola, dispatch_uid='estatisticas_escola')
@@ -0,0 +1,225 @@
+"""
+Busca de escolas (nome, INEP, bairro/distrito e gestor) e de habilidades
+(texto completo da descrição BNCC em `Hab.dc_hab`).
+
+No PostgreSQL a busca usa um índice GIN de trigramas (pg_trgm) sobre os
+quatro campos concatenados, sem acentos e em minúsculas pela função
+imutável `core_sem_acento` (unaccent não é IMMUTABLE e não entra direto
+em índice). Tudo isso é criado pela migração 0015, que falha se as
+extensões não puderem ser criadas; em outro banco (como uma cópia SQLite),
+ou sem o índice, a busca usa um índice em memória por processo, refeito
+quando a versão de dados (core/dimensoes.py) muda.
+
+O resultado é uma lista curta de dicionários, pensada para o typeahead
+(`buscar_escolas`) no lugar dos <select> com todas as escolas.
+
+As habilidades usam busca textual do PostgreSQL: configuração
+`core_portugues` (stemming do português e, com a extensão, sem acentos),
+índice GIN sobre o tsvector da descrição (migração 0016) e ordenação por
+ts_rank. "frações" encontra "fração" e "inferir informação" encontra
+"inferir informações implícitas". Em outro banco, todas as palavras com
+icontains, sem ordenação por relevância.
+"""
+import re
+import unicodedata
+
+from django.db import connections
+
+from . import dimensoes
+
+
+LIMITE_PADRAO = 10
+LIMITE_MAXIMO = 50
+TAMANHO_MINIMO = 2
+
+FUNCAO = 'core_sem_acento'
+INDICE = 'core_escola_busca_trgm'
+CONFIG_HAB = 'core_portugues'
+INDICE_HAB = 'core_hab_dc_hab_fts'
+CODIGO_HAB = re.compile(r'^[A-Za-z]{2}\d{2}[A-Za-z]{2}\d+$')
+CAMPOS = ('nome', 'inep', 'bairrodistrito', 'gestor')
+
+
+def expressao(prefixo=''):
+    """Texto indexado: os campos concatenados, sem acentos e em minúsculas."""
+    concatenados = " || ' ' || ".join(prefixo + campo for campo in CAMPOS)
+    return f'{FUNCAO}({concatenados})'
+
+
+EXPRESSAO = expressao('e.')
+
+# (alias, índice) -> se o banco tem o índice de busca
+_suporte = {}
+
+# (versão de dados, [(texto normalizado, palavras, dicionário da escola)])
+_indice = (None, [])
+
+
+def normalizar(texto):
+    """Minúsculas e sem acentos, como `core_sem_acento` no PostgreSQL."""
+    decomposto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in decomposto if not unicodedata.combining(c)).lower()
+
+
+# ============================================================
+# ESTRUTURA NO POSTGRESQL (criada pelas migrações 0015 e 0016)
+# ============================================================
+
+def tem_suporte(alias, indice=INDICE):
+    if (alias, indice) not in _suporte:
+        conexao = connections[alias]
+        if conexao.vendor != 'postgresql':
+            _suporte[alias, indice] = False
+        else:
+            with conexao.cursor() as cursor:
+                cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [indice])
+                _suporte[alias, indice] = cursor.fetchone()[0]
+    return _suporte[alias, indice]
+
+
+# ============================================================
+# BUSCA DE ESCOLAS
+# ============================================================
+
+def _buscar_sql(alias, termo, limite):
+    # <% (word similarity) e LIKE usam o índice GIN de trigramas; a
+    # normalização do termo é constante e calculada uma vez no planejamento
+    sql = f"""
+        SELECT e.id, e.nome, e.inep, e.bairrodistrito, l.nome,
+               word_similarity({FUNCAO}(%(termo)s), {EXPRESSAO}) AS similaridade
+        FROM core_escola e
+        JOIN core_localidade l ON l.id = e.localidade_id
+        WHERE {FUNCAO}(%(termo)s) <%% {EXPRESSAO}
+           OR {EXPRESSAO} LIKE '%%' || {FUNCAO}(%(termo)s) || '%%'
+        ORDER BY e.inep = %(termo)s DESC, similaridade DESC, e.nome
+        LIMIT %(limite)s
+    """
+    with connections[alias].cursor() as cursor:
+        cursor.execute(sql, {'termo': termo, 'limite': limite})
+        return [
+            {'id': id, 'nome': nome, 'inep': inep, 'bairro': bairro, 'localidade': localidade}
+            for id, nome, inep, bairro, localidade, _ in cursor.fetchall()
+        ]
+
+
+def _indice_memoria():
+    global _indice
+    versao = dimensoes.versao_dados()
+    if _indice[0] != versao:
+        from .models import Escola
+        linhas = []
+        for id, nome, inep, bairro, gestor, localidade in (
+            Escola.objects.order_by('nome')
+            .values_list('id', 'nome', 'inep', 'bairrodistrito', 'gestor', 'localidade__nome')
+        ):
+            texto = normalizar(f'{nome} {inep} {bairro} {gestor}')
+            escola = {'id': id, 'nome': nome, 'inep': inep, 'bairro': bairro, 'localidade': localidade}
+            linhas.append((texto, texto.split(), escola))
+        _indice = (versao, linhas)
+    return _indice[1]
+
+
+def _buscar_memoria(termo, limite):
+    """Todas as palavras do termo no texto; palavras que começam pelo termo valem mais."""
+    palavras = normalizar(termo).split()
+    encontradas = []
+    for texto, palavras_escola, escola in _indice_memoria():
+        if not all(p in texto for p in palavras):
+            continue
+        pontos = sum(2 if any(w.startswith(p) for w in palavras_escola) else 1 for p in palavras)
+        encontradas.append((escola['inep'] != termo, -pontos, escola['nome'], escola))
+    encontradas.sort(key=lambda e: e[:3])
+    return [escola for *_, escola in encontradas[:limite]]
+
+
+def buscar(termo, limite=LIMITE_PADRAO, alias=None):
+    """Escolas mais parecidas com `termo` (no máximo `limite`; None = todas)."""
+    termo = (termo or '').strip()
+    if len(termo) < TAMANHO_MINIMO:
+        return []
+    if alias is None:
+        from .roteadores import banco_leitura
+        alias = banco_leitura()
+    if tem_suporte(alias):
+        return _buscar_sql(alias, termo, limite)
+    return _buscar_memoria(termo, limite)
+
+
+# ============================================================
+# BUSCA DE HABILIDADES
+# ============================================================
+
+def _ultima_estatistica_rede(hab_ids):
+    """{hab_id: EstatisticaHabilidade da rede no ano mais recente}."""
+    from .models import EstatisticaHabilidade
+    ultimas = {}
+    for estatistica in (
+        EstatisticaHabilidade.objects
+        .filter(hab_id__in=hab_ids, nivel=EstatisticaHabilidade.NIVEL_REDE)
+        .only('hab_id', 'ano', 'media', 'total_escolas', 'escolas_abaixo_50')
+        .order_by('hab_id', '-ano')
+    ):
+        ultimas.setdefault(estatistica.hab_id, estatistica)
+    return ultimas
+
+
+def buscar_habilidades(termo, serie=None, disciplina=None, limite=LIMITE_PADRAO, alias=None):
+    """
+    Habilidades cuja descrição casa com `termo` (sintaxe de buscador:
+    "entre aspas", -excluir, OR), mais relevantes primeiro, com a média
+    de acerto da rede no ano mais recente. Um código (EF05MA03) busca por
+    cd_hab.
+    """
+    from .models import Hab
+
+    termo = (termo or '').strip()
+    if len(termo) < TAMANHO_MINIMO:
+        return []
+    if alias is None:
+        from .roteadores import banco_leitura
+        alias = banco_leitura()
+
+    habs = Hab.objects.using(alias).select_related('serie', 'disciplina')
+    if serie:
+        habs = habs.filter(serie_id=serie)
+    if disciplina:
+        habs = habs.filter(disciplina_id=disciplina)
+
+    if CODIGO_HAB.match(termo):
+        habs = habs.filter(cd_hab__iexact=termo).order_by('serie__nome', 'disciplina__nome')
+    elif tem_suporte(alias, INDICE_HAB):
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+        # documento = consulta vira `to_tsvector(...) @@ websearch_to_tsquery(...)`,
+        # a mesma expressão do índice GIN
+        documento = SearchVector('dc_hab', config=CONFIG_HAB)
+        consulta = SearchQuery(termo, config=CONFIG_HAB, search_type='websearch')
+        habs = (
+            habs.annotate(documento=documento, relevancia=SearchRank(documento, consulta))
+            .filter(documento=consulta)
+            .order_by('-relevancia', 'cd_hab')
+        )
+    else:
+        for palavra in termo.split():
+            habs = habs.filter(dc_hab__icontains=palavra)
+        habs = habs.order_by('cd_hab')
+
+    habs = list(habs[:limite])
+    estatisticas = _ultima_estatistica_rede([h.id for h in habs])
+    resultados = []
+    for h in habs:
+        estatistica = estatisticas.get(h.id)
+        resultados.append({
+            'id': h.id,
+            'cd_hab': h.cd_hab,
+            'dc_hab': h.dc_hab,
+            'serie_id': h.serie_id,
+            'serie': h.serie.nome,
+            'disciplina_id': h.disciplina_id,
+            'disciplina': h.disciplina.nome,
+            'relevancia': round(getattr(h, 'relevancia', 0) or 0, 4),
+            'ano': estatistica.ano if estatistica else None,
+            'tx_acerto_rede': float(estatistica.media) if estatistica else None,
+            'total_escolas': estatistica.total_escolas if estatistica else None,
+            'escolas_abaixo_50': estatistica.escolas_abaixo_50 if estatistica else None,
+        })
+    return resultados
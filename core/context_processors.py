@@ -0,0 +1,18 @@
+"""
+Variáveis disponíveis em todos os templates.
+
+`versao_dados` e `tempo_cache` montam as chaves dos fragmentos
+`{% cache %}`: qualquer gravação nos modelos (ou importação) muda a versão
+e os fragmentos antigos deixam de ser usados.
+"""
+from django.utils.functional import SimpleLazyObject
+
+from . import dimensoes
+
+
+def cache_fragmentos(request):
+    return {
+        # Só consulta o cache se o template usar a variável
+        'versao_dados': SimpleLazyObject(dimensoes.versao_dados),
+        'tempo_cache': dimensoes.TEMPO_CACHE,
+    }
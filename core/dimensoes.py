@@ -0,0 +1,200 @@
+"""
+Cache das dimensões usadas nos filtros dos painéis (anos, séries,
+disciplinas...).
+
+Os valores ficam no cache do Django sob uma "versão de dados" que é
+incrementada sempre que uma dimensão (MODELOS_DIMENSAO) é gravada ou
+removida (ver CoreConfig.ready). Assim os filtros deixam de custar uma
+query por página e nunca ficam desatualizados após uma importação ou edição
+no admin.
+
+Gravações nas tabelas fato só mudam a versão das escolas das linhas
+(invalidar_fato); a versão global só muda quando a linha traz um ano novo
+ou não pertence a uma escola. Os boletins publicados seguem versao_escola,
+que não inclui a versão global. As tabelas fato não têm receivers de
+post_delete, que desligariam o fast-delete das exclusões em cascata: o
+admin invalida ao excluir (admin_fatos.ExclusaoFato).
+"""
+import time
+
+from django.core.cache import cache
+
+
+CHAVE_VERSAO = 'sabe:versao_dados'
+# Versão do que entra em todos os boletins (catálogo e localidades); a
+# versão global não entra em versao_escola
+CHAVE_BOLETINS = 'sabe:versao_boletins'
+TEMPO_CACHE = 60 * 15
+
+# Ligados em CoreConfig.ready: dimensões invalidam tudo, fatos só a escola
+MODELOS_DIMENSAO = ('Escola', 'Localidade', 'Serie', 'Disciplina', 'Esfera', 'Hab')
+MODELOS_FATO = ('DesempenhoEscola', 'ResultadoHabEscola', 'DesempenhoEsfera')
+# Dimensões que aparecem em todos os boletins (ver publicacao.impressoes_digitais)
+MODELOS_BOLETIM = ('Localidade', 'Serie', 'Disciplina')
+
+
+def _versao_inicial():
+    # Derivada do relógio: se o cache for limpo, a contagem recomeça acima de
+    # qualquer versão já usada (boletins publicados não voltam a parecer atuais)
+    return time.time_ns() // 1000
+
+
+def _versao(chave):
+    versao = cache.get(chave)
+    if versao is None:
+        inicial = _versao_inicial()
+        cache.add(chave, inicial, None)
+        versao = cache.get(chave, inicial)
+    return versao
+
+
+def versao_dados():
+    """Versão atual dos dados; muda a cada gravação nas dimensões ou importação."""
+    return _versao(CHAVE_VERSAO)
+
+
+def versao_escola(escola_id):
+    """
+    Versão do boletim de uma escola: a versão dos insumos comuns a todos os
+    boletins (CHAVE_BOLETINS) mais um contador da escola, incrementado por
+    invalidar(escolas=...). Não depende da versão global: uma gravação em
+    outra escola, em habilidades ou em esferas não desatualiza o boletim.
+    """
+    return f'{_versao(CHAVE_BOLETINS)}.{_versao(f"{CHAVE_VERSAO}:escola:{escola_id}")}'
+
+
+def _incrementar(chave):
+    try:
+        cache.incr(chave)
+    except ValueError:
+        cache.set(chave, _versao_inicial(), None)
+
+
+def invalidar(escolas=None, boletins=False, **kwargs):
+    """
+    Incrementa a versão de dados (aceita ser usado como receiver de signal).
+    Com `escolas`, só a versão dessas escolas muda (versao_escola): serve
+    para gravações que alteram os resultados das escolas mas nenhuma dimensão.
+    Com `boletins`, muda também a versão de todos os boletins.
+    """
+    if escolas is not None:
+        for escola_id in escolas:
+            _incrementar(f'{CHAVE_VERSAO}:escola:{escola_id}')
+        return
+    _incrementar(CHAVE_VERSAO)
+    if boletins:
+        _incrementar(CHAVE_BOLETINS)
+
+
+def invalidar_dimensao(sender, instance, **kwargs):
+    """
+    Receiver de post_save/post_delete das dimensões: versão global e, se a
+    dimensão entra no boletim, a versão da escola (Escola) ou de todos os
+    boletins (MODELOS_BOLETIM).
+    """
+    if sender.__name__ == 'Escola':
+        invalidar(escolas=[instance.pk])
+    invalidar(boletins=sender.__name__ in MODELOS_BOLETIM)
+
+
+def invalidar_fato(sender, instance, created=False, **kwargs):
+    """
+    Receiver de post_save das tabelas fato: muda só a versão da escola da
+    linha. Linhas sem escola (esferas) e linhas novas de um ano que ainda
+    não está nas dimensões mudam também a versão global.
+    """
+    escola_id = getattr(instance, 'escola_id', None)
+    if escola_id is not None:
+        invalidar(escolas=[escola_id])
+    if escola_id is None or (created and instance.ano not in anos_do_fato(sender)):
+        invalidar()
+
+
+def em_cache(nome, carregar):
+    """Devolve `carregar()` guardado em cache para a versão de dados atual."""
+    chave = f'sabe:dim:{nome}:{versao_dados()}'
+    valor = cache.get(chave)
+    if valor is None:
+        # Do primário: uma réplica atrasada gravaria dados velhos na versão nova
+        from .roteadores import primario
+        with primario():
+            valor = carregar()
+        cache.set(chave, valor, TEMPO_CACHE)
+    return valor
+
+
+# ============================================================
+# DIMENSÕES
+# ============================================================
+
+def anos_desempenho():
+    from .models import DesempenhoEscola
+    return em_cache('anos_desempenho', lambda: list(
+        DesempenhoEscola.objects.values_list('ano', flat=True).distinct().order_by('-ano')
+    ))
+
+
+def series():
+    from .models import Serie
+    return em_cache('series', lambda: list(Serie.objects.order_by('id')))
+
+
+def disciplinas():
+    from .models import Disciplina
+    return em_cache('disciplinas', lambda: list(Disciplina.objects.order_by('id')))
+
+
+def localidades():
+    from .models import Localidade
+    return em_cache('localidades', lambda: list(Localidade.objects.order_by('nome')))
+
+
+def escolas():
+    """Lista leve (id, nome) de todas as escolas, ordenada por nome."""
+    from .models import Escola
+    return em_cache('escolas', lambda: list(
+        Escola.objects.order_by('nome').values_list('id', 'nome')
+    ))
+
+
+def esferas():
+    from .models import Esfera
+    return em_cache('esferas', lambda: list(Esfera.objects.order_by('nome')))
+
+
+def anos_esfera():
+    from .models import DesempenhoEsfera
+    return em_cache('anos_esfera', lambda: list(
+        DesempenhoEsfera.objects.values_list('ano', flat=True).distinct().order_by('-ano')
+    ))
+
+
+def total_desempenhos_esfera():
+    from .models import DesempenhoEsfera
+    return em_cache('total_desempenhos_esfera', DesempenhoEsfera.objects.count)
+
+
+def anos_habilidades_escola():
+    from .models import ResultadoHabEscola
+    return em_cache('anos_habilidades_escola', lambda: list(
+        ResultadoHabEscola.objects
+        .filter(nivel=ResultadoHabEscola.NIVEL_ESCOLA)
+        .values_list('ano', flat=True).distinct().order_by('-ano')
+    ))
+
+
+def anos_habilidades():
+    """Anos de ResultadoHabEscola em qualquer nível (escola ou esfera)."""
+    from .models import ResultadoHabEscola
+    return em_cache('anos_habilidades', lambda: list(
+        ResultadoHabEscola.objects.values_list('ano', flat=True).distinct().order_by('-ano')
+    ))
+
+
+def anos_do_fato(modelo):
+    """Anos em cache da tabela fato `modelo` (os do nível escola em ResultadoHabEscola)."""
+    return {
+        'DesempenhoEscola': anos_desempenho,
+        'ResultadoHabEscola': anos_habilidades_escola,
+        'DesempenhoEsfera': anos_esfera,
+    }[modelo.__name__]()
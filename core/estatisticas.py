@@ -0,0 +1,190 @@
+"""
+Atualização da tabela EstatisticaHabilidade a partir de ResultadoHabEscola.
+
+Para cada (ano, série, disciplina, habilidade) calcula, na rede e em cada
+localidade, média, mediana, p10/p90, desvio padrão, contagens abaixo dos
+limiares fixos e um histograma de 1 ponto percentual. Os resultados são
+lidos em uma única passada ordenada por habilidade, sem carregar o ano
+inteiro na memória.
+
+Importações e restaurações chamam atualizar() ao final; edições avulsas de
+ResultadoHabEscola (admin) recalculam, quando a transação confirma, só as
+habilidades editadas no ano (agendar_grupos), sem invalidação global.
+"""
+import statistics
+import threading
+from decimal import Decimal
+from itertools import groupby
+
+from django.db import transaction
+
+from . import dimensoes
+from .models import EstatisticaHabilidade, ResultadoHabEscola
+
+
+def _percentil(ordenados, p):
+    """Percentil com interpolação linear (equivalente ao percentile_cont do PostgreSQL)."""
+    if len(ordenados) == 1:
+        return ordenados[0]
+    pos = (len(ordenados) - 1) * p
+    base = int(pos)
+    fracao = pos - base
+    if base + 1 < len(ordenados):
+        return ordenados[base] + (ordenados[base + 1] - ordenados[base]) * fracao
+    return ordenados[base]
+
+
+def _dec(valor):
+    return Decimal(str(round(valor, 2)))
+
+
+def calcular(valores):
+    """Estatísticas de uma lista de taxas de acerto (0–100)."""
+    ordenados = sorted(valores)
+    histograma = [0] * 101
+    for v in ordenados:
+        histograma[min(int(v), 100)] += 1
+
+    estat = {
+        'media': _dec(statistics.fmean(ordenados)),
+        'mediana': _dec(statistics.median(ordenados)),
+        'p10': _dec(_percentil(ordenados, 0.10)),
+        'p90': _dec(_percentil(ordenados, 0.90)),
+        'desvio_padrao': _dec(statistics.pstdev(ordenados)),
+        'total_escolas': len(ordenados),
+        'histograma': histograma,
+    }
+    for limiar in EstatisticaHabilidade.LIMIARES:
+        estat[f'escolas_abaixo_{limiar}'] = sum(histograma[:limiar])
+    return estat
+
+
+def _linhas(ano, habs=None):
+    linhas = ResultadoHabEscola.objects.filter(
+        ano=ano, nivel=ResultadoHabEscola.NIVEL_ESCOLA, tx_acerto__isnull=False
+    )
+    if habs is not None:
+        linhas = linhas.filter(hab_id__in=habs)
+    return (
+        linhas
+        .order_by('serie_id', 'disciplina_id', 'hab_id')
+        .values_list('serie_id', 'disciplina_id', 'hab_id', 'escola__localidade_id', 'tx_acerto')
+        .iterator(chunk_size=20000)
+    )
+
+
+def atualizar_ano(ano, habs=None):
+    """
+    Recalcula as estatísticas de um ano (só das habilidades `habs`, se
+    informadas). Devolve o número de linhas gravadas.
+    """
+    novas = []
+    for (serie_id, disciplina_id, hab_id), grupo in groupby(_linhas(ano, habs), key=lambda r: r[:3]):
+        chave = dict(ano=ano, serie_id=serie_id, disciplina_id=disciplina_id, hab_id=hab_id)
+
+        por_localidade = {}
+        todos = []
+        for *_, localidade_id, tx in grupo:
+            tx = tx / ResultadoHabEscola.ESCALA_TX
+            todos.append(tx)
+            por_localidade.setdefault(localidade_id, []).append(tx)
+
+        novas.append(EstatisticaHabilidade(
+            **chave, nivel=EstatisticaHabilidade.NIVEL_REDE, **calcular(todos)
+        ))
+        for localidade_id, valores in por_localidade.items():
+            if localidade_id is None:
+                continue
+            novas.append(EstatisticaHabilidade(
+                **chave,
+                nivel=EstatisticaHabilidade.NIVEL_LOCALIDADE,
+                localidade_id=localidade_id,
+                **calcular(valores)
+            ))
+
+    antigas = EstatisticaHabilidade.objects.filter(ano=ano)
+    if habs is not None:
+        antigas = antigas.filter(hab_id__in=habs)
+    with transaction.atomic():
+        antigas.delete()
+        EstatisticaHabilidade.objects.bulk_create(novas, batch_size=5000)
+    return len(novas)
+
+
+def atualizar(anos=None):
+    """
+    Recalcula as estatísticas dos anos informados (todos, se None).
+    Deve ser chamada ao final de cada importação de resultados.
+    """
+    if anos is None:
+        anos = (
+            ResultadoHabEscola.objects
+            .filter(nivel=ResultadoHabEscola.NIVEL_ESCOLA)
+            .values_list('ano', flat=True)
+            .distinct()
+            .order_by('ano')
+        )
+    totais = {ano: atualizar_ano(ano) for ano in anos}
+    dimensoes.invalidar()
+    return totais
+
+
+# ============================================================
+# EDIÇÕES AVULSAS
+# ============================================================
+
+# (ano, hab_id) editados na thread atual, à espera do fim da transação
+_pendentes = threading.local()
+
+
+def agendar(sender, instance, using=None, **kwargs):
+    """
+    Receiver de post_save de ResultadoHabEscola: recalcula a habilidade da
+    linha no ano quando a transação confirmar. Exclusões não passam por
+    signal (desligaria o fast-delete das cascatas): o admin e a exclusão de
+    escolas chamam agendar_grupos.
+    """
+    if instance.nivel == ResultadoHabEscola.NIVEL_ESCOLA:
+        agendar_grupos([(instance.ano, instance.hab_id)], using)
+
+
+def agendar_escola(sender, instance, using=None, **kwargs):
+    """Receiver de pre_delete de Escola: os grupos em que a escola entrava."""
+    agendar_grupos(grupos_de(ResultadoHabEscola.objects.using(using).filter(escola_id=instance.pk)), using)
+
+
+def grupos_de(resultados):
+    """(ano, hab_id) distintos das linhas de nível escola de `resultados`."""
+    return set(
+        resultados.filter(nivel=ResultadoHabEscola.NIVEL_ESCOLA)
+        .order_by().values_list('ano', 'hab_id').distinct()
+    )
+
+
+def agendar_grupos(grupos, using=None):
+    """
+    Recalcula os grupos (ano, hab_id) quando a transação confirmar. Várias
+    linhas da mesma transação custam um recálculo por ano, só das
+    habilidades tocadas; nada de versão global (os fragmentos em cache
+    expiram em dimensoes.TEMPO_CACHE).
+    """
+    if not grupos:
+        return
+    if not hasattr(_pendentes, 'grupos'):
+        _pendentes.grupos = set()
+    _pendentes.grupos.update(grupos)
+    # Todo agendamento registra o callback; o primeiro a rodar esvazia o
+    # conjunto. Grupos de uma transação desfeita só custam um recálculo a mais
+    transaction.on_commit(_atualizar_pendentes, using=using)
+
+
+def _atualizar_pendentes():
+    pendentes = getattr(_pendentes, 'grupos', None)
+    if not pendentes:
+        return
+    _pendentes.grupos = set()
+    por_ano = {}
+    for ano, hab_id in pendentes:
+        por_ano.setdefault(ano, set()).add(hab_id)
+    for ano, habs in sorted(por_ano.items()):
+        atualizar_ano(ano, habs)
@@ -0,0 +1,259 @@
+"""
+Gráficos do boletim desenhados no servidor com ReportLab graphics.
+
+Os boletins impressos e os PDFs não dependem mais do Chart.js (CDN): a
+distribuição por padrão de desempenho (pizzas por disciplina) e a evolução
+da proficiência por ano são desenhadas aqui como SVG (páginas HTML) ou PNG
+(PDFs). Cada imagem fica no cache do Django sob (escola, ano, tipo, formato,
+versão de dados), então gerações em lote e reimpressões só redesenham os
+gráficos de escolas cujos dados mudaram.
+"""
+import io
+
+from django.core.cache import cache
+from reportlab.graphics import renderSVG
+from reportlab.graphics.charts.legends import Legend
+from reportlab.graphics.charts.linecharts import HorizontalLineChart
+from reportlab.graphics.charts.piecharts import Pie
+from reportlab.graphics.shapes import Drawing, String
+from reportlab.lib import colors
+from reportlab.platypus import Image
+
+from . import dimensoes
+from .models import DesempenhoEscola
+
+
+NIVEIS = [
+    ('abaixo_basico', 'Abaixo do Básico', '#e74c3c'),
+    ('basico', 'Básico', '#f39c12'),
+    ('adequado', 'Adequado', '#3498db'),
+    ('avancado', 'Avançado', '#2ecc71'),
+]
+CORES_LINHAS = ['#1e3a8a', '#e67e22', '#16a085', '#8e44ad', '#c0392b', '#7f8c8d']
+
+TIPOS = ('distribuicao', 'evolucao')
+FORMATOS = {'svg': 'image/svg+xml', 'png': 'image/png'}
+TEMPO_CACHE = 60 * 60 * 24 * 30
+DPI_PNG = 150
+
+
+# ============================================================
+# DADOS
+# ============================================================
+
+def _percentuais(d):
+    """Percentuais por nível de um DesempenhoEscola (2023 veio em fração 0–1)."""
+    valores = {}
+    for campo, _, _ in NIVEIS:
+        valor = float(getattr(d, campo) or 0)
+        if d.ano == 2023 and valor <= 1:
+            valor *= 100
+        valores[campo] = valor
+    return valores
+
+
+def agregar_distribuicao(distribuicao, ano):
+    """
+    Média por disciplina, no `ano`, dos percentuais por nível das linhas
+    (série, disciplina) do boletim que têm os quatro níveis preenchidos.
+    `distribuicao` tem o formato montado por views.renderizar_boletim.
+    """
+    somas = {}
+    for item in distribuicao:
+        dados_ano = next((d for d in item['anos'] if d['ano'] == ano), None)
+        if not dados_ano or any(dados_ano[campo] is None for campo, _, _ in NIVEIS):
+            continue
+        soma = somas.setdefault(item['disciplina'], {campo: 0 for campo, _, _ in NIVEIS} | {'n': 0})
+        for campo, _, _ in NIVEIS:
+            soma[campo] += dados_ano[campo]
+        soma['n'] += 1
+
+    return [
+        {'disciplina': disciplina} | {campo: round(soma[campo] / soma['n'], 2) for campo, _, _ in NIVEIS}
+        for disciplina, soma in sorted(somas.items())
+    ]
+
+
+def dados_distribuicao(escola_id, ano):
+    linhas = (
+        DesempenhoEscola.objects
+        .filter(escola_id=escola_id, ano=ano)
+        .select_related('disciplina')
+        .only('ano', 'disciplina__nome', *(campo for campo, _, _ in NIVEIS))
+    )
+    distribuicao = [
+        {'disciplina': d.disciplina.nome, 'anos': [{'ano': ano, **_percentuais(d)}]}
+        for d in linhas
+    ]
+    return agregar_distribuicao(distribuicao, ano)
+
+
+def dados_evolucao(escola_id, ate_ano=None):
+    """(anos, {série: {disciplina: {ano: proficiência}}}) da escola."""
+    linhas = DesempenhoEscola.objects.filter(escola_id=escola_id)
+    if ate_ano is not None:
+        linhas = linhas.filter(ano__lte=ate_ano)
+    anos = set()
+    series = {}
+    for ano, serie, disciplina, prof in linhas.values_list(
+        'ano', 'serie__nome', 'disciplina__nome', 'proficiencia_media'
+    ):
+        if prof is None:
+            continue
+        anos.add(ano)
+        series.setdefault(serie, {}).setdefault(disciplina, {})[ano] = float(prof)
+    return sorted(anos), dict(sorted(series.items()))
+
+
+# ============================================================
+# DESENHO
+# ============================================================
+
+def desenhar_distribuicao(dados, ano=None):
+    """Uma pizza por disciplina, lado a lado, com a legenda dos níveis."""
+    dados = [d for d in dados if sum(d[campo] for campo, _, _ in NIVEIS) > 0]
+    if not dados:
+        return None
+    lado, margem = 150, 20
+    desenho = Drawing(len(dados) * (lado + margem) + margem, lado + 80)
+
+    for i, item in enumerate(dados):
+        x = margem + i * (lado + margem)
+        pizza = Pie()
+        pizza.x, pizza.y, pizza.width, pizza.height = x, 50, lado, lado
+        pizza.data = [item[campo] for campo, _, _ in NIVEIS]
+        pizza.labels = [f'{v:.0f}%' if v >= 5 else '' for v in pizza.data]
+        pizza.simpleLabels = 1
+        pizza.slices.strokeColor = colors.white
+        pizza.slices.strokeWidth = 1
+        pizza.slices.fontColor = colors.white
+        pizza.slices.fontSize = 9
+        pizza.slices.labelRadius = 0.65
+        for j, (_, _, cor) in enumerate(NIVEIS):
+            pizza.slices[j].fillColor = colors.HexColor(cor)
+        desenho.add(pizza)
+        desenho.add(String(x + lado / 2, 35, item['disciplina'], textAnchor='middle',
+                           fontName='Helvetica-Bold', fontSize=10))
+
+    legenda = Legend()
+    legenda.x, legenda.y = margem, 15
+    legenda.alignment = 'right'
+    legenda.columnMaximum = 1
+    legenda.fontSize = 8
+    legenda.deltax = 95
+    legenda.colorNamePairs = [(colors.HexColor(cor), nome) for _, nome, cor in NIVEIS]
+    desenho.add(legenda)
+
+    if ano is not None:
+        desenho.add(String(margem, lado + 65, f'Distribuição por padrão de desempenho — {ano}',
+                           fontName='Helvetica-Bold', fontSize=11))
+    return desenho
+
+
+def desenhar_evolucao(anos, series):
+    """Uma linha por disciplina, um painel por série (escalas diferentes)."""
+    if not anos or not series:
+        return None
+    largura, altura, margem = 460, 150, 40
+    desenho = Drawing(largura + 2 * margem, len(series) * (altura + 60) + 20)
+
+    for i, (serie, disciplinas) in enumerate(reversed(series.items())):
+        base = 20 + i * (altura + 60)
+        grafico = HorizontalLineChart()
+        grafico.x, grafico.y = margem, base + 25
+        grafico.width, grafico.height = largura - 100, altura - 30
+        grafico.data = [
+            [valores.get(ano) for ano in anos] for valores in disciplinas.values()
+        ]
+        grafico.categoryAxis.categoryNames = [str(ano) for ano in anos]
+        grafico.categoryAxis.labels.fontSize = 8
+        grafico.valueAxis.labels.fontSize = 8
+        existentes = [v for linha in grafico.data for v in linha if v is not None]
+        grafico.valueAxis.valueMin = int(min(existentes) * 0.9)
+        grafico.valueAxis.valueMax = int(max(existentes) * 1.1) + 1
+        grafico.joinedLines = 1
+        for j in range(len(disciplinas)):
+            cor = colors.HexColor(CORES_LINHAS[j % len(CORES_LINHAS)])
+            grafico.lines[j].strokeColor = cor
+            grafico.lines[j].strokeWidth = 2
+        desenho.add(grafico)
+
+        legenda = Legend()
+        legenda.x, legenda.y = margem + largura - 90, base + altura - 10
+        legenda.fontSize = 8
+        legenda.colorNamePairs = [
+            (colors.HexColor(CORES_LINHAS[j % len(CORES_LINHAS)]), nome)
+            for j, nome in enumerate(disciplinas)
+        ]
+        desenho.add(legenda)
+        desenho.add(String(margem, base + altura + 5, f'Proficiência média — {serie}',
+                           fontName='Helvetica-Bold', fontSize=10))
+    return desenho
+
+
+def desenho(escola_id, ano, tipo):
+    """Drawing do gráfico (None se a escola não tem dados para ele)."""
+    if tipo == 'distribuicao':
+        return desenhar_distribuicao(dados_distribuicao(escola_id, ano), ano)
+    if tipo == 'evolucao':
+        return desenhar_evolucao(*dados_evolucao(escola_id, ano))
+    raise ValueError(f'Tipo de gráfico inválido: {tipo}')
+
+
+# ============================================================
+# IMAGENS EM CACHE
+# ============================================================
+
+def ultimo_ano(escola_id):
+    return (
+        DesempenhoEscola.objects.filter(escola_id=escola_id)
+        .order_by('-ano').values_list('ano', flat=True).first()
+    )
+
+
+def _renderizar(d, formato):
+    if formato == 'svg':
+        return renderSVG.drawToString(d).encode()
+    # renderPM depende do backend rlPyCairo; importado só quando pedido PNG
+    from reportlab.graphics import renderPM
+    try:
+        return renderPM.drawToString(d, fmt='PNG', dpi=DPI_PNG)
+    except renderPM.RenderPMError as erro:
+        raise ImportError(f'PNG indisponível: {erro}') from erro
+
+
+def imagem(escola_id, ano, tipo, formato='svg'):
+    """Bytes da imagem do gráfico (None se não há dados), do cache quando possível."""
+    if formato not in FORMATOS:
+        raise ValueError(f'Formato inválido: {formato}')
+    chave = f'sabe:grafico:{tipo}:{escola_id}:{ano}:{formato}:{dimensoes.versao_escola(escola_id)}'
+    conteudo = cache.get(chave)
+    if conteudo is None:
+        d = desenho(escola_id, ano, tipo)
+        # b'' marca "sem dados" no cache, para não consultar de novo
+        conteudo = _renderizar(d, formato) if d is not None else b''
+        cache.set(chave, conteudo, TEMPO_CACHE)
+    return conteudo or None
+
+
+def flowable(escola_id, ano, tipo, largura):
+    """
+    Gráfico para um PDF do platypus na `largura` dada (pontos): PNG do cache
+    ou, sem backend de PNG instalado, o próprio Drawing (vetorial, sem cache).
+    """
+    try:
+        png = imagem(escola_id, ano, tipo, 'png')
+    except ImportError:
+        d = desenho(escola_id, ano, tipo)
+        if d is None:
+            return None
+        escala = largura / d.width
+        d.scale(escala, escala)
+        d.width, d.height = largura, d.height * escala
+        return d
+    if png is None:
+        return None
+    figura = Image(io.BytesIO(png))
+    figura.drawHeight = largura * figura.imageHeight / figura.imageWidth
+    figura.drawWidth = largura
+    return figura
@@ -0,0 +1,494 @@
+"""
+Importação incremental dos resultados (DesempenhoEscola e ResultadoHabEscola).
+
+Cada linha do arquivo é identificada pela sua chave natural e comparada com
+o que já está gravado: só as linhas novas são inseridas e só as que mudaram
+de conteúdo são atualizadas. As inalteradas não são tocadas (nem o
+`data_atualizacao`), de modo que reimportar um arquivo corrigido custa
+apenas as linhas corrigidas.
+
+- DesempenhoEscola guarda um checksum de 64 bits do conteúdo
+  (`hash_conteudo`), comparado sem reler as colunas.
+- ResultadoHabEscola tem um único valor (tx_acerto em pontos-base, 2
+  bytes); o próprio valor é comparado, sem custo extra de armazenamento.
+
+Vários arquivos são lidos e validados em paralelo (ProcessPoolExecutor); cada
+lote validado segue na hora por uma fila limitada (o leitor espera quando
+ela enche) até um único escritor, que faz COPY para uma tabela temporária
+do arquivo e, no fim dele, um INSERT ... ON CONFLICT que só reescreve as
+linhas cujo conteúdo mudou. A importação inteira é uma transação.
+
+Os arquivos são CSV com cabeçalho nos nomes das colunas do banco
+(`escola_id`, `serie_id`...), como os exportados do pgAdmin, ou com as
+dimensões por texto (`inep`/`escola`, `serie`, `disciplina`, `cd_hab`),
+resolvidas pelo ResolvedorDimensoes; `NULL` e vazio valem None.
+"""
+import csv
+import glob
+import io
+import multiprocessing
+import os
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from decimal import Decimal
+from hashlib import blake2b
+
+import django
+from django.core.exceptions import ValidationError
+from django.db import connection, connections, transaction
+
+from . import dimensoes, estatisticas, particionamento
+from .models import DesempenhoEscola, ResultadoHabEscola
+from .resolvedor import COLUNA_DESCRICAO_HAB, REFERENCIAS, ResolvedorDimensoes
+
+
+LOTE = 5000
+TAMANHO_FILA = 8
+MAX_AVISOS = 20
+NULOS = {'', 'NULL', 'null', 'None'}
+
+
+def hash_conteudo(valores):
+    """Checksum de 64 bits (com sinal, cabe em um bigint) de uma sequência de valores."""
+    texto = '\x1f'.join('' if v is None else str(v) for v in valores)
+    return int.from_bytes(blake2b(texto.encode(), digest_size=8).digest(), 'big', signed=True)
+
+
+# ============================================================
+# DEFINIÇÃO DOS FATOS
+# ============================================================
+
+# `fixos`: colunas gravadas com uma expressão SQL em vez de vir do arquivo;
+# `derivar`: regras do save() do modelo aplicadas ao conteúdo antes do hash
+FATOS = {
+    'desempenho': {
+        'modelo': DesempenhoEscola,
+        'chave': ('escola_id', 'ano', 'disciplina_id', 'serie_id'),
+        'campos': DesempenhoEscola.CAMPOS_CONTEUDO,
+        'hash': 'hash_conteudo',
+        'fixos': {'data_atualizacao': 'now()'},
+        'derivar': DesempenhoEscola.derivar,
+    },
+    'habilidade': {
+        'modelo': ResultadoHabEscola,
+        'chave': ('ano', 'escola_id', 'serie_id', 'disciplina_id', 'hab_id'),
+        'campos': ('tx_acerto',),
+        'hash': None,
+        'fixos': {'nivel': f"'{ResultadoHabEscola.NIVEL_ESCOLA}'"},
+        'derivar': None,
+    },
+}
+
+
+def colunas_arquivo(fato):
+    spec = FATOS[fato]
+    return spec['chave'] + spec['campos']
+
+
+def colunas_copia(fato):
+    """Colunas enviadas no COPY: chave, conteúdo e, se houver, o checksum."""
+    spec = FATOS[fato]
+    return colunas_arquivo(fato) + ((spec['hash'],) if spec['hash'] else ())
+
+
+def normalizar(campo, valor):
+    """Valor no tipo do campo; decimais com as casas do campo ('98' == '98.00')."""
+    valor = campo.to_python(valor)
+    if isinstance(valor, Decimal):
+        valor = valor.quantize(Decimal(1).scaleb(-campo.decimal_places))
+    return valor
+
+
+def derivar(fato, conteudo):
+    """Conteúdo (na ordem de FATOS[fato]['campos']) com as regras do save() aplicadas."""
+    spec = FATOS[fato]
+    if spec['derivar'] is None:
+        return conteudo
+    modelo = spec['modelo']
+    valores = spec['derivar'](dict(zip(spec['campos'], conteudo)))
+    return tuple(normalizar(modelo._meta.get_field(c), valores[c]) for c in spec['campos'])
+
+
+def _converter(modelo, coluna, valor):
+    """Texto do CSV -> valor no formato gravado no banco."""
+    if valor is not None and valor.strip() in NULOS:
+        valor = None
+    if modelo is ResultadoHabEscola and coluna == 'tx_acerto':
+        # Arquivos trazem percentual; -1 era o marcador de "sem resultado"
+        if valor is None or Decimal(valor) < 0:
+            return None
+        # Fora da faixa violaria res_hab_tx_valida no merge e desfaria a
+        # importação inteira: vira erro da linha, como os de conversão
+        if Decimal(valor) > 100:
+            raise ValueError(f'tx_acerto fora da faixa 0–100: {valor.strip()}')
+        return ResultadoHabEscola.para_pontos_base(valor)
+
+    campo = modelo._meta.get_field(coluna.removesuffix('_id'))
+    if campo.is_relation:
+        return None if valor is None else int(valor)
+    return normalizar(campo, valor)
+
+
+# ============================================================
+# LEITURA (roda nos processos do pool)
+# ============================================================
+
+def ler_csv(caminho, fato, tamanho_lote=LOTE):
+    """
+    Lê e valida o arquivo, entregando (yield) cada lote de linhas na ordem
+    de colunas_copia() assim que ele enche: só um lote por arquivo fica em
+    memória. Dentro de um lote a chave é única (vale a última ocorrência);
+    entre lotes, o escritor desempata pela ordem de chegada.
+
+    Dimensões informadas por texto saem como referências (coluna, texto) e
+    são resolvidas pelo escritor, o único que pode criar as que faltarem.
+    """
+    spec = FATOS[fato]
+    modelo = spec['modelo']
+    colunas = colunas_arquivo(fato)
+    n_chave = len(spec['chave'])
+
+    with open(caminho, encoding='utf-8-sig', newline='') as arquivo:
+        amostra = arquivo.read(4096)
+        arquivo.seek(0)
+        dialeto = csv.Sniffer().sniff(amostra, delimiters=';,\t')
+        leitor = csv.DictReader(arquivo, dialect=dialeto)
+
+        cabecalho = leitor.fieldnames or []
+        origem = {}
+        for c in colunas:
+            if c in cabecalho:
+                origem[c] = None
+            else:
+                textual = next((t for t in REFERENCIAS.get(c, ()) if t in cabecalho), None)
+                if textual is None:
+                    opcoes = ' ou '.join((c,) + REFERENCIAS.get(c, ()))
+                    raise ValueError(f'{caminho}: coluna ausente: {opcoes}')
+                origem[c] = textual
+        descricao = COLUNA_DESCRICAO_HAB in cabecalho
+
+        def valor(registro, c):
+            textual = origem[c]
+            if textual is None:
+                return _converter(modelo, c, registro.get(c))
+            texto = (registro.get(textual) or '').strip()
+            if texto in NULOS:
+                raise ValueError(f'{textual} vazio')
+            if textual == 'cd_hab' and descricao:
+                return (textual, texto, registro.get(COLUNA_DESCRICAO_HAB))
+            return (textual, texto)
+
+        lote = {}
+        for numero, registro in enumerate(leitor, start=2):
+            try:
+                valores = tuple(valor(registro, c) for c in colunas)
+                # Grava (e faz o hash de) o mesmo que o save() gravaria
+                valores = valores[:n_chave] + derivar(fato, valores[n_chave:])
+            except (ValueError, ArithmeticError, ValidationError) as erro:
+                raise ValueError(f'{caminho}, linha {numero}: {erro}') from erro
+            if spec['hash']:
+                valores += (hash_conteudo(valores[n_chave:]),)
+            lote[valores[:n_chave]] = valores
+            if len(lote) >= tamanho_lote:
+                yield list(lote.values())
+                lote = {}
+        if lote:
+            yield list(lote.values())
+
+
+def _mensagens(caminho, fato, tamanho_lote):
+    """
+    ('lote', caminho, linhas)... e ('fim', caminho, total) ou ('erro',
+    caminho, msg). Um erro pode chegar depois de alguns lotes do arquivo:
+    o escritor só grava o arquivo ao receber o 'fim'.
+    """
+    total = 0
+    try:
+        for lote in ler_csv(caminho, fato, tamanho_lote):
+            total += len(lote)
+            yield ('lote', caminho, lote)
+    except (OSError, ValueError, csv.Error) as erro:
+        yield ('erro', caminho, str(erro))
+        return
+    yield ('fim', caminho, total)
+
+
+def _iniciar_processo():
+    # Com spawn/forkserver o processo filho precisa carregar o Django
+    django.setup()
+
+
+def _ler_para_fila(caminho, fato, tamanho_lote, fila):
+    # put() bloqueia quando a fila está cheia: o escritor dita o ritmo
+    for mensagem in _mensagens(caminho, fato, tamanho_lote):
+        fila.put(mensagem)
+
+
+def _ler_em_paralelo(pilha, caminhos, fato, processos, tamanho_lote, tamanho_fila):
+    """Inicia o pool e devolve o gerador das mensagens que chegam pela fila."""
+    # O gerente (dono da fila) é encerrado antes do pool: se o escritor
+    # falhar, os leitores bloqueados em put() recebem erro e terminam
+    pool = pilha.enter_context(
+        ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_processo)
+    )
+    gerente = pilha.enter_context(multiprocessing.Manager())
+    fila = gerente.Queue(maxsize=tamanho_fila)
+    futuros = {
+        pool.submit(_ler_para_fila, caminho, fato, tamanho_lote, fila): caminho
+        for caminho in caminhos
+    }
+
+    def consumir():
+        pendentes = set(caminhos)
+        while pendentes:
+            try:
+                tipo, caminho, dado = fila.get(timeout=1)
+            except queue.Empty:
+                # Processo que morreu sem avisar (ex.: falta de memória)
+                for futuro, caminho in futuros.items():
+                    if caminho in pendentes and futuro.done() and futuro.exception():
+                        pendentes.discard(caminho)
+                        yield ('erro', caminho, repr(futuro.exception()))
+                continue
+            if tipo != 'lote':
+                pendentes.discard(caminho)
+            yield tipo, caminho, dado
+
+    return consumir()
+
+
+# ============================================================
+# ESCRITA (processo principal, um único escritor)
+# ============================================================
+
+def _copiar(cursor, tabela, colunas, linhas):
+    buffer = io.StringIO()
+    # Só o None fica sem aspas, e o COPY em CSV o lê como NULL
+    csv.writer(buffer, quoting=csv.QUOTE_NOTNULL).writerows(linhas)
+    buffer.seek(0)
+    sql = f'COPY {tabela} ({", ".join(colunas)}) FROM STDIN WITH (FORMAT csv)'
+    bruto = cursor.cursor
+    if hasattr(bruto, 'copy'):  # psycopg 3
+        with bruto.copy(sql) as copia:
+            copia.write(buffer.getvalue())
+    else:  # psycopg2
+        bruto.copy_expert(sql, buffer)
+
+
+class Escritor:
+    """
+    Cada arquivo vai por COPY para a sua própria tabela temporária à medida
+    que os lotes chegam; no fim do arquivo, um merge só grava o que mudou.
+    Um arquivo com erro é descartado sem ter gravado nenhuma linha.
+    """
+
+    def __init__(self, fato, cursor):
+        spec = FATOS[fato]
+        self.fato = fato
+        self.cursor = cursor
+        self.colunas = colunas_copia(fato)
+        self.n_chave = len(spec['chave'])
+        self.anos_prontos = set()
+        self.resolvedor = None
+        self.tabela = spec['modelo']._meta.db_table
+        # caminho -> tabela temporária do arquivo
+        self.temporarias = {}
+        self.criadas = 0
+
+        fixos = spec['fixos']
+        chave = ', '.join(spec['chave'])
+        comparar = (spec['hash'],) if spec['hash'] else spec['campos']
+        atualizar = [c for c in self.colunas if c not in spec['chave']] + list(fixos)
+        # A mesma chave em lotes diferentes do arquivo: vale o último
+        self.sql_merge = f"""
+            WITH novas AS (
+                SELECT DISTINCT ON ({chave}) {", ".join(self.colunas)}
+                FROM {{temporaria}}
+                ORDER BY {chave}, ordem DESC
+            ), gravadas AS (
+                INSERT INTO {self.tabela} AS atual ({", ".join(self.colunas + tuple(fixos))})
+                SELECT {", ".join(self.colunas + tuple(fixos.values()))}
+                FROM novas
+                ON CONFLICT ({chave}) DO UPDATE
+                   SET {", ".join(f"{c} = EXCLUDED.{c}" for c in atualizar)}
+                 WHERE {" OR ".join(f"atual.{c} IS DISTINCT FROM EXCLUDED.{c}" for c in comparar)}
+                RETURNING (xmax = 0) AS nova, ano, escola_id
+            )
+            SELECT (SELECT count(*) FROM novas),
+                   count(*) FILTER (WHERE nova), count(*) FILTER (WHERE NOT nova),
+                   array_agg(DISTINCT ano), array_agg(DISTINCT escola_id)
+            FROM gravadas
+        """
+
+    def resolver(self, linhas):
+        """Resolve as referências textuais; devolve (linhas, rejeitadas)."""
+        if self.resolvedor is None:
+            # Carregado só se algum arquivo usar dimensões por texto
+            if not any(isinstance(v, tuple) for linha in linhas for v in linha[:self.n_chave]):
+                return linhas, []
+            self.resolvedor = ResolvedorDimensoes()
+        return self.resolvedor.resolver(self.colunas, linhas, self.n_chave)
+
+    def _temporaria(self, caminho):
+        if caminho not in self.temporarias:
+            self.criadas += 1
+            nome = f'importacao_{self.fato}_{self.criadas}'
+            self.cursor.execute(
+                f'CREATE TEMP TABLE {nome} ON COMMIT DROP AS '
+                f'SELECT {", ".join(self.colunas)} FROM {self.tabela} WITH NO DATA'
+            )
+            # Ordem de chegada, para o desempate entre lotes
+            self.cursor.execute(f'ALTER TABLE {nome} ADD COLUMN ordem bigserial')
+            self.temporarias[caminho] = nome
+        return self.temporarias[caminho]
+
+    def acumular(self, caminho, linhas):
+        """Envia um lote já resolvido para a tabela temporária do arquivo."""
+        if linhas:
+            _copiar(self.cursor, self._temporaria(caminho), self.colunas, linhas)
+
+    def concluir(self, caminho):
+        """
+        Grava o arquivo; devolve (linhas distintas, inseridos, atualizados,
+        anos com escrita, escolas com escrita).
+        """
+        temporaria = self.temporarias.pop(caminho, None)
+        if temporaria is None:
+            return 0, 0, 0, set(), set()
+        self.cursor.execute(f'SELECT DISTINCT ano FROM {temporaria}')
+        for (ano,) in self.cursor.fetchall():
+            if ano not in self.anos_prontos:
+                particionamento.garantir_ano(ano)
+                self.anos_prontos.add(ano)
+
+        self.cursor.execute(self.sql_merge.format(temporaria=temporaria))
+        distintas, inseridos, atualizados, anos, escolas = self.cursor.fetchone()
+        self.cursor.execute(f'DROP TABLE {temporaria}')
+        return distintas, inseridos, atualizados, set(anos or ()), set(escolas or ())
+
+    def descartar(self, caminho):
+        """Abandona os lotes já recebidos de um arquivo que falhou."""
+        temporaria = self.temporarias.pop(caminho, None)
+        if temporaria is not None:
+            self.cursor.execute(f'DROP TABLE {temporaria}')
+
+
+# ============================================================
+# ORQUESTRAÇÃO
+# ============================================================
+
+def expandir_caminhos(entradas):
+    """Arquivos, diretórios (todos os .csv) e globs -> lista ordenada de arquivos."""
+    caminhos = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            caminhos.extend(glob.glob(os.path.join(entrada, '**', '*.csv'), recursive=True))
+        elif glob.has_magic(entrada):
+            caminhos.extend(c for c in glob.glob(entrada, recursive=True) if os.path.isfile(c))
+        else:
+            caminhos.append(entrada)
+    return sorted(dict.fromkeys(caminhos))
+
+
+def importar_arquivos(caminhos, fato, processos=None, tamanho_lote=LOTE,
+                      tamanho_fila=TAMANHO_FILA, simular=False, progresso=None):
+    """
+    Importa vários arquivos: leitura e validação em `processos` processos,
+    escrita por um único escritor, que grava cada arquivo quando ele
+    termina. `progresso(r)` é chamado a cada lote recebido e a cada arquivo
+    concluído.
+
+    Devolve {'inseridos', 'atualizados', 'inalterados', 'rejeitados',
+    'linhas', 'anos', 'escolas', 'arquivos', 'total_arquivos', 'erros',
+    'avisos', 'dimensoes_criadas', 'segundos'} ('escolas': quantas tiveram
+    alguma linha gravada). Arquivos com erro de leitura ou
+    validação não têm nenhuma linha gravada; linhas de escolas não
+    cadastradas são rejeitadas (amostra em 'avisos').
+    """
+    processos = min(processos or os.cpu_count() or 1, len(caminhos) or 1)
+    r = {
+        'inseridos': 0, 'atualizados': 0, 'inalterados': 0, 'rejeitados': 0,
+        'linhas': 0, 'anos': set(), 'escolas': set(), 'arquivos': 0, 'total_arquivos': len(caminhos),
+        'erros': {}, 'avisos': [], 'dimensoes_criadas': 0, 'segundos': 0.0,
+    }
+    inicio = time.perf_counter()
+
+    with ExitStack() as pilha:
+        if processos > 1:
+            # O pool sobe antes de o escritor abrir a conexão: os processos
+            # filhos não herdam o socket do banco
+            connections.close_all()
+            mensagens = _ler_em_paralelo(pilha, caminhos, fato, processos, tamanho_lote, tamanho_fila)
+        else:
+            mensagens = (m for c in caminhos for m in _mensagens(c, fato, tamanho_lote))
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            escritor = Escritor(fato, cursor)
+            # caminho -> [linhas, rejeitadas] dos lotes já recebidos
+            parciais = {}
+            for tipo, caminho, dado in mensagens:
+                if caminho in r['erros']:
+                    # Arquivo já recusado pelo resolvedor: o resto dele é ignorado
+                    continue
+                parcial = parciais.setdefault(caminho, [0, 0])
+                if tipo == 'lote':
+                    try:
+                        linhas, rejeitadas = escritor.resolver(dado)
+                    except ValueError as erro:
+                        tipo, dado = 'erro', f'{caminho}: {erro}'
+                if tipo == 'erro':
+                    r['erros'][caminho] = dado
+                    escritor.descartar(caminho)
+                    r['linhas'] -= parcial[0]
+                    r['rejeitados'] -= parcial[1]
+                elif tipo == 'fim':
+                    distintas, inseridos, atualizados, anos, escolas = escritor.concluir(caminho)
+                    r['arquivos'] += 1
+                    r['inseridos'] += inseridos
+                    r['atualizados'] += atualizados
+                    r['inalterados'] += distintas - inseridos - atualizados
+                    r['anos'] |= anos
+                    r['escolas'] |= escolas
+                else:
+                    escritor.acumular(caminho, linhas)
+                    parcial[0] += len(dado)
+                    parcial[1] += len(rejeitadas)
+                    r['linhas'] += len(dado)
+                    r['rejeitados'] += len(rejeitadas)
+                    for _, motivo in rejeitadas[:MAX_AVISOS - len(r['avisos'])]:
+                        r['avisos'].append(f'{caminho}: {motivo}')
+                r['segundos'] = time.perf_counter() - inicio
+                if progresso:
+                    progresso(r)
+
+            if escritor.resolvedor:
+                r['dimensoes_criadas'] = escritor.resolvedor.criadas
+            if simular:
+                transaction.set_rollback(True)
+
+    r['anos'] = sorted(r['anos'])
+    escolas, r['escolas'] = r['escolas'], len(r['escolas'])
+    if not simular and r['anos']:
+        _apos_gravar(fato, r['anos'], escolas)
+    return r
+
+
+def _apos_gravar(fato, anos, escolas):
+    """Atualiza o que depende dos anos e escolas alterados (nada, se nada mudou)."""
+    if fato == 'habilidade':
+        estatisticas.atualizar(anos)
+    else:
+        # Só os resultados dessas escolas mudaram: boletins, gráficos e
+        # fragmentos das demais continuam valendo.
+        # (COPY/INSERT direto não dispara os signals de invalidação)
+        if set(anos) - set(dimensoes.anos_desempenho()):
+            # Ano novo muda também a dimensão de anos
+            dimensoes.invalidar()
+        dimensoes.invalidar(escolas=escolas)
+
+
+def importar(caminho, fato, simular=False):
+    """Importa um único arquivo no processo atual."""
+    return importar_arquivos([caminho], fato, processos=1, simular=simular)
@@ -0,0 +1,29 @@
+"""
+Recalcula a tabela de estatísticas por habilidade (EstatisticaHabilidade).
+
+Uso:
+    python manage.py atualizar_estatisticas_habilidades
+    python manage.py atualizar_estatisticas_habilidades --ano 2024 --ano 2025
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import estatisticas
+
+
+class Command(BaseCommand):
+    help = 'Recalcula as estatísticas pré-agregadas por habilidade (rede e localidade)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ano', type=int, action='append', dest='anos',
+                            help='Ano a recalcular (pode repetir); padrão: todos')
+
+    def handle(self, *args, **opts):
+        inicio = time.perf_counter()
+        totais = estatisticas.atualizar(opts['anos'])
+        for ano, total in totais.items():
+            self.stdout.write(f'  {ano}: {total} estatísticas')
+        self.stdout.write(self.style.SUCCESS(
+            f'Estatísticas atualizadas em {time.perf_counter() - inicio:.1f}s'
+        ))
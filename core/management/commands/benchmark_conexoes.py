@@ -0,0 +1,109 @@
+"""
+Mede quanto da latência das rotas do painel é abertura de conexão com o
+PostgreSQL: cada rota roda com uma conexão nova por requisição (sem
+CONN_MAX_AGE nem pool, o comportamento antigo) e com a configuração atual
+de settings (conexões persistentes ou pool do psycopg 3).
+
+Uso:
+    python manage.py benchmark_conexoes
+    DB_POOL=1 python manage.py benchmark_conexoes --apenas comparativo_geral
+"""
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.test import Client
+
+from .benchmark_rotas import filtros_representativos, montar_casos
+
+
+def _sem_reuso(settings_dict):
+    """Cópia das configurações sem pool e sem conexão persistente."""
+    opcoes = {k: v for k, v in settings_dict['OPTIONS'].items() if k != 'pool'}
+    return {**settings_dict, 'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'OPTIONS': opcoes}
+
+
+def custo_conexao(repeticoes):
+    """Mediana (ms) para abrir uma conexão nova e executar SELECT 1."""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        bruta = connection.Database.connect(**connection.get_connection_params())
+        try:
+            with bruta.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        finally:
+            bruta.close()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+def medir(client, url, params, repeticoes, apos_requisicao):
+    """Mediana (ms) da rota, chamando `apos_requisicao` como o fim de uma requisição real."""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        client.get(url, params)
+        # O Client de teste não fecha conexões no request_finished; simula aqui
+        apos_requisicao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+class Command(BaseCommand):
+    help = 'Compara a latência das rotas com conexão nova por requisição e com a configuração atual'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticoes', type=int, default=10)
+        parser.add_argument('--apenas', nargs='*', default=None,
+                            help='Mede apenas as rotas com estes nomes')
+
+    def handle(self, *args, **opts):
+        configuracao = connection.settings_dict
+        if configuracao['OPTIONS'].get('pool'):
+            pool = configuracao['OPTIONS']['pool']
+            atual = f'pool psycopg 3 (min {pool.get("min_size")}, max {pool.get("max_size")})'
+        else:
+            atual = f'CONN_MAX_AGE={configuracao["CONN_MAX_AGE"]}'
+        self.stdout.write(
+            f'Configuração atual: {atual}, CONN_HEALTH_CHECKS={configuracao["CONN_HEALTH_CHECKS"]}'
+        )
+
+        casos, _ = montar_casos(filtros_representativos())
+        if opts['apenas']:
+            casos = [c for c in casos if c[0].split(':')[0] in opts['apenas']]
+        repeticoes = opts['repeticoes']
+        client = Client(HTTP_HOST='localhost', raise_request_exception=False)
+
+        connection.close()
+        connection.settings_dict = _sem_reuso(configuracao)
+        try:
+            self.stdout.write(f'Abrir conexão + SELECT 1: {custo_conexao(repeticoes):.2f} ms')
+            for _, url, params in casos:
+                client.get(url, params)
+            antes = {
+                nome: medir(client, url, params, repeticoes, connection.close)
+                for nome, url, params in casos
+            }
+        finally:
+            connection.close()
+            connection.settings_dict = configuracao
+
+        for _, url, params in casos:
+            client.get(url, params)
+        depois = {
+            nome: medir(client, url, params, repeticoes, close_old_connections)
+            for nome, url, params in casos
+        }
+        connection.close()
+
+        self.stdout.write(f'{"rota":45} {"nova ms":>9} {"atual ms":>9} {"ganho":>7}')
+        for nome, _, _ in casos:
+            ganho = 1 - depois[nome] / antes[nome] if antes[nome] else 0
+            self.stdout.write(f'{nome:45} {antes[nome]:>9.2f} {depois[nome]:>9.2f} {ganho:>7.0%}')
+        total_antes, total_depois = sum(antes.values()), sum(depois.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Total: {total_antes:.1f} ms -> {total_depois:.1f} ms '
+            f'({total_antes - total_depois:.1f} ms em abertura de conexões)'
+        ))
@@ -0,0 +1,247 @@
+"""
+Benchmark das rotas do painel: latência, número de queries e memória por
+URL de core/urls.py, com comparação contra uma baseline salva.
+
+Uso:
+    python manage.py benchmark_rotas --salvar-baseline
+    python manage.py benchmark_rotas            # falha se houver regressão
+                                                # (ou se não houver baseline)
+"""
+import json
+import statistics
+from contextlib import ExitStack
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
+
+from core.models import (
+    DesempenhoEscola, DesempenhoEsfera, Escola, Serie, Disciplina,
+    Localidade, Esfera,
+)
+
+
+BASELINE_PADRAO = Path(settings.BASE_DIR) / 'benchmarks' / 'baseline_rotas.json'
+
+# Rotas que não fazem parte do painel
+ROTAS_IGNORADAS = {'admin'}
+
+
+def filtros_representativos():
+    """Escolhe valores reais do banco para preencher os filtros das rotas."""
+    todos_anos = list(
+        DesempenhoEscola.objects.values_list('ano', flat=True).distinct().order_by('-ano')
+    )
+    anos = todos_anos[:2]
+    ano = anos[0] if anos else None
+    serie = Serie.objects.order_by('id').first()
+    disciplina = Disciplina.objects.order_by('id').first()
+    escolas = list(Escola.objects.order_by('id').values_list('id', flat=True)[:2])
+    localidade = Localidade.objects.order_by('id').first()
+    esfera = Esfera.objects.order_by('id').first()
+    anos_esfera = DesempenhoEsfera.objects.values_list('ano', flat=True).distinct()
+
+    return {
+        'ano': ano,
+        'anos': anos,
+        'todos_anos': todos_anos,
+        'serie': serie.id if serie else None,
+        'disciplina': disciplina.id if disciplina else None,
+        'escolas': escolas,
+        'localidade': localidade.id if localidade else None,
+        'esfera': esfera.id if esfera else None,
+        'tem_esferas': anos_esfera.exists(),
+    }
+
+
+def montar_casos(f):
+    """
+    Lista de (nome, url, params) por rota nomeada de core/urls.py.
+    Cada rota é exercitada com os filtros que os usuários costumam aplicar.
+    """
+    escola = f['escolas'][0] if f['escolas'] else 0
+    escola2 = f['escolas'][-1] if f['escolas'] else 0
+    filtro_ads = {'ano': f['ano'], 'serie': f['serie'], 'disciplina': f['disciplina']}
+    anos = f['anos']
+
+    casos = {
+        'dashboard': [('', {'ano': f['ano']})],
+        'dados_graficos': [
+            ('sem_filtro', {}),
+            ('ano_serie', {'ano': f['ano'], 'serie': f['serie']}),
+            ('localidade', {'ano': f['ano'], 'localidade': f['localidade']}),
+        ],
+        'detalhes_escola': [('', {}, {'escola_id': escola})],
+        'comparacao_anos': [
+            ('dois_anos', {'anos': ','.join(map(str, anos[:2])) or None}),
+            ('todos', {'anos': ','.join(map(str, f['todos_anos'])) or None}),
+        ],
+        'comparacao_escolas': [('', {'escola1': escola, 'escola2': escola2, 'serie': f['serie']})],
+        'ranking_geral': [('', filtro_ads)],
+        'painel_localidade': [('', filtro_ads)],
+        'relatorios': [('', {'localidade': f['localidade']})],
+        'relatorio_pdf': [('', {'localidade': f['localidade']})],
+        'boletim_escola_html': [('', {}, {'escola_id': escola})],
+        'boletim_escola': [('', {}, {'escola_id': escola})],
+        'boletim_escola_pdf': [('', {}, {'escola_id': escola})],
+        'grafico_escola': [
+            ('distribuicao', {}, {'escola_id': escola, 'tipo': 'distribuicao'}),
+            ('evolucao', {}, {'escola_id': escola, 'tipo': 'evolucao'}),
+        ],
+        'selecionar_escola_boletim': [('', {}), ('busca', {'q': 'escola'})],
+        'buscar_escolas': [('nome', {'q': 'escola mun'}), ('curto', {'q': 'sa'})],
+        'buscar_habilidades': [('tema', {'q': 'frações'}), ('frase', {'q': 'inferir informação'})],
+        'relatorio_escolas_participantes': [('', {'localidade': f['localidade']})],
+        'painel_esferas': [('', {'disciplina': f['disciplina'], 'serie': f['serie']})],
+        'comparativo_habilidades': [('', {
+            'esfera': f['esfera'], 'serie': f['serie'], 'disciplina': f['disciplina'],
+        })],
+        'dashboard_desempenho': [('sem_filtro', {}), ('ano', {'ano': f['ano']})],
+        'comparativo_geral': [('', {})],
+        'comparativo_habilidade_escolas': [
+            ('rede', filtro_ads),
+            ('localidade', dict(filtro_ads, localidade=f['localidade'])),
+        ],
+    }
+
+    resultado = []
+    for nome_rota, variantes in casos.items():
+        for variante in variantes:
+            rotulo, params = variante[0], variante[1]
+            kwargs = variante[2] if len(variante) > 2 else None
+            nome = f'{nome_rota}:{rotulo}' if rotulo else nome_rota
+            params = {k: v for k, v in params.items() if v is not None}
+            resultado.append((nome, reverse(nome_rota, kwargs=kwargs), params))
+    return resultado, set(casos)
+
+
+def rotas_nomeadas():
+    return {
+        p.name for p in get_resolver().url_patterns
+        if getattr(p, 'name', None) and p.name not in ROTAS_IGNORADAS
+    }
+
+
+def medir(client, url, params, repeticoes):
+    """
+    Executa a rota N vezes; devolve mediana de latência, queries e pico de
+    memória. As queries são contadas em todos os bancos (primário e
+    réplicas de leitura, ver core/roteadores.py).
+    """
+    latencias = []
+    queries = 0
+    pico = 0
+    status = None
+    for _ in range(repeticoes):
+        tracemalloc.start()
+        with ExitStack() as pilha:
+            capturas = [
+                pilha.enter_context(CaptureQueriesContext(connections[alias])) for alias in connections
+            ]
+            inicio = time.perf_counter()
+            resposta = client.get(url, params)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+        pico = max(pico, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        queries = sum(len(ctx.captured_queries) for ctx in capturas)
+        status = resposta.status_code
+    return {
+        'status': status,
+        'latencia_ms': round(statistics.median(latencias), 2),
+        'queries': queries,
+        'memoria_kb': round(pico / 1024, 1),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Mede latência, queries e memória de todas as rotas do painel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticoes', type=int, default=5)
+        parser.add_argument('--baseline', default=str(BASELINE_PADRAO))
+        parser.add_argument('--salvar-baseline', action='store_true')
+        parser.add_argument('--tolerancia-latencia', type=float, default=0.25,
+                            help='Aumento relativo de latência tolerado (0.25 = 25%%)')
+        parser.add_argument('--tolerancia-memoria', type=float, default=0.25)
+        parser.add_argument('--apenas', nargs='*', default=None,
+                            help='Mede apenas as rotas com estes nomes')
+
+    def handle(self, *args, **opts):
+        casos, cobertas = montar_casos(filtros_representativos())
+
+        faltando = rotas_nomeadas() - cobertas
+        if faltando:
+            self.stdout.write(self.style.WARNING(
+                f'Rotas sem caso de benchmark: {", ".join(sorted(faltando))}'
+            ))
+
+        if opts['apenas']:
+            casos = [c for c in casos if c[0].split(':')[0] in opts['apenas']]
+
+        client = Client(HTTP_HOST='localhost', raise_request_exception=False)
+        # Aquece caches de template/conexão antes de medir
+        for _, url, params in casos:
+            client.get(url, params)
+
+        resultados = {}
+        self.stdout.write(f'{"rota":45} {"status":>6} {"ms":>9} {"queries":>8} {"mem KB":>10}')
+        for nome, url, params in casos:
+            r = medir(client, url, params, opts['repeticoes'])
+            resultados[nome] = r
+            self.stdout.write(
+                f'{nome:45} {r["status"]:>6} {r["latencia_ms"]:>9.2f} '
+                f'{r["queries"]:>8} {r["memoria_kb"]:>10.1f}'
+            )
+
+        caminho = Path(opts['baseline'])
+        if opts['salvar_baseline']:
+            caminho.parent.mkdir(parents=True, exist_ok=True)
+            caminho.write_text(json.dumps(resultados, indent=2, ensure_ascii=False))
+            self.stdout.write(self.style.SUCCESS(f'Baseline salva em {caminho}'))
+            return
+
+        if not caminho.exists():
+            # Sem baseline não há comparação: passar em silêncio esconderia regressões
+            raise CommandError(
+                f'Nenhuma baseline em {caminho}; use --salvar-baseline para criar uma.'
+            )
+
+        baseline = json.loads(caminho.read_text())
+        sem_baseline = sorted(set(resultados) - set(baseline))
+        if sem_baseline:
+            self.stdout.write(self.style.WARNING(
+                f'Rotas sem valores na baseline (não comparadas): {", ".join(sem_baseline)}; '
+                f'use --salvar-baseline para incluí-las.'
+            ))
+        regressoes = self.comparar(baseline, resultados, opts)
+        if regressoes:
+            for linha in regressoes:
+                self.stdout.write(self.style.ERROR(linha))
+            raise CommandError(f'{len(regressoes)} regressão(ões) em relação à baseline')
+        self.stdout.write(self.style.SUCCESS('Sem regressões em relação à baseline'))
+
+    def comparar(self, baseline, atual, opts):
+        regressoes = []
+        for nome, r in atual.items():
+            base = baseline.get(nome)
+            if not base:
+                continue
+            if r['status'] != base['status']:
+                regressoes.append(f'{nome}: status {base["status"]} -> {r["status"]}')
+            if r['queries'] > base['queries']:
+                regressoes.append(f'{nome}: queries {base["queries"]} -> {r["queries"]}')
+            if r['latencia_ms'] > base['latencia_ms'] * (1 + opts['tolerancia_latencia']):
+                regressoes.append(
+                    f'{nome}: latência {base["latencia_ms"]}ms -> {r["latencia_ms"]}ms'
+                )
+            if r['memoria_kb'] > base['memoria_kb'] * (1 + opts['tolerancia_memoria']):
+                regressoes.append(
+                    f'{nome}: memória {base["memoria_kb"]}KB -> {r["memoria_kb"]}KB'
+                )
+        return regressoes
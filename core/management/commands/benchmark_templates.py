@@ -0,0 +1,78 @@
+"""
+Benchmark de renderização dos templates mais pesados (boletim e esferas),
+separado do tempo das views: o contexto é capturado uma vez pela rota real
+e o template é renderizado N vezes com os fragmentos `{% cache %}`
+desligados e ligados.
+
+Uso:
+    python manage.py benchmark_templates
+    python manage.py benchmark_templates --repeticoes 50
+"""
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.template import engines
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from .benchmark_rotas import filtros_representativos, montar_casos
+
+
+# caso de benchmark_rotas -> template renderizado pela rota
+CASOS = {
+    'boletim_escola_html': 'dashboard/boletim_escola.html',
+    'painel_esferas': 'dashboard/painel_esferas.html',
+    'comparativo_geral': 'dashboard/painel_comparativo_geral.html',
+}
+
+
+def capturar_contexto(client, url, params, nome_template):
+    """Executa a rota com templates instrumentados e devolve o contexto do template."""
+    setup_test_environment()
+    # Pasta de publicação vazia: o boletim publicado não passaria pelo template
+    try:
+        with tempfile.TemporaryDirectory() as vazia, override_settings(BOLETINS_DIR=vazia):
+            resposta = client.get(url, params)
+    finally:
+        teardown_test_environment()
+    for template, contexto in zip(resposta.templates, resposta.context or []):
+        if template.name == nome_template:
+            return resposta.wsgi_request, contexto.flatten()
+    raise CommandError(f'{url} não renderizou {nome_template} (status {resposta.status_code})')
+
+
+def medir(template, contexto, request, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        template.render(contexto, request)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+class Command(BaseCommand):
+    help = 'Mede o tempo de renderização dos templates de boletim e esferas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticoes', type=int, default=20)
+
+    def handle(self, *args, **opts):
+        casos = {nome: (url, params) for nome, url, params in montar_casos(filtros_representativos())[0]}
+        client = Client(HTTP_HOST='localhost', raise_request_exception=False)
+        motor = engines['django']
+
+        self.stdout.write(f'{"template":45} {"sem cache ms":>13} {"com cache ms":>13}')
+        for caso, nome_template in CASOS.items():
+            url, params = casos[caso]
+            request, contexto = capturar_contexto(client, url, params, nome_template)
+            template = motor.get_template(nome_template)
+
+            # tempo_cache=0: o {% cache %} não guarda nada e renderiza sempre
+            sem_cache = medir(template, dict(contexto, tempo_cache=0), request, opts['repeticoes'])
+            contexto.pop('tempo_cache', None)
+            template.render(contexto, request)  # aquece os fragmentos
+            com_cache = medir(template, contexto, request, opts['repeticoes'])
+
+            self.stdout.write(f'{nome_template:45} {sem_cache:>13.2f} {com_cache:>13.2f}')
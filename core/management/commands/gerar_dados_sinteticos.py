@@ -0,0 +1,272 @@
+"""
+Gera uma base sintética com volumes de rede estadual (BA) para testes de
+carga: escolas, localidades, desempenho por escola/esfera e resultados por
+habilidade.
+
+Escolas, localidades, esferas e habilidades geradas são próprias (nunca as
+reais), e todo fato gerado aponta para uma delas: --limpar remove tudo por
+essas dimensões com DELETE direto, sem tocar nos dados de produção.
+
+Uso:
+    python manage.py gerar_dados_sinteticos --escolas 5000 --anos 10
+    python manage.py gerar_dados_sinteticos --limpar
+"""
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Q
+
+from core import dimensoes, particionamento
+from core.models import (
+    Localidade, Escola, Disciplina, Serie, Esfera,
+    DesempenhoEscola, DesempenhoEsfera, EvolucaoEscola,
+    Hab, ResultadoHabEscola, EstatisticaHabilidade,
+)
+
+
+SERIES_PADRAO = ['2º ano', '5º ano', '9º ano']
+DISCIPLINAS_PADRAO = [('LP', 'LP'), ('MT', 'MT')]
+ESFERAS_PADRAO = ['ESTADUAL', 'REGIONAL', 'MUNICIPAL']
+
+# Marcador usado para identificar (e limpar) as linhas geradas
+MARCA_SINTETICA = 'sintetico'
+# Prefixos das dimensões próprias da base sintética
+LOCALIDADE_SINTETICA = 'Localidade sintética'
+ESFERA_SINTETICA = '(sintética)'
+HAB_SINTETICA = 'Habilidade sintética'
+
+# Proficiência média "típica" por série (escalas SAEB usadas nos painéis)
+PROFICIENCIA_BASE = {
+    '2º ano': (740, 40),
+    '5º ano': (210, 30),
+    '9º ano': (260, 35),
+}
+
+
+class Command(BaseCommand):
+    help = 'Gera dados sintéticos em volume de rede estadual para benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escolas', type=int, default=5000)
+        parser.add_argument('--localidades', type=int, default=417)
+        parser.add_argument('--anos', type=int, default=10)
+        parser.add_argument('--ano-final', type=int, default=2025)
+        parser.add_argument('--habilidades', type=int, default=40,
+                            help='Habilidades por (série, disciplina)')
+        parser.add_argument('--lote', type=int, default=5000,
+                            help='Tamanho do lote do bulk_create')
+        parser.add_argument('--semente', type=int, default=42)
+        parser.add_argument('--limpar', action='store_true',
+                            help='Remove os dados sintéticos gerados anteriormente e sai')
+
+    def handle(self, *args, **opts):
+        if opts['limpar']:
+            self._limpar()
+            return
+
+        rnd = random.Random(opts['semente'])
+        lote = opts['lote']
+        anos = list(range(opts['ano_final'] - opts['anos'] + 1, opts['ano_final'] + 1))
+        inicio = time.perf_counter()
+
+        series = [Serie.objects.get_or_create(nome=nome)[0] for nome in SERIES_PADRAO]
+        disciplinas = [
+            Disciplina.objects.get_or_create(nome=nome, defaults={'codigo': codigo})[0]
+            for nome, codigo in DISCIPLINAS_PADRAO
+        ]
+        esferas = [
+            Esfera.objects.get_or_create(nome=f'{nome} {ESFERA_SINTETICA}')[0] for nome in ESFERAS_PADRAO
+        ]
+
+        habs = self._gerar_habilidades(series, disciplinas, opts['habilidades'])
+        escolas = self._gerar_escolas(rnd, opts['escolas'], opts['localidades'], lote)
+
+        self.stdout.write(f'Dimensões prontas: {len(escolas)} escolas, {len(habs)} habilidades')
+
+        total_desemp = total_habs = 0
+        for ano in anos:
+            particionamento.garantir_ano(ano)
+            with transaction.atomic():
+                d, h = self._gerar_ano(rnd, ano, escolas, series, disciplinas, habs, lote)
+                self._gerar_esferas(rnd, ano, esferas, series, disciplinas, habs)
+            total_desemp += d
+            total_habs += h
+            self.stdout.write(f'  {ano}: {d} desempenhos, {h} resultados de habilidade')
+
+        # bulk_create não dispara signals: invalida o cache de dimensões manualmente
+        dimensoes.invalidar()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Concluído em {time.perf_counter() - inicio:.1f}s — '
+            f'{total_desemp} desempenhos, {total_habs} resultados por habilidade'
+        ))
+
+    # ============================================================
+    # DIMENSÕES
+    # ============================================================
+
+    def _gerar_habilidades(self, series, disciplinas, quantidade):
+        habs = {}
+        for serie in series:
+            num = ''.join(c for c in serie.nome if c.isdigit()).zfill(2)
+            for disc in disciplinas:
+                # Código fora do formato BNCC (EF05LP01): nunca coincide com uma habilidade real
+                sinteticas = Hab.objects.filter(
+                    serie=serie, disciplina=disc, dc_hab__startswith=HAB_SINTETICA
+                )
+                existentes = set(sinteticas.values_list('cd_hab', flat=True))
+                novas = []
+                for i in range(1, quantidade + 1):
+                    cd = f'SX{num}{disc.codigo or disc.nome}{i:02d}'
+                    if cd not in existentes:
+                        novas.append(Hab(
+                            serie=serie, disciplina=disc, cd_hab=cd,
+                            dc_hab=f'{HAB_SINTETICA} {cd}',
+                        ))
+                Hab.objects.bulk_create(novas)
+                habs[(serie.id, disc.id)] = list(sinteticas.order_by('cd_hab')[:quantidade])
+        return habs
+
+    def _gerar_escolas(self, rnd, quantidade, n_localidades, lote):
+        nomes = [f'{LOCALIDADE_SINTETICA} {i:03d}' for i in range(1, n_localidades + 1)]
+        # Rodar de novo reaproveita as localidades de execuções anteriores
+        existentes = set(Localidade.objects.filter(nome__in=nomes).values_list('nome', flat=True))
+        Localidade.objects.bulk_create([Localidade(nome=nome) for nome in nomes if nome not in existentes])
+        # bulk_create não devolve pk em todos os bancos; recarrega pelos nomes
+        localidades = list(Localidade.objects.filter(nome__in=nomes))
+
+        proximo_id = (Escola.objects.aggregate(m=Max('id'))['m'] or 0) + 1
+        escolas = []
+        for i in range(quantidade):
+            eid = proximo_id + i
+            escolas.append(Escola(
+                id=eid,
+                inep=f'9{eid:07d}',
+                nome=f'ESCOLA SINTÉTICA {eid:05d}',
+                endereco=f'RUA {rnd.randint(1, 999)}',
+                bairrodistrito=f'Bairro {rnd.randint(1, 200)}',
+                gestor='Não informado',
+                localidade=rnd.choice(localidades),
+                dados={MARCA_SINTETICA: True},
+            ))
+        Escola.objects.bulk_create(escolas, batch_size=lote)
+        return escolas
+
+    # ============================================================
+    # FATOS
+    # ============================================================
+
+    def _niveis(self, rnd):
+        pesos = [rnd.random() + 0.05 for _ in range(4)]
+        total = sum(pesos)
+        valores = [round(p / total * 100, 2) for p in pesos]
+        valores[-1] = round(100 - sum(valores[:-1]), 2)
+        return valores
+
+    def _gerar_ano(self, rnd, ano, escolas, series, disciplinas, habs, lote):
+        desempenhos = []
+        resultados = []
+        total_desemp = total_habs = 0
+
+        for escola in escolas:
+            for serie in series:
+                media, desvio = PROFICIENCIA_BASE.get(serie.nome, (250, 40))
+                previstos = rnd.randint(15, 120)
+                avaliados = rnd.randint(int(previstos * 0.6), previstos)
+                for disc in disciplinas:
+                    ab, ba, ad, av = self._niveis(rnd)
+                    taxa = round(avaliados / previstos * 100, 2)
+                    desempenhos.append(DesempenhoEscola(
+                        escola=escola, ano=ano, disciplina=disc, serie=serie,
+                        alunos_previstos=previstos,
+                        alunos_avaliados=avaliados,
+                        percentual_avaliados=taxa,
+                        taxa_participacao=taxa,
+                        proficiencia_media=round(rnd.gauss(media, desvio), 2),
+                        abaixo_basico=ab, basico=ba, adequado=ad, avancado=av,
+                    ))
+                    for hab in habs[(serie.id, disc.id)]:
+                        resultados.append(ResultadoHabEscola(
+                            ano=ano, escola=escola, serie=serie, disciplina=disc, hab=hab,
+                            tx_acerto=ResultadoHabEscola.para_pontos_base(min(100, max(0, rnd.gauss(55, 18)))),
+                        ))
+
+            if len(resultados) >= lote:
+                ResultadoHabEscola.objects.bulk_create(resultados, batch_size=lote)
+                total_habs += len(resultados)
+                resultados = []
+            if len(desempenhos) >= lote:
+                DesempenhoEscola.objects.bulk_create(desempenhos, batch_size=lote)
+                total_desemp += len(desempenhos)
+                desempenhos = []
+
+        DesempenhoEscola.objects.bulk_create(desempenhos, batch_size=lote)
+        ResultadoHabEscola.objects.bulk_create(resultados, batch_size=lote)
+        return total_desemp + len(desempenhos), total_habs + len(resultados)
+
+    def _gerar_esferas(self, rnd, ano, esferas, series, disciplinas, habs):
+        desempenhos = []
+        resultados = []
+        for esfera in esferas:
+            for serie in series:
+                media, desvio = PROFICIENCIA_BASE.get(serie.nome, (250, 40))
+                for disc in disciplinas:
+                    previstos = rnd.randint(50_000, 200_000)
+                    avaliados = int(previstos * rnd.uniform(0.8, 0.98))
+                    ab, ba, ad, av = self._niveis(rnd)
+                    desempenhos.append(DesempenhoEsfera(
+                        esfera=esfera, ano=ano, disciplina=disc, serie=serie,
+                        alunos_previstos=previstos,
+                        alunos_avaliados=avaliados,
+                        percentual_avaliados=round(avaliados / previstos * 100, 2),
+                        proficiencia_media=round(rnd.gauss(media, desvio / 3), 2),
+                        abaixo_basico=ab, basico=ba, adequado=ad, avancado=av,
+                        observacoes=MARCA_SINTETICA,
+                    ))
+                    for hab in habs[(serie.id, disc.id)]:
+                        resultados.append(ResultadoHabEscola(
+                            ano=ano, nivel=ResultadoHabEscola.NIVEL_ESFERA, esfera=esfera,
+                            serie=serie, disciplina=disc, hab=hab,
+                            tx_acerto=ResultadoHabEscola.para_pontos_base(min(100, max(0, rnd.gauss(55, 10)))),
+                        ))
+        DesempenhoEsfera.objects.bulk_create(desempenhos, ignore_conflicts=True)
+        ResultadoHabEscola.objects.bulk_create(resultados, ignore_conflicts=True)
+
+    # ============================================================
+    # LIMPEZA
+    # ============================================================
+
+    def _limpar(self):
+        """
+        Remove a base sintética por DELETE direto (_raw_delete), dos fatos
+        para as dimensões: a cascata do ORM carregaria cada linha e
+        dispararia os signals de invalidação e de estatísticas uma a uma.
+        """
+        escolas = Escola.objects.filter(dados__sintetico=True).values('id')
+        localidades = Localidade.objects.filter(nome__startswith=LOCALIDADE_SINTETICA).values('id')
+        esferas = Esfera.objects.filter(nome__endswith=ESFERA_SINTETICA).values('id')
+        habs = Hab.objects.filter(dc_hab__startswith=HAB_SINTETICA).values('id')
+
+        def apagar(queryset):
+            return queryset._raw_delete(queryset.db)
+
+        with transaction.atomic():
+            apagar(ResultadoHabEscola.objects.filter(
+                Q(escola_id__in=escolas) | Q(esfera_id__in=esferas) | Q(hab_id__in=habs)
+            ))
+            apagar(EstatisticaHabilidade.objects.filter(Q(hab_id__in=habs) | Q(localidade_id__in=localidades)))
+            apagar(DesempenhoEscola.objects.filter(escola_id__in=escolas))
+            apagar(EvolucaoEscola.objects.filter(escola_id__in=escolas))
+            apagar(DesempenhoEsfera.objects.filter(Q(esfera_id__in=esferas) | Q(observacoes=MARCA_SINTETICA)))
+            n_escolas = apagar(Escola.objects.filter(dados__sintetico=True))
+            n_loc = apagar(Localidade.objects.filter(nome__startswith=LOCALIDADE_SINTETICA))
+            n_esferas = apagar(Esfera.objects.filter(nome__endswith=ESFERA_SINTETICA))
+            n_habs = apagar(Hab.objects.filter(dc_hab__startswith=HAB_SINTETICA))
+        # DELETE direto não dispara signals: invalida o cache de dimensões manualmente
+        dimensoes.invalidar()
+        self.stdout.write(self.style.SUCCESS(
+            f'Removidos: {n_escolas} escolas, {n_loc} localidades, '
+            f'{n_esferas} esferas e {n_habs} habilidades sintéticas (com seus resultados)'
+        ))
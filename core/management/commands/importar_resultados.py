@@ -0,0 +1,90 @@
+"""
+Importa resultados de arquivos CSV gravando apenas as linhas novas ou
+alteradas. Aceita arquivos, diretórios (todos os .csv, recursivamente) e
+globs; os arquivos são lidos em paralelo e gravados por um único escritor.
+As dimensões podem vir por id (`escola_id`...) ou por texto (`inep`,
+`escola`, `serie`, `disciplina`, `cd_hab` e, opcional, `dc_hab`).
+
+Uso:
+    python manage.py importar_resultados desempenho core_desempenhoescola.csv
+    python manage.py importar_resultados habilidade entregas/2025/ --processos 8
+    python manage.py importar_resultados habilidade "entregas/*/MT_*.csv" --simular
+
+Ao final de uma importação com linhas novas ou alteradas os boletins
+estáticos são republicados (publicar_boletins), salvo --sem-publicar.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from core import importacao, publicacao
+
+
+class Command(BaseCommand):
+    help = 'Importação incremental (por checksum) de DesempenhoEscola ou ResultadoHabEscola'
+
+    def add_arguments(self, parser):
+        parser.add_argument('fato', choices=sorted(importacao.FATOS))
+        parser.add_argument('caminhos', nargs='+', help='Arquivos, diretórios ou globs')
+        parser.add_argument('--processos', type=int, default=None,
+                            help='Processos de leitura (padrão: núcleos da máquina)')
+        parser.add_argument('--lote', type=int, default=importacao.LOTE,
+                            help='Linhas por lote enviado ao escritor')
+        parser.add_argument('--fila', type=int, default=importacao.TAMANHO_FILA,
+                            help='Lotes em trânsito entre leitores e escritor')
+        parser.add_argument('--simular', action='store_true',
+                            help='Executa tudo e desfaz no final (só conta)')
+        parser.add_argument('--sem-publicar', action='store_true',
+                            help='Não republica os boletins estáticos ao final')
+
+    def handle(self, *args, **opts):
+        caminhos = importacao.expandir_caminhos(opts['caminhos'])
+        if not caminhos:
+            raise CommandError('Nenhum arquivo encontrado')
+
+        r = importacao.importar_arquivos(
+            caminhos, opts['fato'],
+            processos=opts['processos'],
+            tamanho_lote=opts['lote'],
+            tamanho_fila=opts['fila'],
+            simular=opts['simular'],
+            progresso=self.progresso,
+        )
+        self.stdout.write('')
+
+        for caminho, erro in r['erros'].items():
+            self.stdout.write(self.style.ERROR(f'  {erro}'))
+        for aviso in r['avisos']:
+            self.stdout.write(self.style.WARNING(f'  {aviso}'))
+
+        self.stdout.write(
+            f'{r["arquivos"]}/{r["total_arquivos"]} arquivos: {r["inseridos"]} inseridos, '
+            f'{r["atualizados"]} atualizados, {r["inalterados"]} inalterados, '
+            f'{r["rejeitados"]} rejeitados em {r["segundos"]:.1f}s'
+        )
+        if r['dimensoes_criadas']:
+            self.stdout.write(f'  {r["dimensoes_criadas"]} séries/disciplinas/habilidades criadas')
+        if r['anos']:
+            self.stdout.write(f'  anos alterados: {", ".join(map(str, r["anos"]))}')
+
+        if opts['simular']:
+            self.stdout.write(self.style.WARNING('Simulação: nada foi gravado'))
+        elif r['erros']:
+            raise CommandError(f'{len(r["erros"])} arquivo(s) com erro não foram importados')
+        else:
+            self.stdout.write(self.style.SUCCESS('Importação concluída'))
+            if not opts['sem_publicar'] and (r['inseridos'] or r['atualizados']):
+                # Toda importação muda a versão de dados; escolas sem dados
+                # alterados só têm o registro confirmado no manifesto
+                p = publicacao.publicar()
+                self.stdout.write(
+                    f'Boletins publicados: {p["renderizadas"]} renderizados, '
+                    f'{p["inalteradas"]} inalterados'
+                )
+
+    def progresso(self, r):
+        taxa = r['linhas'] / r['segundos'] if r['segundos'] else 0
+        self.stdout.write(
+            f'\r  {r["arquivos"]}/{r["total_arquivos"]} arquivos, '
+            f'{r["linhas"]} linhas, {taxa:,.0f} linhas/s',
+            ending=''
+        )
+        self.stdout.flush()
@@ -0,0 +1,66 @@
+"""
+Gerencia as partições por ano das tabelas fato (DesempenhoEscola e
+ResultadoHabEscola).
+
+Uso:
+    python manage.py particoes_ano --criar 2026        # antes de importar 2026
+    python manage.py particoes_ano --desanexar 2015    # tira 2015 das consultas
+    python manage.py particoes_ano --listar
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core import particionamento
+
+
+class Command(BaseCommand):
+    help = 'Cria, desanexa ou lista as partições por ano das tabelas fato'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--criar', type=int, action='append', default=[], metavar='ANO',
+                            help='Cria a partição do ano (pode repetir)')
+        parser.add_argument('--desanexar', type=int, action='append', default=[], metavar='ANO',
+                            help='Desanexa a partição do ano, mantendo-a como tabela avulsa')
+        parser.add_argument('--listar', action='store_true')
+
+    def handle(self, *args, **opts):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Particionamento disponível apenas no PostgreSQL')
+        if not (opts['criar'] or opts['desanexar'] or opts['listar']):
+            raise CommandError('Informe --criar, --desanexar ou --listar')
+
+        with connection.cursor() as cursor:
+            tabelas = [
+                t for t in particionamento.tabelas_particionadas()
+                if particionamento.eh_particionada(cursor, t)
+            ]
+            if not tabelas:
+                raise CommandError('Nenhuma tabela particionada; aplique as migrações (0013)')
+
+            for ano in opts['criar']:
+                with transaction.atomic():
+                    for tabela in tabelas:
+                        movidas = particionamento.criar_particao(cursor, tabela, ano)
+                        if movidas is None:
+                            self.stdout.write(f'  {tabela}: partição {ano} já existe')
+                        else:
+                            self.stdout.write(self.style.SUCCESS(
+                                f'  {tabela}: partição {ano} criada ({movidas} linhas movidas da padrão)'
+                            ))
+
+            for ano in opts['desanexar']:
+                with transaction.atomic():
+                    for tabela in tabelas:
+                        if particionamento.desanexar_particao(cursor, tabela, ano):
+                            self.stdout.write(self.style.WARNING(
+                                f'  {tabela}: partição {ano} desanexada '
+                                f'(tabela avulsa {particionamento.nome_particao(tabela, ano)})'
+                            ))
+                        else:
+                            self.stdout.write(f'  {tabela}: partição {ano} não existe')
+
+            if opts['listar']:
+                for tabela in tabelas:
+                    self.stdout.write(tabela)
+                    for nome, faixa, linhas in particionamento.particoes(cursor, tabela):
+                        self.stdout.write(f'  {nome:45} {faixa:25} ~{max(linhas, 0)} linhas')
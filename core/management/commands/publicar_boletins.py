@@ -0,0 +1,41 @@
+"""
+Publica o boletim (HTML e PDF) de cada escola como arquivo estático em
+BOLETINS_DIR; as rotas de boletim passam a entregar esses arquivos sem
+consultar o banco. Só as escolas com dados alterados desde a última
+publicação são renderizadas de novo. Executado também ao final de
+importar_resultados.
+
+Uso:
+    python manage.py publicar_boletins
+    python manage.py publicar_boletins --escola 12 --escola 40
+    python manage.py publicar_boletins --forcar      # depois de mudar o template
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import publicacao
+
+
+class Command(BaseCommand):
+    help = 'Renderiza os boletins das escolas em arquivos estáticos com nomes por hash'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escola', type=int, action='append', dest='escolas',
+                            help='Publica só esta escola (pode repetir)')
+        parser.add_argument('--forcar', action='store_true',
+                            help='Renderiza de novo mesmo as escolas sem dados alterados')
+
+    def handle(self, *args, **opts):
+        inicio = time.perf_counter()
+        r = publicacao.publicar(opts['escolas'], forcar=opts['forcar'], progresso=self.progresso)
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f'{r["renderizadas"]} boletins renderizados, {r["inalteradas"]} inalterados, '
+            f'{r["arquivos_gravados"]} arquivos gravados, {r["removidos"]} removidos '
+            f'em {time.perf_counter() - inicio:.1f}s ({publicacao.diretorio()})'
+        ))
+
+    def progresso(self, feitas, total):
+        self.stdout.write(f'\r  {feitas}/{total} escolas', ending='')
+        self.stdout.flush()
@@ -0,0 +1,58 @@
+"""
+Recalcula os campos derivados (participação, normalização dos níveis,
+posição no município e variação vs ano anterior) de DesempenhoEscola e
+DesempenhoEsfera com UPDATEs em lote. Ver core/recalculo.py. Os boletins
+estáticos das escolas alteradas são republicados, salvo --sem-publicar.
+
+Uso:
+    python manage.py recalcular_campos --ano 2024
+    python manage.py recalcular_campos --modelo esfera --etapa posicao --etapa variacao
+    python manage.py recalcular_campos --simular
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from core import recalculo
+
+
+class Command(BaseCommand):
+    help = 'Recalcula campos derivados dos desempenhos por ano, sem save() por linha'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ano', type=int, action='append', dest='anos',
+                            help='Ano a recalcular (pode repetir; padrão: todos)')
+        parser.add_argument('--modelo', choices=[*recalculo.MODELOS, 'todos'], default='todos')
+        parser.add_argument('--etapa', choices=recalculo.ETAPAS, action='append', dest='etapas',
+                            help='Etapa a executar (pode repetir; padrão: todas)')
+        parser.add_argument('--simular', action='store_true',
+                            help='Executa tudo e desfaz no final (só conta)')
+        parser.add_argument('--sem-publicar', action='store_true',
+                            help='Não republica os boletins estáticos ao final')
+
+    def handle(self, *args, **opts):
+        nomes = list(recalculo.MODELOS) if opts['modelo'] == 'todos' else [opts['modelo']]
+        for nome in nomes:
+            linhas = recalculo.MODELOS[nome]['modelo'].objects.all()
+            if opts['anos']:
+                linhas = linhas.filter(ano__in=opts['anos'])
+            try:
+                r = recalculo.recalcular(
+                    linhas, etapas=opts['etapas'] or recalculo.ETAPAS, simular=opts['simular'],
+                    publicar=not opts['sem_publicar'],
+                )
+            except RuntimeError as erro:
+                raise CommandError(str(erro))
+
+            self.stdout.write(f'{nome} (anos {", ".join(map(str, r["anos"])) or "-"}):')
+            for etapa, e in r['etapas'].items():
+                self.stdout.write(f'  {etapa:15} {e["linhas"]:>8} linhas {e["segundos"] * 1000:>9.1f} ms')
+            self.stdout.write(self.style.SUCCESS(
+                f'  {r["linhas"]} linhas alteradas em {r["segundos"]:.2f}s'
+            ))
+            if r['boletins']:
+                self.stdout.write(
+                    f'  Boletins publicados: {r["boletins"]["renderizadas"]} renderizados, '
+                    f'{r["boletins"]["inalteradas"]} inalterados'
+                )
+
+        if opts['simular']:
+            self.stdout.write(self.style.WARNING('Simulação: nada foi gravado'))
@@ -0,0 +1,90 @@
+"""
+Restaura um backup do pg_dump (formato custom, como os bakup_sabe_*.sql)
+nas tabelas core_* do banco configurado, conferindo a contagem de linhas
+de cada tabela antes de aplicar.
+
+Uso:
+    python manage.py restaurar_backup bakup_sabe_19_03_26.sql             # troca tudo
+    python manage.py restaurar_backup bakup_sabe_19_03_26.sql --delta     # só as diferenças
+    python manage.py restaurar_backup teste.sql --tabela core_escola --simular
+"""
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import restauracao
+
+
+class Command(BaseCommand):
+    help = 'Restaura um backup do pg_dump nas tabelas do Django (troca atômica ou delta)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Arquivo do pg_dump em formato custom')
+        parser.add_argument('--delta', action='store_true',
+                            help='Aplica só as linhas novas, alteradas e removidas')
+        parser.add_argument('--tabela', action='append', dest='tabelas', metavar='TABELA',
+                            help='Restaura só esta tabela (pode repetir); padrão: todas as core_*')
+        parser.add_argument('--processos', type=int, default=None,
+                            help='Tabelas extraídas em paralelo (padrão: núcleos da máquina)')
+        parser.add_argument('--simular', action='store_true',
+                            help='Carrega e confere tudo, aplica e desfaz no final')
+        parser.add_argument('--manter-esquema', action='store_true',
+                            help=f'Não apaga o esquema "{restauracao.ESQUEMA}" ao terminar')
+        parser.add_argument('--pg-restore', default='pg_restore',
+                            help='Caminho do executável pg_restore')
+
+    def handle(self, *args, **opts):
+        if not os.path.isfile(opts['arquivo']):
+            raise CommandError(f'Arquivo não encontrado: {opts["arquivo"]}')
+
+        modo = 'delta' if opts['delta'] else 'troca'
+        try:
+            r = restauracao.restaurar(
+                opts['arquivo'], modo,
+                tabelas=opts['tabelas'],
+                processos=opts['processos'],
+                simular=opts['simular'],
+                manter_esquema=opts['manter_esquema'],
+                pg_restore=opts['pg_restore'],
+                progresso=self.progresso,
+            )
+        except FileNotFoundError:
+            raise CommandError(f'Executável não encontrado: {opts["pg_restore"]}')
+
+        for tabela, c in r['tabelas'].items():
+            linha = f'  {tabela:35} backup {c.get("backup", "-"):>9}  atuais {c.get("atuais", "?"):>9}'
+            if 'convertidas' in c:
+                linha += f'  convertidas {c["convertidas"]}'
+            if 'inseridas' in c:
+                linha += f'  +{c["inseridas"]}'
+            if modo == 'delta' and 'atualizadas' in c:
+                linha += f' ~{c["atualizadas"]} -{c["removidas"]}'
+                if c['mantidas']:
+                    linha += f' (mantidas {c["mantidas"]} ainda referenciadas)'
+            self.stdout.write(linha)
+        for tabela, c in r['legadas'].items():
+            self.stdout.write(f'  {tabela:35} backup {c.get("backup", "?"):>9}  (convertida)')
+        for tabela in r['esvaziadas']:
+            self.stdout.write(self.style.WARNING(
+                f'  {tabela}: referencia tabelas restauradas e não está no backup; esvaziada'
+            ))
+        for tabela, erro in r['erros'].items():
+            self.stdout.write(self.style.ERROR(f'  {tabela}: {erro}'))
+
+        if r['erros']:
+            raise CommandError(f'{len(r["erros"])} tabela(s) com erro; nada foi aplicado')
+        if not r['tabelas']:
+            raise CommandError('Nenhuma tabela core_* pedida está no backup')
+        if opts['simular']:
+            self.stdout.write(self.style.WARNING(f'Simulação ({modo}): nada foi gravado'))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'{len(r["tabelas"])} tabelas restauradas ({modo}) em {r["segundos"]:.1f}s'
+            ))
+
+    def progresso(self, tabela, r):
+        c = r['tabelas'].get(tabela) or r['legadas'][tabela]
+        if tabela in r['erros']:
+            self.stdout.write(self.style.ERROR(f'  {tabela}: falhou na extração'))
+        else:
+            self.stdout.write(f'  {tabela}: {c["backup"]} linhas extraídas')
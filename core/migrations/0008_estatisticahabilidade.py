@@ -0,0 +1,47 @@
+# Generated by Django 6.0.2 on 2026-04-02 10:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_resultadohabescola'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstatisticaHabilidade',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ano', models.IntegerField(verbose_name='Ano')),
+                ('nivel', models.CharField(choices=[('rede', 'Rede'), ('localidade', 'Localidade')], max_length=20, verbose_name='Nível')),
+                ('media', models.DecimalField(decimal_places=2, max_digits=5, verbose_name='Média (%)')),
+                ('mediana', models.DecimalField(decimal_places=2, max_digits=5, verbose_name='Mediana (%)')),
+                ('p10', models.DecimalField(decimal_places=2, max_digits=5, verbose_name='Percentil 10 (%)')),
+                ('p90', models.DecimalField(decimal_places=2, max_digits=5, verbose_name='Percentil 90 (%)')),
+                ('desvio_padrao', models.DecimalField(decimal_places=2, max_digits=5, verbose_name='Desvio Padrão')),
+                ('total_escolas', models.IntegerField(verbose_name='Total de Escolas')),
+                ('escolas_abaixo_25', models.IntegerField(verbose_name='Escolas abaixo de 25%')),
+                ('escolas_abaixo_50', models.IntegerField(verbose_name='Escolas abaixo de 50%')),
+                ('escolas_abaixo_75', models.IntegerField(verbose_name='Escolas abaixo de 75%')),
+                ('histograma', models.JSONField(help_text='Quantidade de escolas por faixa de 1 ponto percentual (índices 0 a 100)', verbose_name='Histograma')),
+                ('data_atualizacao', models.DateTimeField(auto_now=True, verbose_name='Data de Atualização')),
+                ('disciplina', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.disciplina', verbose_name='Disciplina')),
+                ('hab', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='estatisticas', to='core.hab', verbose_name='Habilidade')),
+                ('localidade', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.localidade', verbose_name='Localidade')),
+                ('serie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.serie', verbose_name='Série/Ano')),
+            ],
+            options={
+                'verbose_name': 'Estatística de Habilidade',
+                'verbose_name_plural': 'Estatísticas de Habilidades',
+                'ordering': ['ano', 'serie', 'disciplina', 'media'],
+                'indexes': [models.Index(fields=['ano', 'serie', 'disciplina', 'nivel', 'localidade'], name='core_estati_ano_ad167c_idx')],
+                'constraints': [
+                    models.UniqueConstraint(condition=models.Q(('nivel', 'rede')), fields=('ano', 'serie', 'disciplina', 'hab'), name='estat_hab_unica_rede'),
+                    models.UniqueConstraint(condition=models.Q(('nivel', 'localidade')), fields=('ano', 'serie', 'disciplina', 'hab', 'localidade'), name='estat_hab_unica_localidade'),
+                ],
+            },
+        ),
+    ]
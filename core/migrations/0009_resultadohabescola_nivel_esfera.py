@@ -0,0 +1,29 @@
+# Generated by Django 6.0.2 on 2026-04-06 09:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_estatisticahabilidade'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resultadohabescola',
+            name='nivel',
+            field=models.CharField(choices=[('escola', 'Escola'), ('esfera', 'Esfera')], default='escola', max_length=10, verbose_name='Nível'),
+        ),
+        migrations.AddField(
+            model_name='resultadohabescola',
+            name='esfera',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='resultados_hab', to='core.esfera', verbose_name='Esfera'),
+        ),
+        migrations.AlterField(
+            model_name='resultadohabescola',
+            name='escola',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.escola', verbose_name='Escola'),
+        ),
+    ]
@@ -0,0 +1,119 @@
+"""
+Incorpora as três gerações antigas de habilidades em Hab/ResultadoHabEscola:
+
+- Habilidade e Habilidade1 viram linhas de Hab, casadas por
+  (série, disciplina, código); a descrição existente em Hab é mantida.
+- ResultHab, ResultadoHabilidade1 e ResultadoHabilidade viram linhas de
+  ResultadoHabEscola com nivel='esfera'. Quando a mesma (ano, esfera,
+  habilidade) aparece em mais de uma tabela vale a geração mais nova,
+  nessa ordem.
+"""
+from django.db import migrations
+
+
+LOTE = 5000
+
+
+def _catalogo(apps):
+    """Mapa (serie_id, disciplina_id, código) -> hab_id, criando as Habs que faltarem."""
+    Hab = apps.get_model('core', 'Hab')
+    Habilidade = apps.get_model('core', 'Habilidade')
+    Habilidade1 = apps.get_model('core', 'Habilidade1')
+
+    catalogo = {
+        (s, d, cd.strip()): pk
+        for pk, s, d, cd in Hab.objects.values_list('id', 'serie_id', 'disciplina_id', 'cd_hab')
+    }
+
+    novas = {}
+    for modelo in (Habilidade1, Habilidade):
+        for s, d, cd, dc in modelo.objects.values_list(
+            'serie_id', 'disciplina_id', 'cd_habilidade', 'dc_habilidade'
+        ).iterator():
+            chave = (s, d, cd.strip())
+            if chave not in catalogo and chave not in novas:
+                novas[chave] = Hab(serie_id=s, disciplina_id=d, cd_hab=chave[2], dc_hab=dc)
+
+    Hab.objects.bulk_create(novas.values(), batch_size=LOTE)
+    catalogo.update({chave: hab.pk for chave, hab in novas.items()})
+    return catalogo
+
+
+def _hab_de_codigo(apps, catalogo, serie_id, disciplina_id, codigo):
+    """Resultados antigos podem citar códigos sem cadastro; cria a Hab sem descrição."""
+    chave = (serie_id, disciplina_id, codigo.strip())
+    if chave not in catalogo:
+        Hab = apps.get_model('core', 'Hab')
+        catalogo[chave] = Hab.objects.create(
+            serie_id=serie_id, disciplina_id=disciplina_id, cd_hab=chave[2], dc_hab=''
+        ).pk
+    return catalogo[chave]
+
+
+def migrar(apps, schema_editor):
+    ResultHab = apps.get_model('core', 'ResultHab')
+    ResultadoHabilidade = apps.get_model('core', 'ResultadoHabilidade')
+    ResultadoHabilidade1 = apps.get_model('core', 'ResultadoHabilidade1')
+    ResultadoHabEscola = apps.get_model('core', 'ResultadoHabEscola')
+
+    catalogo = _catalogo(apps)
+    # (ano, esfera_id, hab_id) -> (serie_id, disciplina_id, tx_acerto)
+    fatos = {}
+
+    for ano, esfera_id, hab_id, s, d, tx in ResultHab.objects.values_list(
+        'ano', 'esfera_id', 'hab_id', 'hab__serie_id', 'hab__disciplina_id', 'tx_acerto'
+    ).iterator():
+        fatos.setdefault((ano, esfera_id, hab_id), (s, d, tx))
+
+    for ano, esfera_id, s, d, cd, tx in ResultadoHabilidade1.objects.values_list(
+        'ano', 'esfera_id', 'habilidade__serie_id', 'habilidade__disciplina_id',
+        'habilidade__cd_habilidade', 'tx_acerto'
+    ).iterator():
+        hab_id = _hab_de_codigo(apps, catalogo, s, d, cd)
+        fatos.setdefault((ano, esfera_id, hab_id), (s, d, tx))
+
+    for ano, esfera_id, s, d, cd, tx in ResultadoHabilidade.objects.values_list(
+        'ano', 'esfera_id', 'serie_id', 'disciplina_id', 'cd_habilidade', 'tx_acerto'
+    ).iterator():
+        hab_id = _hab_de_codigo(apps, catalogo, s, d, cd)
+        fatos.setdefault((ano, esfera_id, hab_id), (s, d, tx))
+
+    ResultadoHabEscola.objects.bulk_create(
+        (
+            ResultadoHabEscola(
+                ano=ano, nivel='esfera', esfera_id=esfera_id, hab_id=hab_id,
+                serie_id=s, disciplina_id=d, tx_acerto=tx,
+            )
+            for (ano, esfera_id, hab_id), (s, d, tx) in fatos.items()
+        ),
+        batch_size=LOTE,
+    )
+
+
+def desfazer(apps, schema_editor):
+    """Devolve as linhas de esfera para ResultHab (as tabelas mais antigas ficam vazias)."""
+    ResultHab = apps.get_model('core', 'ResultHab')
+    ResultadoHabEscola = apps.get_model('core', 'ResultadoHabEscola')
+
+    esferas = ResultadoHabEscola.objects.filter(nivel='esfera')
+    ResultHab.objects.bulk_create(
+        (
+            ResultHab(ano=ano, esfera_id=esfera_id, hab_id=hab_id, tx_acerto=tx)
+            for ano, esfera_id, hab_id, tx in esferas.values_list(
+                'ano', 'esfera_id', 'hab_id', 'tx_acerto'
+            ).iterator()
+        ),
+        batch_size=LOTE,
+    )
+    esferas.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_resultadohabescola_nivel_esfera'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrar, desfazer),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 6.0.2 on 2026-04-06 09:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_migrar_habilidades_legadas'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='ResultadoHabilidade',
+        ),
+        migrations.DeleteModel(
+            name='ResultadoHabilidade1',
+        ),
+        migrations.DeleteModel(
+            name='ResultHab',
+        ),
+        migrations.DeleteModel(
+            name='Habilidade',
+        ),
+        migrations.DeleteModel(
+            name='Habilidade1',
+        ),
+        migrations.AlterModelOptions(
+            name='resultadohabescola',
+            options={'verbose_name': 'Resultado de Habilidade', 'verbose_name_plural': 'Resultados de Habilidades'},
+        ),
+        migrations.AlterUniqueTogether(
+            name='resultadohabescola',
+            unique_together=set(),
+        ),
+        migrations.RemoveIndex(
+            model_name='resultadohabescola',
+            name='core_result_ano_a48c23_idx',
+        ),
+        migrations.AlterField(
+            model_name='resultadohabescola',
+            name='hab',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resultados_hab', to='core.hab', verbose_name='Habilidade'),
+        ),
+        migrations.AddConstraint(
+            model_name='resultadohabescola',
+            constraint=models.UniqueConstraint(fields=('ano', 'escola', 'serie', 'disciplina', 'hab'), name='res_hab_unico_escola'),
+        ),
+        migrations.AddConstraint(
+            model_name='resultadohabescola',
+            constraint=models.UniqueConstraint(fields=('ano', 'esfera', 'hab'), name='res_hab_unico_esfera'),
+        ),
+        migrations.AddConstraint(
+            model_name='resultadohabescola',
+            constraint=models.CheckConstraint(condition=models.Q(models.Q(('escola__isnull', False), ('esfera__isnull', True), ('nivel', 'escola')), models.Q(('escola__isnull', True), ('esfera__isnull', False), ('nivel', 'esfera')), _connector='OR'), name='res_hab_nivel_valido'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 6.0.2 on 2026-04-08 14:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_remover_habilidades_legadas'),
+    ]
+
+    operations = [
+        # Conversão em uma única reescrita da tabela: -1.00 (sem dado) vira
+        # NULL e os percentuais viram pontos-base.
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    sql="""
+                        ALTER TABLE core_resultadohabescola
+                            ALTER COLUMN tx_acerto DROP NOT NULL,
+                            ALTER COLUMN tx_acerto TYPE smallint USING (
+                                CASE WHEN tx_acerto >= 0 THEN round(tx_acerto * 100) END
+                            )::smallint;
+                    """,
+                    reverse_sql="""
+                        ALTER TABLE core_resultadohabescola
+                            ALTER COLUMN tx_acerto TYPE numeric(5, 2)
+                                USING coalesce(tx_acerto / 100.0, -1),
+                            ALTER COLUMN tx_acerto SET NOT NULL;
+                    """,
+                ),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='resultadohabescola',
+                    name='tx_acerto',
+                    field=models.SmallIntegerField(blank=True, help_text='0 a 10000 (= 0 a 100%); vazio quando não há resultado', null=True, verbose_name='Taxa de Acerto (pontos-base)'),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='resultadohabescola',
+            constraint=models.CheckConstraint(condition=models.Q(('tx_acerto__gte', 0), ('tx_acerto__lte', 10000)), name='res_hab_tx_valida'),
+        ),
+        migrations.AddIndex(
+            model_name='resultadohabescola',
+            index=models.Index(condition=models.Q(('tx_acerto__isnull', False)), fields=['ano', 'serie', 'disciplina'], include=['escola', 'hab', 'tx_acerto'], name='res_hab_validos_idx'),
+        ),
+    ]
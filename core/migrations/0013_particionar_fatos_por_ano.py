@@ -0,0 +1,151 @@
+"""
+Converte DesempenhoEscola e ResultadoHabEscola em tabelas particionadas
+por LIST(ano), com uma partição por ano existente e uma partição padrão.
+Ver core/particionamento.py (a manutenção das partições fica lá; a
+conversão fica aqui, congelada como estava quando a migração foi escrita).
+"""
+import re
+
+from django.db import migrations
+
+
+TABELAS = ['core_desempenhoescola', 'core_resultadohabescola']
+COLUNA = 'ano'
+
+
+def _eh_particionada(cursor, tabela):
+    cursor.execute(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))",
+        [tabela]
+    )
+    return cursor.fetchone()[0]
+
+
+def _restricoes(cursor, tabela):
+    """(nome, tipo, definição) das PK/UNIQUE/FK/CHECK da tabela."""
+    cursor.execute(
+        """
+        SELECT conname, contype, pg_get_constraintdef(oid)
+        FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype IN ('p', 'u', 'f', 'c')
+        ORDER BY contype, conname
+        """,
+        [tabela]
+    )
+    return cursor.fetchall()
+
+
+def _indices(cursor, tabela):
+    """DDL dos índices que não pertencem a uma restrição (PK/UNIQUE)."""
+    cursor.execute(
+        """
+        SELECT pg_get_indexdef(i.indexrelid)
+        FROM pg_index i
+        WHERE i.indrelid = %s::regclass
+          AND NOT EXISTS (
+              SELECT 1 FROM pg_constraint c
+              WHERE c.conindid = i.indexrelid AND c.conrelid = i.indrelid
+          )
+        """,
+        [tabela]
+    )
+    return [linha[0] for linha in cursor.fetchall()]
+
+
+def _colunas(definicao):
+    return [c.strip().strip('"') for c in re.search(r'\((.*?)\)', definicao).group(1).split(',')]
+
+
+def _recriar(cursor, tabela, particionada):
+    """Recria `tabela` particionada (ou não), copiando dados, restrições e índices."""
+    qn = cursor.db.ops.quote_name
+    restricoes = _restricoes(cursor, tabela)
+    indices = _indices(cursor, tabela)
+
+    if particionada:
+        for nome, tipo, definicao in restricoes:
+            if tipo == 'u' and COLUNA not in _colunas(definicao):
+                raise RuntimeError(
+                    f'{tabela}: a restrição única {nome} não contém "{COLUNA}" '
+                    f'e não pode existir em uma tabela particionada'
+                )
+
+    nova = f'{tabela}_nova'
+    # A coluna id vem sem default/identity; a sequência é recriada abaixo
+    cursor.execute(
+        f'CREATE TABLE {qn(nova)} (LIKE {qn(tabela)} INCLUDING DEFAULTS INCLUDING STORAGE)'
+        + (f' PARTITION BY LIST ({qn(COLUNA)})' if particionada else '')
+    )
+    cursor.execute(f'ALTER TABLE {qn(nova)} ALTER COLUMN id DROP DEFAULT')
+
+    if particionada:
+        cursor.execute(f'SELECT DISTINCT {qn(COLUNA)} FROM {qn(tabela)} ORDER BY 1')
+        for (ano,) in cursor.fetchall():
+            cursor.execute(
+                f'CREATE TABLE {qn(f"{tabela}_{ano}")} '
+                f'PARTITION OF {qn(nova)} FOR VALUES IN (%s)',
+                [ano]
+            )
+        cursor.execute(f'CREATE TABLE {qn(f"{tabela}_padrao")} PARTITION OF {qn(nova)} DEFAULT')
+
+    cursor.execute(f'INSERT INTO {qn(nova)} SELECT * FROM {qn(tabela)}')
+    # Leva junto índices, restrições, a sequência e (na volta) as partições
+    cursor.execute(f'DROP TABLE {qn(tabela)}')
+    cursor.execute(f'ALTER TABLE {qn(nova)} RENAME TO {qn(tabela)}')
+
+    if particionada:
+        # Tabelas particionadas não aceitam coluna identity (PostgreSQL < 17)
+        sequencia = f'{tabela}_id_seq'
+        cursor.execute(f'CREATE SEQUENCE {qn(sequencia)} OWNED BY {qn(tabela)}.id')
+        cursor.execute(
+            f"ALTER TABLE {qn(tabela)} ALTER COLUMN id SET DEFAULT nextval(%s::regclass)",
+            [sequencia]
+        )
+        cursor.execute(
+            f'SELECT setval(%s::regclass, COALESCE(MAX(id), 0) + 1, false) FROM {qn(tabela)}',
+            [sequencia]
+        )
+    else:
+        cursor.execute(f'SELECT COALESCE(MAX(id), 0) + 1 FROM {qn(tabela)}')
+        proximo = cursor.fetchone()[0]
+        cursor.execute(
+            f'ALTER TABLE {qn(tabela)} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY '
+            f'(START WITH {int(proximo)})'
+        )
+
+    for nome, tipo, definicao in restricoes:
+        if tipo == 'p':
+            definicao = 'PRIMARY KEY (id, {})'.format(qn(COLUNA)) if particionada else 'PRIMARY KEY (id)'
+        cursor.execute(f'ALTER TABLE {qn(tabela)} ADD CONSTRAINT {qn(nome)} {definicao}')
+    for ddl in indices:
+        cursor.execute(ddl)
+
+
+def particionar(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for tabela in TABELAS:
+            if not _eh_particionada(cursor, tabela):
+                _recriar(cursor, tabela, particionada=True)
+
+
+def desparticionar(apps, schema_editor):
+    """Volta para tabela comum. Partições já desanexadas não são reincorporadas."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for tabela in TABELAS:
+            if _eh_particionada(cursor, tabela):
+                _recriar(cursor, tabela, particionada=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_resultadohabescola_tx_acerto_pontos_base'),
+    ]
+
+    operations = [
+        migrations.RunPython(particionar, desparticionar),
+    ]
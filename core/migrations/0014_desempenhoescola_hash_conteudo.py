@@ -0,0 +1,60 @@
+# Generated by Django 6.0.2 on 2026-04-10 16:05
+
+from decimal import Decimal
+from hashlib import blake2b
+
+from django.db import migrations, models
+
+
+CAMPOS_CONTEUDO = (
+    'alunos_previstos', 'alunos_avaliados', 'percentual_avaliados',
+    'proficiencia_media', 'abaixo_basico', 'basico', 'adequado', 'avancado',
+    'taxa_participacao', 'meta_estabelecida', 'variacao_ano_anterior',
+    'posicao_municipio', 'observacoes',
+)
+
+
+# Cópias de core.importacao.hash_conteudo/normalizar como eram nesta migração
+def hash_conteudo(valores):
+    """Checksum de 64 bits (com sinal, cabe em um bigint) de uma sequência de valores."""
+    texto = '\x1f'.join('' if v is None else str(v) for v in valores)
+    return int.from_bytes(blake2b(texto.encode(), digest_size=8).digest(), 'big', signed=True)
+
+
+def normalizar(campo, valor):
+    """Valor no tipo do campo; decimais com as casas do campo ('98' == '98.00')."""
+    valor = campo.to_python(valor)
+    if isinstance(valor, Decimal):
+        valor = valor.quantize(Decimal(1).scaleb(-campo.decimal_places))
+    return valor
+
+
+def preencher_hash(apps, schema_editor):
+    DesempenhoEscola = apps.get_model('core', 'DesempenhoEscola')
+    campos = [DesempenhoEscola._meta.get_field(c) for c in CAMPOS_CONTEUDO]
+    lote = []
+    for pk, *valores in DesempenhoEscola.objects.values_list('pk', *CAMPOS_CONTEUDO).iterator():
+        lote.append(DesempenhoEscola(
+            pk=pk,
+            hash_conteudo=hash_conteudo(normalizar(c, v) for c, v in zip(campos, valores)),
+        ))
+        if len(lote) >= 5000:
+            DesempenhoEscola.objects.bulk_update(lote, ['hash_conteudo'])
+            lote = []
+    DesempenhoEscola.objects.bulk_update(lote, ['hash_conteudo'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_particionar_fatos_por_ano'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='desempenhoescola',
+            name='hash_conteudo',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name='Checksum do Conteúdo'),
+        ),
+        migrations.RunPython(preencher_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+"""
+Índice de trigramas (pg_trgm + unaccent) para a busca de escolas por nome,
+INEP, bairro/distrito e gestor. Ver core/busca.py: a função e a expressão
+indexada aqui precisam ser as mesmas de busca.FUNCAO e busca.expressao()
+para o índice ser usado.
+"""
+from django.db import DatabaseError, migrations
+
+
+FUNCAO = 'core_sem_acento'
+INDICE = 'core_escola_busca_trgm'
+EXPRESSAO = f"{FUNCAO}(nome || ' ' || inep || ' ' || bairrodistrito || ' ' || gestor)"
+
+
+def criar(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        try:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS unaccent')
+        except DatabaseError as erro:
+            raise RuntimeError(
+                f'Não foi possível criar as extensões pg_trgm e unaccent ({erro}). '
+                'Crie-as com um usuário com permissão (CREATE EXTENSION pg_trgm; '
+                'CREATE EXTENSION unaccent;) e rode o migrate de novo.'
+            ) from erro
+        cursor.execute(
+            f"""
+            CREATE OR REPLACE FUNCTION {FUNCAO}(text) RETURNS text
+            LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+            AS $$ SELECT lower(public.unaccent('public.unaccent'::regdictionary, $1)) $$
+            """
+        )
+        cursor.execute(
+            f'CREATE INDEX IF NOT EXISTS {INDICE} ON core_escola '
+            f'USING gin (({EXPRESSAO}) gin_trgm_ops)'
+        )
+
+
+def remover(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DROP INDEX IF EXISTS {INDICE}')
+        cursor.execute(f'DROP FUNCTION IF EXISTS {FUNCAO}(text)')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_desempenhoescola_hash_conteudo'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar, remover),
+    ]
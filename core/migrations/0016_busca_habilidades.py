@@ -0,0 +1,52 @@
+"""
+Busca textual em português (configuração core_portugues e índice GIN do
+tsvector de Hab.dc_hab). Ver core/busca.py: a configuração e a expressão
+indexada aqui precisam ser as mesmas de busca.CONFIG_HAB e do SearchVector
+de busca.buscar_habilidades para o índice ser usado.
+"""
+from django.db import migrations
+
+
+CONFIG_HAB = 'core_portugues'
+INDICE_HAB = 'core_hab_dc_hab_fts'
+
+
+def criar(apps, schema_editor):
+    """
+    Configuração textual `core_portugues` (cópia de portuguese, sem acentos
+    quando a extensão unaccent existe) e índice GIN do tsvector de dc_hab.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DROP TEXT SEARCH CONFIGURATION IF EXISTS {CONFIG_HAB}')
+        cursor.execute(f'CREATE TEXT SEARCH CONFIGURATION {CONFIG_HAB} (COPY = portuguese)')
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'unaccent'")
+        if cursor.fetchone():
+            cursor.execute(
+                f'ALTER TEXT SEARCH CONFIGURATION {CONFIG_HAB} '
+                f'ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem'
+            )
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {INDICE_HAB} ON core_hab USING gin "
+            f"(to_tsvector('{CONFIG_HAB}'::regconfig, COALESCE(dc_hab, '')))"
+        )
+
+
+def remover(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DROP INDEX IF EXISTS {INDICE_HAB}')
+        cursor.execute(f'DROP TEXT SEARCH CONFIGURATION IF EXISTS {CONFIG_HAB}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_busca_escolas'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar, remover),
+    ]
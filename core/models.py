@@ -1,3 +1,5 @@
+from decimal import Decimal
+
 from django.db import models
 
 class Escola(models.Model):
@@ -149,10 +151,29 @@ class DesempenhoEscola(models.Model):
     )
     
     observacoes = models.TextField('Observações', blank=True, null=True)
+
+    # Checksum de CAMPOS_CONTEUDO, usado pela importação incremental
+    # (core/importacao.py) para gravar só as linhas que mudaram
+    hash_conteudo = models.BigIntegerField(
+        'Checksum do Conteúdo',
+        null=True,
+        blank=True,
+        editable=False
+    )
+
+    CAMPOS_CONTEUDO = (
+        'alunos_previstos', 'alunos_avaliados', 'percentual_avaliados',
+        'proficiencia_media', 'abaixo_basico', 'basico', 'adequado', 'avancado',
+        'taxa_participacao', 'meta_estabelecida', 'variacao_ano_anterior',
+        'posicao_municipio', 'observacoes',
+    )
+    NIVEIS_PROFICIENCIA = ('abaixo_basico', 'basico', 'adequado', 'avancado')
     
     class Meta:
         verbose_name = 'Desempenho da Escola'
         verbose_name_plural = 'Desempenhos das Escolas'
+        # Particionada por ano no PostgreSQL (core/particionamento.py):
+        # restrições únicas precisam incluir `ano`
         unique_together = ['escola', 'ano', 'disciplina', 'serie']
         ordering = ['-ano', 'escola__nome', 'disciplina__nome']
     
@@ -161,32 +182,51 @@ class DesempenhoEscola(models.Model):
     
     def calcular_taxa_participacao(self):
         """Calcula a taxa de participação se houver alunos previstos"""
-        if self.alunos_previstos > 0:
-            return (self.alunos_avaliados / self.alunos_previstos) * 100
+        return self.taxa_de(self.alunos_previstos, self.alunos_avaliados)
+
+    @staticmethod
+    def taxa_de(previstos, avaliados):
+        if previstos and previstos > 0:
+            return ((avaliados or 0) / previstos) * 100
         return 0
-    
-    def save(self, *args, **kwargs):
-        """Sobrescreve o save para calcular campos automáticos"""
-        # Calcula taxa de participação se não fornecida
-        if self.taxa_participacao is None:
-            self.taxa_participacao = self.calcular_taxa_participacao()
-        
-        # Garante que a soma dos percentuais seja 100%
-        total_percentuais = (
-            (self.abaixo_basico or 0) + 
-            (self.basico or 0) + 
-            (self.adequado or 0) + 
-            (self.avancado or 0)
-        )
-        
+
+    @classmethod
+    def derivar(cls, valores):
+        """
+        Aplica a um dict de CAMPOS_CONTEUDO as regras do save(): taxa de
+        participação quando vazia e percentuais dos níveis somando 100.
+        A importação usa a mesma função, para gravar (e fazer o hash de)
+        exatamente o que o save() gravaria.
+        """
+        if valores.get('taxa_participacao') is None:
+            valores['taxa_participacao'] = cls.taxa_de(
+                valores.get('alunos_previstos'), valores.get('alunos_avaliados')
+            )
+
         # Se a soma não for 100%, ajusta proporcionalmente
+        total_percentuais = sum((valores.get(n) or 0) for n in cls.NIVEIS_PROFICIENCIA)
         if total_percentuais != 100 and total_percentuais > 0:
             fator = 100 / total_percentuais
-            self.abaixo_basico = round((self.abaixo_basico or 0) * fator, 2)
-            self.basico = round((self.basico or 0) * fator, 2)
-            self.adequado = round((self.adequado or 0) * fator, 2)
-            self.avancado = round((self.avancado or 0) * fator, 2)
+            for n in cls.NIVEIS_PROFICIENCIA:
+                valores[n] = round((valores.get(n) or 0) * fator, 2)
+        return valores
+
+    def calcular_hash(self):
+        """Checksum do conteúdo atual (o mesmo calculado na importação)."""
+        from .importacao import hash_conteudo, normalizar
+        return hash_conteudo(
+            normalizar(self._meta.get_field(campo), getattr(self, campo))
+            for campo in self.CAMPOS_CONTEUDO
+        )
+    
+    def save(self, *args, **kwargs):
+        """Sobrescreve o save para calcular campos automáticos"""
+        # Taxa de participação se não fornecida e níveis somando 100%
+        valores = self.derivar({campo: getattr(self, campo) for campo in self.CAMPOS_CONTEUDO})
+        for campo, valor in valores.items():
+            setattr(self, campo, valor)
         
+        self.hash_conteudo = self.calcular_hash()
         super().save(*args, **kwargs)
 
 
@@ -419,27 +459,27 @@ class DesempenhoEsfera(models.Model):  # Nome em CamelCase
         
         super().save(*args, **kwargs)
 
-        #tabela habilidade criação
 
-        from django.core.validators import MinValueValidator, MaxValueValidator
+# Catálogo único de habilidades (as antigas Habilidade/Habilidade1 foram
+# incorporadas aqui pela migração 0010)
 
-class Habilidade(models.Model):
+class Hab(models.Model):
     serie = models.ForeignKey(
-        Serie,
+        'Serie',  # ou import Serie diretamente
         on_delete=models.CASCADE,
         verbose_name='Série/Ano'
     )
     disciplina = models.ForeignKey(
-        Disciplina,
+        'Disciplina',  # ou import Disciplina diretamente
         on_delete=models.CASCADE,
         verbose_name='Disciplina'
     )
-    cd_habilidade = models.CharField(
+    cd_hab = models.CharField(
         'Código da Habilidade',
         max_length=20,
         help_text='Código identificador da habilidade (ex: EF05LP01)'
     )
-    dc_habilidade = models.TextField(
+    dc_hab = models.TextField(
         'Descrição da Habilidade',
         help_text='Descrição completa da habilidade'
     )
@@ -447,231 +487,212 @@ class Habilidade(models.Model):
     class Meta:
         verbose_name = 'Habilidade'
         verbose_name_plural = 'Habilidades'
-        unique_together = ['serie', 'disciplina', 'cd_habilidade']
-        ordering = ['disciplina', 'serie', 'cd_habilidade']
+        unique_together = ['serie', 'disciplina', 'cd_hab']
+        ordering = ['disciplina', 'serie', 'cd_hab']
 
     def __str__(self):
-        return f"{self.cd_habilidade} - {self.dc_habilidade[:50]}"
+        return f"{self.cd_hab} - {self.dc_hab[:50]}"
 
 
-class ResultadoHabilidade(models.Model):
-    ano = models.IntegerField('Ano')
-    esfera = models.ForeignKey(
-        Esfera,
-        on_delete=models.CASCADE,
-        verbose_name='Esfera'
-    )
-    serie = models.ForeignKey(
-        Serie,
-        on_delete=models.CASCADE,
-        verbose_name='Série/Ano'
-    )
-    disciplina = models.ForeignKey(
-        Disciplina,
-        on_delete=models.CASCADE,
-        verbose_name='Disciplina'
-    )
-    cd_habilidade = models.CharField(
-        'Código da Habilidade',
-        max_length=20
-    )
-    tx_acerto = models.DecimalField(
-        'Taxa de Acerto (%)',
-        max_digits=5,
-        decimal_places=2,
-        validators=[MinValueValidator(0), MaxValueValidator(100)],
-        help_text='Percentual de acerto para esta habilidade'
-    )
+# Resultado por habilidade: tabela fato única para escolas e esferas.
+# `nivel` indica qual das duas FKs está preenchida; as linhas de esfera
+# vieram de ResultHab/ResultadoHabilidade/ResultadoHabilidade1 (migração 0010).
 
-    class Meta:
-        verbose_name = 'Resultado de Habilidade'
-        verbose_name_plural = 'Resultados de Habilidades'
-        unique_together = ['ano', 'esfera', 'serie', 'disciplina', 'cd_habilidade']
-        indexes = [
-            models.Index(fields=['ano', 'esfera', 'serie', 'disciplina']),
-        ]
-        ordering = ['-ano', 'esfera', 'disciplina', 'serie', 'cd_habilidade']
+class ResultadoHabEscola(models.Model):
+    NIVEL_ESCOLA = 'escola'
+    NIVEL_ESFERA = 'esfera'
+    NIVEIS = [
+        (NIVEL_ESCOLA, 'Escola'),
+        (NIVEL_ESFERA, 'Esfera'),
+    ]
 
-    def __str__(self):
-        return f"{self.ano} - {self.esfera} - {self.disciplina} - {self.serie} - {self.cd_habilidade}"
-    
-    from django.core.validators import MinValueValidator, MaxValueValidator
+    ano = models.IntegerField('Ano')
 
-class Habilidade1(models.Model):
-    serie = models.ForeignKey(
-        Serie,
-        on_delete=models.CASCADE,
-        verbose_name='Série/Ano'
-    )
-    disciplina = models.ForeignKey(
-        Disciplina,
+    nivel = models.CharField('Nível', max_length=10, choices=NIVEIS, default=NIVEL_ESCOLA)
+
+    escola = models.ForeignKey(
+        Escola,
         on_delete=models.CASCADE,
-        verbose_name='Disciplina'
-    )
-    cd_habilidade = models.CharField(
-        'Código da Habilidade',
-        max_length=20,
-        help_text='Código identificador da habilidade (ex: EF05LP01)'
-    )
-    dc_habilidade = models.TextField(
-        'Descrição da Habilidade',
-        help_text='Descrição completa da habilidade'
+        verbose_name='Escola',
+        null=True,
+        blank=True
     )
 
-    class Meta:
-        verbose_name = 'Habilidade'
-        verbose_name_plural = 'Habilidades'
-        unique_together = ['serie', 'disciplina', 'cd_habilidade']
-        ordering = ['disciplina', 'serie', 'cd_habilidade']
-
-    def __str__(self):
-        return f"{self.cd_habilidade} - {self.dc_habilidade[:50]}"
-
-
-class ResultadoHabilidade1(models.Model):
-    ano = models.IntegerField('Ano')
     esfera = models.ForeignKey(
         Esfera,
         on_delete=models.CASCADE,
-        verbose_name='Esfera'
-    )
-    habilidade = models.ForeignKey(
-        Habilidade1,
-        on_delete=models.CASCADE,
-        verbose_name='Habilidade',
-        related_name='resultados'  # Opcional, para acessar os resultados de uma habilidade
-    )
-    tx_acerto = models.DecimalField(
-        'Taxa de Acerto (%)',
-        max_digits=5,
-        decimal_places=2,
-        validators=[MinValueValidator(0), MaxValueValidator(100)],
-        help_text='Percentual de acerto para esta habilidade'
+        verbose_name='Esfera',
+        related_name='resultados_hab',
+        null=True,
+        blank=True
     )
 
-    class Meta:
-        verbose_name = 'Resultado de Habilidade'
-        verbose_name_plural = 'Resultados de Habilidades'
-        unique_together = ['ano', 'esfera', 'habilidade']  # Garante unicidade por ano/esfera/habilidade
-        indexes = [
-            models.Index(fields=['ano', 'esfera', 'habilidade']),
-        ]
-        ordering = ['-ano', 'esfera', 'habilidade']
-
-    def __str__(self):
-        return f"{self.ano} - {self.esfera} - {self.habilidade.cd_habilidade}"
-    
-
-    #novas tentativas para tabela habilidade criação 02_03_2026
-
-from django.db import models
-from django.core.validators import MinValueValidator, MaxValueValidator
-
-class Hab(models.Model):
     serie = models.ForeignKey(
-        'Serie',  # ou import Serie diretamente
+        Serie,
         on_delete=models.CASCADE,
         verbose_name='Série/Ano'
     )
+
     disciplina = models.ForeignKey(
-        'Disciplina',  # ou import Disciplina diretamente
+        Disciplina,
         on_delete=models.CASCADE,
         verbose_name='Disciplina'
     )
-    cd_hab = models.CharField(
-        'Código da Habilidade',
-        max_length=20,
-        help_text='Código identificador da habilidade (ex: EF05LP01)'
-    )
-    dc_hab = models.TextField(
-        'Descrição da Habilidade',
-        help_text='Descrição completa da habilidade'
-    )
 
-    class Meta:
-        verbose_name = 'Habilidade'
-        verbose_name_plural = 'Habilidades'
-        unique_together = ['serie', 'disciplina', 'cd_hab']
-        ordering = ['disciplina', 'serie', 'cd_hab']
-
-    def __str__(self):
-        return f"{self.cd_hab} - {self.dc_hab[:50]}"
-
-
-class ResultHab(models.Model):
-    ano = models.IntegerField('Ano')
-    esfera = models.ForeignKey(
-        'Esfera',  # ou import Esfera diretamente
-        on_delete=models.CASCADE,
-        verbose_name='Esfera'
-    )
     hab = models.ForeignKey(
         Hab,
         on_delete=models.CASCADE,
         verbose_name='Habilidade',
-        related_name='resultados_hab'  # Opcional: para acessar resultados de uma habilidade
+        related_name='resultados_hab'
     )
-    tx_acerto = models.DecimalField(
-        'Taxa de Acerto (%)',
-        max_digits=5,
-        decimal_places=2,
-        validators=[MinValueValidator(0), MaxValueValidator(100)],
-        help_text='Percentual de acerto para esta habilidade'
+
+    # Pontos-base (0–10000 = 0–100%); NULL quando não há resultado. A
+    # conversão para percentual é feita só na saída (para_percentual).
+    tx_acerto = models.SmallIntegerField(
+        'Taxa de Acerto (pontos-base)',
+        null=True,
+        blank=True,
+        help_text='0 a 10000 (= 0 a 100%); vazio quando não há resultado'
     )
 
+    ESCALA_TX = 100
+
     class Meta:
         verbose_name = 'Resultado de Habilidade'
         verbose_name_plural = 'Resultados de Habilidades'
-        unique_together = ['ano', 'esfera', 'hab']  # Garante unicidade por ano/esfera/habilidade
+        # Particionada por ano no PostgreSQL (core/particionamento.py).
+        # Os índices únicos também servem às buscas por (ano, escola, ...) e
+        # (ano, esfera, ...); como a FK do outro nível é NULL, cada um só
+        # restringe as linhas do seu nível.
+        constraints = [
+            models.UniqueConstraint(
+                fields=['ano', 'escola', 'serie', 'disciplina', 'hab'],
+                name='res_hab_unico_escola',
+            ),
+            models.UniqueConstraint(
+                fields=['ano', 'esfera', 'hab'],
+                name='res_hab_unico_esfera',
+            ),
+            models.CheckConstraint(
+                condition=(
+                    models.Q(nivel='escola', escola__isnull=False, esfera__isnull=True)
+                    | models.Q(nivel='esfera', esfera__isnull=False, escola__isnull=True)
+                ),
+                name='res_hab_nivel_valido',
+            ),
+            models.CheckConstraint(
+                condition=models.Q(tx_acerto__gte=0, tx_acerto__lte=10000),
+                name='res_hab_tx_valida',
+            ),
+        ]
         indexes = [
-            models.Index(fields=['ano', 'esfera', 'hab']),
+            # Só as linhas com resultado, cobrindo o que as análises leem
+            models.Index(
+                fields=['ano', 'serie', 'disciplina'],
+                include=['escola', 'hab', 'tx_acerto'],
+                condition=models.Q(tx_acerto__isnull=False),
+                name='res_hab_validos_idx',
+            ),
         ]
-        ordering = ['-ano', 'esfera', 'hab']
 
     def __str__(self):
-        return f"{self.ano} - {self.esfera} - {self.hab.cd_hab}"
-
+        alvo = self.escola.nome if self.escola_id else self.esfera
+        return f"{self.ano} - {alvo} - {self.disciplina} - {self.serie} - {self.hab.cd_hab}"
+
+    @classmethod
+    def para_pontos_base(cls, percentual):
+        """Converte um percentual (ex.: 45.37) para o valor gravado (4537)."""
+        if percentual is None:
+            return None
+        return int(round(float(percentual) * cls.ESCALA_TX))
+
+    @classmethod
+    def para_percentual(cls, pontos):
+        """Converte o valor gravado para percentual com duas casas."""
+        if pontos is None:
+            return None
+        return Decimal(pontos) / cls.ESCALA_TX
+
+    @property
+    def percentual(self):
+        return self.para_percentual(self.tx_acerto)
+
+# estatísticas pré-agregadas por habilidade (rede e localidade)
+
+class EstatisticaHabilidade(models.Model):
+    NIVEL_REDE = 'rede'
+    NIVEL_LOCALIDADE = 'localidade'
+    NIVEIS = [
+        (NIVEL_REDE, 'Rede'),
+        (NIVEL_LOCALIDADE, 'Localidade'),
+    ]
+
+    # Limiares fixos guardados como colunas; outros saem do histograma
+    LIMIARES = (25, 50, 75)
 
-# habilidade por escolas 20_03_2026
-
-class ResultadoHabEscola(models.Model):
     ano = models.IntegerField('Ano')
+    serie = models.ForeignKey(Serie, on_delete=models.CASCADE, verbose_name='Série/Ano')
+    disciplina = models.ForeignKey(Disciplina, on_delete=models.CASCADE, verbose_name='Disciplina')
+    hab = models.ForeignKey(Hab, on_delete=models.CASCADE, verbose_name='Habilidade', related_name='estatisticas')
 
-    escola = models.ForeignKey(
-        Escola,
+    nivel = models.CharField('Nível', max_length=20, choices=NIVEIS)
+    localidade = models.ForeignKey(
+        Localidade,
         on_delete=models.CASCADE,
-        verbose_name='Escola'
+        null=True,
+        blank=True,
+        verbose_name='Localidade'
     )
 
-    serie = models.ForeignKey(
-        Serie,
-        on_delete=models.CASCADE,
-        verbose_name='Série/Ano'
-    )
+    media = models.DecimalField('Média (%)', max_digits=5, decimal_places=2)
+    mediana = models.DecimalField('Mediana (%)', max_digits=5, decimal_places=2)
+    p10 = models.DecimalField('Percentil 10 (%)', max_digits=5, decimal_places=2)
+    p90 = models.DecimalField('Percentil 90 (%)', max_digits=5, decimal_places=2)
+    desvio_padrao = models.DecimalField('Desvio Padrão', max_digits=5, decimal_places=2)
 
-    disciplina = models.ForeignKey(
-        Disciplina,
-        on_delete=models.CASCADE,
-        verbose_name='Disciplina'
-    )
+    total_escolas = models.IntegerField('Total de Escolas')
+    escolas_abaixo_25 = models.IntegerField('Escolas abaixo de 25%')
+    escolas_abaixo_50 = models.IntegerField('Escolas abaixo de 50%')
+    escolas_abaixo_75 = models.IntegerField('Escolas abaixo de 75%')
 
-    hab = models.ForeignKey(
-        Hab,
-        on_delete=models.CASCADE,
-        verbose_name='Habilidade'
+    histograma = models.JSONField(
+        'Histograma',
+        help_text='Quantidade de escolas por faixa de 1 ponto percentual (índices 0 a 100)'
     )
 
-    tx_acerto = models.DecimalField(
-        'Taxa de Acerto (%)',
-        max_digits=5,
-        decimal_places=2
-    )
+    data_atualizacao = models.DateTimeField('Data de Atualização', auto_now=True)
 
     class Meta:
-        unique_together = ['ano', 'escola', 'serie', 'disciplina', 'hab']
+        verbose_name = 'Estatística de Habilidade'
+        verbose_name_plural = 'Estatísticas de Habilidades'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['ano', 'serie', 'disciplina', 'hab'],
+                condition=models.Q(nivel='rede'),
+                name='estat_hab_unica_rede',
+            ),
+            models.UniqueConstraint(
+                fields=['ano', 'serie', 'disciplina', 'hab', 'localidade'],
+                condition=models.Q(nivel='localidade'),
+                name='estat_hab_unica_localidade',
+            ),
+        ]
         indexes = [
-            models.Index(fields=['ano', 'escola', 'serie', 'disciplina']),
+            models.Index(fields=['ano', 'serie', 'disciplina', 'nivel', 'localidade']),
         ]
+        ordering = ['ano', 'serie', 'disciplina', 'media']
 
     def __str__(self):
-        return f"{self.ano} - {self.escola.nome} - {self.disciplina} - {self.serie} - {self.hab.cd_hab}"
\ No newline at end of file
+        alvo = self.localidade or 'Rede'
+        return f"{self.ano} - {alvo} - {self.hab.cd_hab}"
+
+    def escolas_abaixo(self, limiar):
+        """
+        Escolas com taxa de acerto abaixo do limiar, respondida pelo
+        histograma (exata para limiares inteiros, arredonda para baixo os
+        demais) sem reler ResultadoHabEscola.
+        """
+        if limiar in self.LIMIARES:
+            return getattr(self, f'escolas_abaixo_{int(limiar)}')
+        corte = max(0, min(len(self.histograma), int(limiar)))
+        return sum(self.histograma[:corte])
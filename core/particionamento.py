@@ -0,0 +1,125 @@
+"""
+Particionamento declarativo (LIST por ano) das tabelas fato.
+
+Todas as análises filtram um único `ano`; com uma partição por ano o
+PostgreSQL lê apenas a partição pedida (partition pruning) e anos antigos
+podem ser desanexados, exportados ou comprimidos sem tocar nos dados do
+ciclo atual.
+
+O Django não conhece partições: os modelos continuam apontando para a
+tabela pai. A conversão é feita pela migração 0013 e as partições de cada
+novo ano pelo comando `particoes_ano` (chamado antes de cada importação).
+Linhas de um ano sem partição vão para a partição padrão e são movidas
+quando a partição do ano é criada.
+
+No PostgreSQL toda chave primária/única de uma tabela particionada precisa
+conter a coluna de partição; por isso a PK passa a ser (id, ano). O `id`
+continua único na prática, vindo de uma única sequência.
+"""
+from django.db import connections
+
+
+COLUNA = 'ano'
+
+
+def tabelas_particionadas():
+    from .models import DesempenhoEscola, ResultadoHabEscola
+    return [m._meta.db_table for m in (DesempenhoEscola, ResultadoHabEscola)]
+
+
+def nome_particao(tabela, ano):
+    return f'{tabela}_{ano}'
+
+
+def nome_padrao(tabela):
+    return f'{tabela}_padrao'
+
+
+# ============================================================
+# INTROSPECÇÃO
+# ============================================================
+
+def eh_particionada(cursor, tabela):
+    cursor.execute(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))",
+        [tabela]
+    )
+    return cursor.fetchone()[0]
+
+
+def particoes(cursor, tabela):
+    """Lista (partição, faixa, linhas estimadas) de uma tabela particionada."""
+    cursor.execute(
+        """
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint
+        FROM pg_inherits h
+        JOIN pg_class c ON c.oid = h.inhrelid
+        WHERE h.inhparent = %s::regclass
+        ORDER BY c.relname
+        """,
+        [tabela]
+    )
+    return cursor.fetchall()
+
+
+# ============================================================
+# MANUTENÇÃO DE PARTIÇÕES
+# ============================================================
+
+def _existe(cursor, nome):
+    cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [nome])
+    return cursor.fetchone()[0]
+
+
+def criar_particao(cursor, tabela, ano):
+    """
+    Cria e anexa a partição de `ano`, movendo para ela as linhas desse ano
+    que estejam na partição padrão. Devolve o número de linhas movidas, ou
+    None se a partição já existia.
+    """
+    qn = cursor.db.ops.quote_name
+    nome = nome_particao(tabela, ano)
+    if _existe(cursor, nome):
+        return None
+
+    cursor.execute(
+        f'CREATE TABLE {qn(nome)} (LIKE {qn(tabela)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+    )
+    movidas = 0
+    padrao = nome_padrao(tabela)
+    if _existe(cursor, padrao):
+        cursor.execute(
+            f'WITH movidas AS (DELETE FROM {qn(padrao)} WHERE {qn(COLUNA)} = %s RETURNING *) '
+            f'INSERT INTO {qn(nome)} SELECT * FROM movidas',
+            [ano]
+        )
+        movidas = cursor.rowcount
+    cursor.execute(f'ALTER TABLE {qn(tabela)} ATTACH PARTITION {qn(nome)} FOR VALUES IN (%s)', [ano])
+    return movidas
+
+
+def desanexar_particao(cursor, tabela, ano):
+    """
+    Desanexa a partição de `ano`: os dados saem das consultas e a tabela
+    fica avulsa para ser exportada, comprimida ou removida. Devolve False
+    se a partição não existe.
+    """
+    qn = cursor.db.ops.quote_name
+    nome = nome_particao(tabela, ano)
+    if not _existe(cursor, nome):
+        return False
+    cursor.execute(f'ALTER TABLE {qn(tabela)} DETACH PARTITION {qn(nome)}')
+    return True
+
+
+def garantir_ano(ano, using='default'):
+    """Cria, se necessário, a partição de `ano` em todas as tabelas particionadas."""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return {}
+    resultado = {}
+    with connection.cursor() as cursor:
+        for tabela in tabelas_particionadas():
+            if eh_particionada(cursor, tabela):
+                resultado[tabela] = criar_particao(cursor, tabela, ano)
+    return resultado
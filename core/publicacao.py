@@ -0,0 +1,214 @@
+"""
+Boletins publicados como arquivos estáticos.
+
+Depois de cada importação o boletim de cada escola (HTML e PDF) é
+renderizado uma vez e gravado em BOLETINS_DIR com o hash do conteúdo no
+nome (`boletim_<escola>_<hash>.html`). O manifesto (manifesto.json) guarda,
+por escola, os arquivos atuais, a impressão digital dos dados que os
+geraram e a versão do boletim da escola (dimensoes.versao_escola) na
+publicação. Essa versão só muda com os dados da própria escola ou com o
+que entra em todos os boletins (séries, disciplinas e localidades), não a
+cada gravação no banco.
+
+As views de boletim só consultam o manifesto: enquanto a versão da escola
+não mudar, o arquivo é entregue direto do disco (FileResponse, ou
+X-Accel-Redirect/X-Sendfile com BOLETINS_SENDFILE), sem nenhuma query.
+Uma gravação depois da publicação muda a versão e o boletim volta a ser
+montado na hora até a próxima publicação.
+
+Configuração (settings):
+    BOLETINS_DIR = BASE_DIR / 'boletins_publicados'
+    BOLETINS_SENDFILE = None            # 'X-Accel-Redirect' (nginx) ou 'X-Sendfile' (Apache)
+    BOLETINS_SENDFILE_PREFIXO = '/boletins-publicados/'   # location interna do nginx
+"""
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import FileResponse, HttpResponse
+from django.test import RequestFactory
+
+from . import dimensoes
+from .models import DesempenhoEscola, Disciplina, Escola, Serie
+
+
+FORMATOS = {'html': 'text/html; charset=utf-8', 'pdf': 'application/pdf'}
+ARQUIVO_MANIFESTO = 'manifesto.json'
+
+# (mtime do manifesto, conteúdo) lido por este processo
+_manifesto = (None, None)
+
+
+def diretorio():
+    return Path(getattr(settings, 'BOLETINS_DIR', Path(settings.BASE_DIR) / 'boletins_publicados'))
+
+
+def _gravar(caminho, conteudo):
+    """Grava de forma atômica: quem lê nunca vê um arquivo pela metade."""
+    fd, temporario = tempfile.mkstemp(dir=caminho.parent, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as arquivo:
+            arquivo.write(conteudo)
+        os.replace(temporario, caminho)
+    except BaseException:
+        os.unlink(temporario)
+        raise
+
+
+# ============================================================
+# MANIFESTO
+# ============================================================
+
+def ler_manifesto():
+    """Manifesto publicado ({} se não houver), relido só quando o arquivo muda."""
+    global _manifesto
+    caminho = diretorio() / ARQUIVO_MANIFESTO
+    try:
+        mtime = caminho.stat().st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    if _manifesto[0] != mtime:
+        with open(caminho, encoding='utf-8') as arquivo:
+            _manifesto = (mtime, json.load(arquivo))
+    return _manifesto[1]
+
+
+def publicado(escola_id, formato):
+    """Caminho do boletim publicado da escola, se ainda corresponde aos dados atuais."""
+    registro = ler_manifesto().get('escolas', {}).get(str(escola_id))
+    if not registro or registro.get('versao') != dimensoes.versao_escola(escola_id):
+        return None
+    nome = registro.get(formato)
+    if nome is None:
+        return None
+    caminho = diretorio() / nome
+    return caminho if caminho.exists() else None
+
+
+def servir(caminho, formato):
+    """Resposta com o arquivo publicado, entregue pelo servidor web quando configurado."""
+    cabecalho = getattr(settings, 'BOLETINS_SENDFILE', None)
+    if cabecalho:
+        response = HttpResponse(content_type=FORMATOS[formato])
+        if cabecalho == 'X-Sendfile':
+            response[cabecalho] = str(caminho)
+        else:
+            prefixo = getattr(settings, 'BOLETINS_SENDFILE_PREFIXO', '/boletins-publicados/')
+            response[cabecalho] = prefixo + caminho.name
+    else:
+        response = FileResponse(open(caminho, 'rb'), content_type=FORMATOS[formato])
+    if formato == 'pdf':
+        escola_id = caminho.name.split('_')[1]
+        response['Content-Disposition'] = f'inline; filename="boletim_{escola_id}.pdf"'
+    return response
+
+
+# ============================================================
+# PUBLICAÇÃO
+# ============================================================
+
+def impressoes_digitais():
+    """
+    {escola_id: hash} de tudo que entra no boletim de cada escola: o
+    catálogo de séries e disciplinas (o boletim tem uma linha para cada
+    série × disciplina, com ou sem dados), o cadastro da escola e as linhas
+    de DesempenhoEscola (pelo hash_conteudo de cada uma).
+    """
+    catalogo = repr((
+        list(Serie.objects.order_by('id').values_list('id', 'nome', 'nivel_ensino')),
+        list(Disciplina.objects.order_by('id').values_list('id', 'nome', 'codigo')),
+    )).encode()
+    hashes = {}
+    for escola in Escola.objects.order_by('id').values_list('id', 'nome', 'inep', 'localidade__nome'):
+        hashes[escola[0]] = hashlib.blake2b(catalogo, digest_size=16)
+        hashes[escola[0]].update(repr(escola).encode())
+    for linha in (
+        DesempenhoEscola.objects
+        .order_by('escola_id', 'ano', 'serie__nome', 'disciplina__nome')
+        .values_list('escola_id', 'ano', 'serie__nome', 'disciplina__nome', 'hash_conteudo')
+    ):
+        if linha[0] in hashes:
+            hashes[linha[0]].update(repr(linha).encode())
+    return {escola_id: h.hexdigest() for escola_id, h in hashes.items()}
+
+
+def renderizar(escola_id, formato):
+    """Bytes do boletim montado pelas próprias views, como numa requisição anônima."""
+    from . import views
+
+    view = views.renderizar_boletim if formato == 'html' else views.renderizar_boletim_pdf
+    request = RequestFactory().get(f'/boletim/{escola_id}/')
+    request.user = AnonymousUser()
+    return view(request, escola_id).content
+
+
+def publicar(escolas=None, forcar=False, progresso=None):
+    """
+    Publica os boletins (todas as escolas, ou só `escolas`). Só renderiza
+    as escolas cuja impressão digital mudou desde a última publicação
+    (todas com `forcar`, ex.: depois de mudar o template) e só grava os
+    arquivos cujo conteúdo mudou. Escolas fora de `escolas` com dados
+    alterados saem do manifesto (voltam a ser montadas na hora), e os
+    arquivos que não estão mais no manifesto são removidos.
+    """
+    pasta = diretorio()
+    pasta.mkdir(parents=True, exist_ok=True)
+
+    # Versões lidas antes de consultar os dados: uma gravação durante a
+    # publicação deixa o manifesto desatualizado (seguro), nunca o contrário
+    versoes = {
+        escola_id: dimensoes.versao_escola(escola_id)
+        for escola_id in Escola.objects.values_list('id', flat=True)
+    }
+    anterior = ler_manifesto().get('escolas', {})
+    atuais = {
+        escola_id: impressao for escola_id, impressao in impressoes_digitais().items()
+        if escola_id in versoes
+    }
+    selecionadas = set(atuais) if escolas is None else set(escolas) & set(atuais)
+
+    manifesto = {}
+    resultado = {'renderizadas': 0, 'inalteradas': 0, 'arquivos_gravados': 0, 'removidos': 0}
+    for i, (escola_id, impressao) in enumerate(atuais.items(), 1):
+        chave = str(escola_id)
+        registro = anterior.get(chave)
+        em_dia = (
+            registro and registro['impressao'] == impressao
+            and all((pasta / registro[formato]).exists() for formato in FORMATOS)
+        )
+        # Mesma impressão digital: o arquivo continua valendo na versão atual
+        if escola_id not in selecionadas:
+            if em_dia:
+                manifesto[chave] = dict(registro, versao=versoes[escola_id])
+        elif em_dia and not forcar:
+            manifesto[chave] = dict(registro, versao=versoes[escola_id])
+            resultado['inalteradas'] += 1
+        else:
+            registro = {'impressao': impressao, 'versao': versoes[escola_id]}
+            for formato in FORMATOS:
+                conteudo = renderizar(escola_id, formato)
+                nome = f'boletim_{escola_id}_{hashlib.sha256(conteudo).hexdigest()[:16]}.{formato}'
+                if not (pasta / nome).exists():
+                    _gravar(pasta / nome, conteudo)
+                    resultado['arquivos_gravados'] += 1
+                registro[formato] = nome
+            manifesto[chave] = registro
+            resultado['renderizadas'] += 1
+        if progresso:
+            progresso(i, len(atuais))
+
+    _gravar(
+        pasta / ARQUIVO_MANIFESTO,
+        json.dumps({'escolas': manifesto}, indent=1).encode(),
+    )
+
+    em_uso = {registro[formato] for registro in manifesto.values() for formato in FORMATOS}
+    for arquivo in pasta.glob('boletim_*'):
+        if arquivo.name not in em_uso:
+            arquivo.unlink(missing_ok=True)
+            resultado['removidos'] += 1
+    return resultado
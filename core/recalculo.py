@@ -0,0 +1,239 @@
+"""
+Recálculo em lote dos campos derivados de DesempenhoEscola e
+DesempenhoEsfera, com um UPDATE ... FROM por etapa em vez de um save()
+por linha:
+
+- participacao: taxa_participacao/percentual_avaliados = avaliados/previstos
+  (linhas sem alunos previstos mantêm o valor gravado, ou 0 se vazio);
+- niveis: os quatro percentuais reescalados para somar 100 (como no save());
+- posicao: posicao_municipio, RANK da proficiência no ano/série/disciplina
+  (só DesempenhoEscola: as esferas não se ordenam entre si, e o valor
+  importado é mantido);
+- variacao: variacao_ano_anterior, diferença para o ano anterior disponível
+  da mesma unidade/série/disciplina (sem ano anterior no banco, o valor
+  importado é mantido).
+
+Cada etapa só toca as linhas cujo valor muda (IS DISTINCT FROM) e devolve
+os ids alterados; em DesempenhoEscola o hash_conteudo dessas linhas é
+refeito ao final, para a importação incremental e a publicação dos
+boletins enxergarem a mudança. As posições e variações são calculadas
+sobre todas as linhas do ano, mas gravadas apenas no escopo pedido.
+"""
+import time
+
+from django.db import connection, transaction
+
+from . import dimensoes, publicacao
+from .importacao import hash_conteudo, normalizar
+from .models import DesempenhoEscola, DesempenhoEsfera
+
+
+ETAPAS = ('participacao', 'niveis', 'posicao', 'variacao')
+NIVEIS = ('abaixo_basico', 'basico', 'adequado', 'avancado')
+# Somas dentro desta folga já estão normalizadas (o arredondamento para 2
+# casas deixa 99,99 ou 100,01, e reescalar de novo não convergiria)
+TOLERANCIA_NIVEIS = 0.05
+
+MODELOS = {
+    'escola': {
+        'modelo': DesempenhoEscola,
+        'unidade': 'escola_id',
+        'participacao': ('taxa_participacao', 'percentual_avaliados'),
+        'etapas': ETAPAS,
+        'hash': True,
+    },
+    'esfera': {
+        'modelo': DesempenhoEsfera,
+        'unidade': 'esfera_id',
+        'participacao': ('percentual_avaliados',),
+        'etapas': ('participacao', 'niveis', 'variacao'),
+        'hash': False,
+    },
+}
+
+
+def definicao(modelo):
+    for nome, d in MODELOS.items():
+        if d['modelo'] is modelo:
+            return nome, d
+    raise ValueError(f'Sem recálculo para {modelo.__name__}')
+
+
+# ============================================================
+# ETAPAS (SQL)
+# ============================================================
+
+def _sql_participacao(tabela, d):
+    taxa = (
+        "CASE WHEN t.alunos_previstos > 0 "
+        "THEN LEAST(ROUND(t.alunos_avaliados * 100.0 / t.alunos_previstos, 2), 100) "
+        "ELSE COALESCE(t.{campo}, 0) END"
+    )
+    atribuicoes = ', '.join(f'{campo} = {taxa.format(campo=campo)}' for campo in d['participacao'])
+    diferente = ' OR '.join(
+        f't.{campo} IS DISTINCT FROM {taxa.format(campo=campo)}' for campo in d['participacao']
+    )
+    return f"""
+        UPDATE {tabela} t SET {atribuicoes}{{atualizacao}}
+        WHERE t.ano = ANY(%s) AND t.id IN ({{escopo}}) AND ({diferente})
+        RETURNING t.id
+    """
+
+
+def _sql_niveis(tabela, d):
+    total = ' + '.join(f'COALESCE(t.{n}, 0)' for n in NIVEIS)
+    atribuicoes = ', '.join(f'{n} = ROUND(COALESCE(t.{n}, 0) * 100.0 / ({total}), 2)' for n in NIVEIS)
+    return f"""
+        UPDATE {tabela} t SET {atribuicoes}{{atualizacao}}
+        WHERE t.ano = ANY(%s) AND t.id IN ({{escopo}})
+          AND ({total}) > 0 AND ABS(({total}) - 100) > {TOLERANCIA_NIVEIS}
+        RETURNING t.id
+    """
+
+
+def _sql_posicao(tabela, d):
+    return f"""
+        WITH r AS (
+            SELECT id, ano, RANK() OVER (
+                PARTITION BY ano, serie_id, disciplina_id ORDER BY proficiencia_media DESC
+            ) AS posicao
+            FROM {tabela}
+            WHERE ano = ANY(%s) AND proficiencia_media IS NOT NULL
+        )
+        UPDATE {tabela} t SET posicao_municipio = r.posicao{{atualizacao}}
+        FROM r
+        WHERE t.id = r.id AND t.ano = r.ano AND t.ano = ANY(%s) AND t.id IN ({{escopo}})
+          AND t.posicao_municipio IS DISTINCT FROM r.posicao
+        RETURNING t.id
+    """
+
+
+def _sql_variacao(tabela, d):
+    # Lê os anos anteriores ao escopo para achar o "ano anterior" de cada linha
+    return f"""
+        WITH v AS (
+            SELECT id, ano, ROUND(proficiencia_media - LAG(proficiencia_media) OVER (
+                PARTITION BY {d['unidade']}, serie_id, disciplina_id ORDER BY ano
+            ), 2) AS variacao
+            FROM {tabela}
+            WHERE ano <= %s
+        )
+        UPDATE {tabela} t SET variacao_ano_anterior = v.variacao{{atualizacao}}
+        FROM v
+        WHERE t.id = v.id AND t.ano = v.ano AND t.ano = ANY(%s) AND t.id IN ({{escopo}})
+          AND v.variacao IS NOT NULL AND t.variacao_ano_anterior IS DISTINCT FROM v.variacao
+        RETURNING t.id
+    """
+
+
+SQL_ETAPAS = {
+    'participacao': _sql_participacao,
+    'niveis': _sql_niveis,
+    'posicao': _sql_posicao,
+    'variacao': _sql_variacao,
+}
+
+
+def _params_etapa(etapa, anos):
+    if etapa == 'posicao':
+        return [anos, anos]
+    if etapa == 'variacao':
+        return [max(anos), anos]
+    return [anos]
+
+
+# ============================================================
+# HASH DE CONTEÚDO
+# ============================================================
+
+def refazer_hashes(cursor, anos, ids=None):
+    """
+    Recalcula em Python o hash_conteudo das linhas de DesempenhoEscola
+    (`ids`, ou todas as dos `anos`) e grava em um UPDATE só as que mudaram.
+    """
+    tabela = connection.ops.quote_name(DesempenhoEscola._meta.db_table)
+    campos = [DesempenhoEscola._meta.get_field(c) for c in DesempenhoEscola.CAMPOS_CONTEUDO]
+    linhas = DesempenhoEscola.objects.filter(ano__in=anos)
+    if ids is not None:
+        linhas = linhas.filter(pk__in=ids)
+    ids_hash, hashes = [], []
+    for pk, *valores in linhas.values_list('pk', *DesempenhoEscola.CAMPOS_CONTEUDO).iterator():
+        ids_hash.append(pk)
+        hashes.append(hash_conteudo(normalizar(c, v) for c, v in zip(campos, valores)))
+    cursor.execute(
+        f"""
+        UPDATE {tabela} t SET hash_conteudo = v.hash
+        FROM unnest(%s::bigint[], %s::bigint[]) AS v(id, hash)
+        WHERE t.id = v.id AND t.ano = ANY(%s) AND t.hash_conteudo IS DISTINCT FROM v.hash
+        """,
+        [ids_hash, hashes, list(anos)],
+    )
+
+
+# ============================================================
+# RECÁLCULO
+# ============================================================
+
+def recalcular(queryset, etapas=ETAPAS, simular=False, publicar=True):
+    """
+    Recalcula os campos derivados das linhas de `queryset` (DesempenhoEscola
+    ou DesempenhoEsfera). Devolve {'etapas': {etapa: {'linhas', 'segundos'}},
+    'linhas': linhas distintas alteradas, 'anos', 'boletins', 'segundos'}.
+
+    Com `publicar`, os boletins estáticos das escolas alteradas são
+    republicados ao final, como depois de uma importação ('boletins' traz
+    o resultado de publicacao.publicar, ou None).
+    """
+    if connection.vendor != 'postgresql':
+        raise RuntimeError('Recálculo em lote disponível apenas no PostgreSQL')
+    invalidas = set(etapas) - set(ETAPAS)
+    if invalidas:
+        raise ValueError(f'Etapas inválidas: {", ".join(sorted(invalidas))}')
+
+    _, d = definicao(queryset.model)
+    tabela = connection.ops.quote_name(queryset.model._meta.db_table)
+    inicio = time.perf_counter()
+    anos = sorted(queryset.order_by().values_list('ano', flat=True).distinct())
+    r = {'etapas': {}, 'linhas': 0, 'anos': anos, 'boletins': None, 'segundos': 0.0}
+    if not anos:
+        return r
+
+    escopo, params_escopo = queryset.order_by().values('pk').query.sql_with_params()
+    atualizacao = ', data_atualizacao = now()'
+    alterados = set()
+    with transaction.atomic(), connection.cursor() as cursor:
+        for etapa in d['etapas']:
+            if etapa not in etapas:
+                continue
+            inicio_etapa = time.perf_counter()
+            sql = SQL_ETAPAS[etapa](tabela, d).format(escopo=escopo, atualizacao=atualizacao)
+            # Os parâmetros do escopo vêm depois dos `ano = ANY(%s)` da etapa
+            cursor.execute(sql, [*_params_etapa(etapa, anos), *params_escopo])
+            ids = [linha[0] for linha in cursor.fetchall()]
+            alterados.update(ids)
+            r['etapas'][etapa] = {'linhas': len(ids), 'segundos': time.perf_counter() - inicio_etapa}
+
+        if d['hash'] and alterados:
+            inicio_etapa = time.perf_counter()
+            refazer_hashes(cursor, anos, list(alterados))
+            r['etapas']['hash_conteudo'] = {
+                'linhas': len(alterados), 'segundos': time.perf_counter() - inicio_etapa,
+            }
+
+        if simular:
+            transaction.set_rollback(True)
+
+    r['linhas'] = len(alterados)
+    if alterados and not simular:
+        dimensoes.invalidar()
+        if queryset.model is DesempenhoEscola:
+            escolas = set(
+                DesempenhoEscola.objects.filter(ano__in=anos, pk__in=alterados)
+                .values_list('escola_id', flat=True)
+            )
+            # Os boletins seguem a versão da escola, não a global
+            dimensoes.invalidar(escolas=escolas)
+            if publicar:
+                r['boletins'] = publicacao.publicar(escolas=escolas)
+    r['segundos'] = time.perf_counter() - inicio
+    return r
@@ -0,0 +1,238 @@
+"""
+Resolução das dimensões durante a importação.
+
+Os arquivos da SABE identificam escolas por INEP ou nome, séries como
+"5º ano", disciplinas como "LP"/"MT" e habilidades por códigos como
+EF05LP01. O resolvedor carrega Escola, Serie, Disciplina e Hab em
+dicionários uma vez (quatro queries) e resolve cada linha em O(1) por
+chaves normalizadas: sem acento, sem caixa, espaços colapsados e com as
+variantes "5º"/"5°"/"5" equivalentes.
+
+Séries, disciplinas e habilidades ausentes são criadas em um único
+bulk_create por lote; escolas não (exigem INEP, endereço etc.) e as linhas
+que citam uma escola desconhecida são rejeitadas, assim como as que citam
+só o número de uma série ambígua ("5" com "5º ano" e "5ª série"
+cadastradas), em vez de criar uma série "5".
+"""
+import re
+import unicodedata
+
+from . import dimensoes
+from .models import Disciplina, Escola, Hab, Serie
+
+
+# Coluna de id -> colunas textuais aceitas no lugar dela, por prioridade
+REFERENCIAS = {
+    'escola_id': ('inep', 'escola'),
+    'serie_id': ('serie',),
+    'disciplina_id': ('disciplina',),
+    'hab_id': ('cd_hab',),
+}
+
+# Coluna opcional com a descrição usada ao criar uma Hab nova
+COLUNA_DESCRICAO_HAB = 'dc_hab'
+
+
+# ============================================================
+# NORMALIZAÇÃO
+# ============================================================
+
+def normalizar_texto(valor):
+    """'  Língua  Portuguesa' -> 'lingua portuguesa'; 'º' vira 'o' e '°' some."""
+    sem_acento = unicodedata.normalize('NFKD', str(valor)).encode('ascii', 'ignore').decode()
+    return ' '.join(sem_acento.casefold().split())
+
+
+def chaves_serie(valor):
+    """
+    Chaves de uma série: o texto normalizado e, se começar por número, o
+    número sozinho ("5º ano", "5° ano", "5 ano" e "5" -> '5').
+    """
+    texto = normalizar_texto(valor)
+    numero = re.match(r'(\d+)', texto)
+    return [texto, numero.group(1)] if numero else [texto]
+
+
+def chave_inep(valor):
+    return re.sub(r'\D', '', str(valor))
+
+
+def chave_hab(valor):
+    return re.sub(r'\s', '', str(valor)).upper()
+
+
+# ============================================================
+# RESOLVEDOR
+# ============================================================
+
+class ResolvedorDimensoes:
+    def __init__(self):
+        self.criadas = 0
+
+        self.escolas = {}
+        for pk, inep, nome in Escola.objects.values_list('id', 'inep', 'nome'):
+            self.escolas[('inep', chave_inep(inep))] = pk
+            self.escolas[('escola', normalizar_texto(nome))] = pk
+
+        self.series = {}
+        self._ambiguas = set()
+        for pk, nome in Serie.objects.values_list('id', 'nome'):
+            self._indexar_serie(pk, nome)
+
+        self.disciplinas = {}
+        for pk, nome, codigo in Disciplina.objects.values_list('id', 'nome', 'codigo'):
+            self._indexar_disciplina(pk, nome, codigo)
+
+        self.habs = {
+            (s, d, chave_hab(cd)): pk
+            for pk, s, d, cd in Hab.objects.values_list('id', 'serie_id', 'disciplina_id', 'cd_hab')
+        }
+
+    def _indexar_serie(self, pk, nome):
+        texto, *numero = chaves_serie(nome)
+        self.series[texto] = pk
+        # "5" só resolve sozinho se uma única série começar por 5
+        for chave in numero:
+            if chave in self._ambiguas:
+                continue
+            if self.series.get(chave, pk) != pk:
+                self._ambiguas.add(chave)
+                del self.series[chave]
+            else:
+                self.series[chave] = pk
+
+    def _indexar_disciplina(self, pk, nome, codigo):
+        self.disciplinas.setdefault(normalizar_texto(nome), pk)
+        if codigo:
+            self.disciplinas.setdefault(normalizar_texto(codigo), pk)
+
+    # ── busca ───────────────────────────────────────────────────────
+
+    def escola(self, tipo, valor):
+        chave = chave_inep(valor) if tipo == 'inep' else normalizar_texto(valor)
+        return self.escolas.get((tipo, chave))
+
+    def serie(self, valor):
+        for chave in chaves_serie(valor):
+            if chave in self.series:
+                return self.series[chave]
+        return None
+
+    def disciplina(self, valor):
+        return self.disciplinas.get(normalizar_texto(valor))
+
+    def hab(self, serie_id, disciplina_id, codigo):
+        return self.habs.get((serie_id, disciplina_id, chave_hab(codigo)))
+
+    # ── criação em lote ─────────────────────────────────────────────
+
+    def _criar_series(self, nomes):
+        novas = {}
+        for nome in nomes:
+            # Número ambíguo: a linha fica sem série e é rejeitada
+            if self.serie(nome) is None and not self._ambiguas.intersection(chaves_serie(nome)):
+                novas.setdefault(chaves_serie(nome)[0], Serie(nome=nome.strip()))
+        Serie.objects.bulk_create(novas.values())
+        for serie in novas.values():
+            self._indexar_serie(serie.pk, serie.nome)
+        return len(novas)
+
+    def _criar_disciplinas(self, nomes):
+        novas = {}
+        for nome in nomes:
+            if self.disciplina(nome) is None:
+                novas.setdefault(normalizar_texto(nome), Disciplina(nome=nome.strip()))
+        Disciplina.objects.bulk_create(novas.values())
+        for disciplina in novas.values():
+            self._indexar_disciplina(disciplina.pk, disciplina.nome, None)
+        return len(novas)
+
+    def _criar_habs(self, itens):
+        """itens: {(serie_id, disciplina_id, código): descrição}."""
+        novas = {}
+        for (serie_id, disciplina_id, codigo), descricao in itens.items():
+            chave = (serie_id, disciplina_id, chave_hab(codigo))
+            if chave not in self.habs and chave not in novas:
+                novas[chave] = Hab(
+                    serie_id=serie_id, disciplina_id=disciplina_id,
+                    cd_hab=chave[2], dc_hab=(descricao or '').strip(),
+                )
+        Hab.objects.bulk_create(novas.values())
+        self.habs.update({chave: hab.pk for chave, hab in novas.items()})
+        return len(novas)
+
+    # ── resolução de um lote ────────────────────────────────────────
+
+    def resolver(self, colunas, linhas, n_chave):
+        """
+        Troca as referências textuais das linhas por ids. Uma referência é
+        a tupla (coluna_textual, texto[, descrição]) produzida na leitura;
+        as `n_chave` primeiras colunas formam a chave natural.
+
+        Devolve (linhas resolvidas, lista de (linha, motivo) rejeitadas).
+        ValueError se o arquivo não tem as colunas para resolver cd_hab.
+        """
+        posicoes = {c: colunas.index(c) for c in REFERENCIAS if c in colunas}
+        if not any(isinstance(l[p], tuple) for l in linhas for p in posicoes.values()):
+            return linhas, []
+
+        if 'hab_id' in posicoes and not {'serie_id', 'disciplina_id'} <= set(posicoes):
+            # O código da habilidade só é único dentro de (série, disciplina);
+            # verificado antes de criar qualquer dimensão do lote
+            raise ValueError('cd_hab exige as colunas de série e disciplina no arquivo')
+
+        linhas = [list(l) for l in linhas]
+        criadas = 0
+        motivos = {}  # índice da linha -> motivo da rejeição
+
+        # Séries e disciplinas primeiro: as habilidades dependem delas
+        for coluna, criar, buscar, rotulo in (
+            ('serie_id', self._criar_series, self.serie, 'série ambígua'),
+            ('disciplina_id', self._criar_disciplinas, self.disciplina, 'disciplina não resolvida'),
+        ):
+            if coluna not in posicoes:
+                continue
+            p = posicoes[coluna]
+            refs = {l[p][1] for l in linhas if isinstance(l[p], tuple)}
+            if refs:
+                criadas += criar(refs)
+                for i, l in enumerate(linhas):
+                    if isinstance(l[p], tuple):
+                        texto = l[p][1]
+                        l[p] = buscar(texto)
+                        if l[p] is None:
+                            motivos.setdefault(i, f'{rotulo} ({coluna.removesuffix("_id")} {texto!r})')
+
+        if 'hab_id' in posicoes:
+            p, ps, pd = posicoes['hab_id'], posicoes.get('serie_id'), posicoes.get('disciplina_id')
+            itens = {
+                (l[ps], l[pd], l[p][1]): (l[p][2] if len(l[p]) > 2 else '')
+                for i, l in enumerate(linhas) if isinstance(l[p], tuple) and i not in motivos
+            }
+            if itens:
+                criadas += self._criar_habs(itens)
+            for i, l in enumerate(linhas):
+                if isinstance(l[p], tuple):
+                    l[p] = None if i in motivos else self.hab(l[ps], l[pd], l[p][1])
+
+        resolvidas, rejeitadas = {}, []
+        pe = posicoes.get('escola_id')
+        for i, l in enumerate(linhas):
+            if i in motivos:
+                rejeitadas.append((l, motivos[i]))
+                continue
+            if pe is not None and isinstance(l[pe], tuple):
+                tipo, texto = l[pe][:2]
+                l[pe] = self.escola(tipo, texto)
+                if l[pe] is None:
+                    rejeitadas.append((l, f'escola não cadastrada ({tipo} {texto!r})'))
+                    continue
+            # Nomes diferentes podem levar ao mesmo id: a chave precisa ser única no lote
+            resolvidas[tuple(l[:n_chave])] = tuple(l)
+
+        if criadas:
+            self.criadas += criadas
+            # bulk_create não dispara os signals de invalidação (séries e
+            # disciplinas novas entram em todos os boletins)
+            dimensoes.invalidar(boletins=True)
+        return list(resolvidas.values()), rejeitadas
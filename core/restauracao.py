@@ -0,0 +1,664 @@
+"""
+Restauração dos backups do pg_dump (formato custom, `bakup_sabe_*.sql`)
+nas tabelas do Django, sem passar pelo pgAdmin.
+
+1. Cada tabela core_* do esquema atual ganha uma cópia vazia e UNLOGGED no
+   esquema temporário `restauracao`.
+2. Os dados do arquivo são extraídos por `pg_restore --data-only -f -`,
+   um processo por tabela, em paralelo (threads, cada uma com sua conexão),
+   e entram na cópia por COPY em streaming, sem arquivo intermediário.
+   O `pg_restore -j` não serve aqui: ele só restaura direto no banco e
+   sempre no esquema de origem (public), por cima das tabelas vivas.
+3. As linhas lidas do arquivo são conferidas com o count(*) de cada cópia.
+4. Se tudo bateu, em uma única transação:
+   - troca: TRUNCATE das tabelas restauradas e das que as referenciam
+     (listadas em 'esvaziadas'), e INSERT ... SELECT da cópia;
+   - delta: remove as linhas que não estão no backup e que nada mais
+     referencia (as referenciadas ficam, contadas em 'mantidas') e faz um
+     INSERT ... ON CONFLICT que só reescreve as que mudaram.
+   Só as colunas presentes no backup são gravadas; as demais ficam com o
+   default do esquema atual (o hash_conteudo de DesempenhoEscola é refeito).
+   As sequências de id são acertadas no final.
+
+As gerações antigas de habilidades (core_habilidade, core_habilidade1,
+core_resulthab, core_resultadohabilidade, core_resultadohabilidade1),
+removidas na migração 0011, são convertidas em Hab e ResultadoHabEscola
+(nível esfera) como na migração 0010. Qualquer outra tabela do backup sem
+correspondente no esquema atual é erro, assim como colunas do backup que
+não existem mais. Partições (core_x_2024, core_x_padrao) voltam para a
+tabela pai.
+"""
+import os
+import re
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from graphlib import TopologicalSorter
+
+from django.apps import apps
+from django.db import connection, connections, transaction
+
+from . import dimensoes, estatisticas, particionamento, recalculo
+from .models import DesempenhoEscola, EstatisticaHabilidade, Hab, ResultadoHabEscola
+
+
+ESQUEMA = 'restauracao'
+MODOS = ('troca', 'delta')
+TAMANHO_BLOCO = 1 << 20
+
+# 3389; 0 16425 TABLE DATA public core_escola postgres
+RE_TOC = re.compile(r'^\d+;\s+\d+\s+\d+\s+TABLE DATA\s+(?P<esquema>\S+)\s+(?P<tabela>\S+)\s')
+RE_COPY = re.compile(rb'^COPY\s+\S+\s+\((?P<colunas>.*)\)\s+FROM\s+stdin;\s*$')
+
+# Estrutura das tabelas legadas na época da migração 0010
+_HABILIDADE = ('id bigint', 'cd_habilidade varchar(20)', 'dc_habilidade text',
+               'disciplina_id bigint', 'serie_id bigint')
+LEGADAS = {
+    'core_habilidade': _HABILIDADE,
+    'core_habilidade1': _HABILIDADE,
+    'core_resulthab': ('id bigint', 'ano integer', 'tx_acerto numeric(5, 2)',
+                       'esfera_id bigint', 'hab_id bigint'),
+    'core_resultadohabilidade1': ('id bigint', 'ano integer', 'tx_acerto numeric(5, 2)',
+                                  'esfera_id bigint', 'habilidade_id bigint'),
+    'core_resultadohabilidade': ('id bigint', 'ano integer', 'cd_habilidade varchar(20)',
+                                 'tx_acerto numeric(5, 2)', 'disciplina_id bigint',
+                                 'esfera_id bigint', 'serie_id bigint'),
+}
+# Tabela legada -> tabela que precisa vir no mesmo backup para a conversão
+REQUER = {
+    'core_resulthab': Hab._meta.db_table,
+    'core_resultadohabilidade1': 'core_habilidade1',
+}
+# Tabelas atuais preenchidas pela conversão, com as colunas que ela grava
+CONVERTIDAS = {
+    Hab._meta.db_table: ('id', 'cd_hab', 'dc_hab', 'disciplina_id', 'serie_id'),
+    ResultadoHabEscola._meta.db_table: (
+        'id', 'ano', 'nivel', 'esfera_id', 'hab_id', 'serie_id', 'disciplina_id', 'tx_acerto',
+    ),
+}
+
+
+# ============================================================
+# ARQUIVO E ESQUEMA
+# ============================================================
+
+def tabelas_core():
+    """Tabelas dos modelos do app core, na ordem das dependências."""
+    return [
+        m._meta.db_table for m in apps.get_app_config('core').get_models()
+        if m._meta.managed and not m._meta.proxy
+    ]
+
+
+def _destino(tabela):
+    """Partições (core_x_2024, core_x_padrao) voltam para a tabela pai."""
+    for pai in particionamento.tabelas_particionadas():
+        if re.fullmatch(rf'{re.escape(pai)}_(\d+|padrao)', tabela):
+            return pai
+    return tabela
+
+
+def entradas(arquivo, pg_restore='pg_restore'):
+    """{tabela de destino: [linhas do TOC]} com os dados das tabelas core_* do arquivo."""
+    saida = subprocess.run(
+        [pg_restore, '--list', arquivo], capture_output=True, text=True, check=True
+    ).stdout
+    por_tabela = {}
+    for linha in saida.splitlines():
+        m = RE_TOC.match(linha)
+        if m and m['esquema'] == 'public' and m['tabela'].startswith('core_'):
+            por_tabela.setdefault(_destino(m['tabela']), []).append(linha)
+    return por_tabela
+
+
+def colunas(cursor, tabela):
+    cursor.execute(
+        """
+        SELECT attname FROM pg_attribute
+        WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped
+        ORDER BY attnum
+        """,
+        [tabela]
+    )
+    return [linha[0] for linha in cursor.fetchall()]
+
+
+def chave_primaria(cursor, tabela):
+    cursor.execute(
+        """
+        SELECT a.attname
+        FROM pg_index i
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+        WHERE i.indrelid = %s::regclass AND i.indisprimary
+        ORDER BY array_position(i.indkey, a.attnum)
+        """,
+        [tabela]
+    )
+    return [linha[0] for linha in cursor.fetchall()]
+
+
+def referencias(cursor, tabela):
+    """[(tabela, colunas, colunas de `tabela`)] de cada FK que aponta para `tabela`."""
+    # conparentid = 0: só a FK da tabela pai, não as cópias nas partições
+    cursor.execute(
+        """
+        SELECT c.conrelid::regclass::text,
+               ARRAY(SELECT a.attname FROM unnest(c.conkey) WITH ORDINALITY k(n, i)
+                     JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = k.n
+                     ORDER BY k.i),
+               ARRAY(SELECT a.attname FROM unnest(c.confkey) WITH ORDINALITY k(n, i)
+                     JOIN pg_attribute a ON a.attrelid = c.confrelid AND a.attnum = k.n
+                     ORDER BY k.i)
+        FROM pg_constraint c
+        WHERE c.contype = 'f' AND c.confrelid = %s::regclass AND c.conparentid = 0
+        """,
+        [tabela]
+    )
+    return cursor.fetchall()
+
+
+def dependentes(cursor, tabelas):
+    """Tabelas fora de `tabelas` que referenciam alguma delas, direta ou indiretamente."""
+    encontradas, pendentes = [], list(tabelas)
+    while pendentes:
+        for filha, _, _ in referencias(cursor, pendentes.pop()):
+            if filha not in tabelas and filha not in encontradas:
+                encontradas.append(filha)
+                pendentes.append(filha)
+    return encontradas
+
+
+def preparar_esquema(cursor, tabelas, legadas=()):
+    qn = cursor.db.ops.quote_name
+    cursor.execute(f'DROP SCHEMA IF EXISTS {ESQUEMA} CASCADE')
+    cursor.execute(f'CREATE SCHEMA {ESQUEMA}')
+    for tabela in tabelas:
+        # Sem índices nem restrições: a cópia só recebe COPY e um SELECT
+        cursor.execute(f'CREATE UNLOGGED TABLE {ESQUEMA}.{qn(tabela)} (LIKE {qn(tabela)})')
+    for tabela in legadas:
+        cursor.execute(f'CREATE UNLOGGED TABLE {ESQUEMA}.{qn(tabela)} ({", ".join(LEGADAS[tabela])})')
+
+
+def remover_esquema(cursor):
+    cursor.execute(f'DROP SCHEMA IF EXISTS {ESQUEMA} CASCADE')
+
+
+# ============================================================
+# CARGA (uma thread por tabela)
+# ============================================================
+
+class _BlocoCopia:
+    """Arquivo que entrega as linhas de um bloco COPY até o terminador `\\.`."""
+
+    def __init__(self, origem):
+        self.origem = origem
+        self.linhas = 0
+        self.fim = False
+
+    def readline(self, *_):
+        if self.fim:
+            return b''
+        linha = self.origem.readline()
+        if not linha or linha.rstrip(b'\r\n') == b'\\.':
+            self.fim = True
+            return b''
+        self.linhas += 1
+        return linha
+
+    def read(self, tamanho=-1):
+        partes, lidos = [], 0
+        while tamanho < 0 or lidos < tamanho:
+            linha = self.readline()
+            if not linha:
+                break
+            partes.append(linha)
+            lidos += len(linha)
+        return b''.join(partes)
+
+
+def _copiar(cursor, tabela, nomes, bloco):
+    sql = f'COPY {tabela} ({", ".join(nomes)}) FROM STDIN'
+    bruto = cursor.cursor
+    if hasattr(bruto, 'copy'):  # psycopg 3
+        with bruto.copy(sql) as copia:
+            while dados := bloco.read(TAMANHO_BLOCO):
+                copia.write(dados)
+    else:  # psycopg2
+        bruto.copy_expert(sql, bloco, size=TAMANHO_BLOCO)
+    # Consome o que sobrar caso o driver pare antes do terminador
+    while bloco.readline():
+        pass
+    return bloco.linhas
+
+
+def carregar_tabela(arquivo, tabela, toc, vivas, pg_restore='pg_restore'):
+    """
+    Extrai do arquivo os dados de `tabela` para a cópia no esquema temporário.
+    Roda em thread própria (e portanto com conexão própria). Devolve o
+    número de linhas lidas do arquivo e as colunas do backup (as do COPY).
+    """
+    conexao = connections['default']
+    qn = conexao.ops.quote_name
+    descritor, lista = tempfile.mkstemp(suffix='.lst')
+    try:
+        with os.fdopen(descritor, 'w') as f:
+            f.write('\n'.join(toc) + '\n')
+        with tempfile.TemporaryFile() as erros:
+            processo = subprocess.Popen(
+                [pg_restore, '--data-only', '--use-list', lista, '--file', '-', arquivo],
+                stdout=subprocess.PIPE, stderr=erros,
+            )
+            total, cabecalho = 0, None
+            try:
+                with conexao.cursor() as cursor:
+                    for linha in processo.stdout:
+                        m = RE_COPY.match(linha)
+                        if not m:
+                            continue
+                        nomes = [c.strip().strip('"') for c in m['colunas'].decode().split(',')]
+                        sobrando = [c for c in nomes if c not in vivas]
+                        if sobrando:
+                            raise ValueError(
+                                f'colunas do backup ausentes no esquema atual: {", ".join(sobrando)}'
+                            )
+                        if cabecalho is None:
+                            cabecalho = nomes
+                        elif set(nomes) != set(cabecalho):
+                            raise ValueError('partições do backup com colunas diferentes')
+                        total += _copiar(
+                            cursor, f'{ESQUEMA}.{qn(tabela)}',
+                            [qn(c) for c in nomes], _BlocoCopia(processo.stdout),
+                        )
+            finally:
+                processo.stdout.close()
+                if processo.wait() != 0:
+                    erros.seek(0)
+                    mensagem = erros.read().decode(errors='replace').strip()
+                    raise RuntimeError(f'pg_restore terminou com código {processo.returncode}: {mensagem}')
+        # Sem bloco COPY não há linhas: qualquer lista de colunas serve
+        return total, cabecalho or list(vivas)
+    finally:
+        os.unlink(lista)
+        conexao.close()
+
+
+# ============================================================
+# CONVERSÃO DAS HABILIDADES LEGADAS
+# ============================================================
+
+def converter_legadas(cursor, legadas):
+    """
+    Grava, nas cópias de Hab e ResultadoHabEscola do esquema temporário, o
+    conteúdo das tabelas legadas, com as regras da migração 0010:
+    Habilidade1 e Habilidade viram Hab casadas por (série, disciplina,
+    código), mantendo as existentes; códigos citados só nos resultados
+    viram Hab sem descrição; os resultados viram linhas de esfera, e quando
+    a mesma (ano, esfera, habilidade) aparece em mais de uma tabela vale a
+    geração mais nova (ResultHab, ResultadoHabilidade1, ResultadoHabilidade).
+    A taxa de acerto passa a pontos-base como na migração 0012.
+
+    As linhas novas recebem o id da linha viva com a mesma chave natural
+    ((série, disciplina, código) em Hab, (ano, esfera, habilidade) nos
+    resultados) ou um id novo da sequência da tabela viva: no modo delta,
+    aplicar_delta casa por id e nunca sobrescreve uma linha viva sem
+    relação com a convertida.
+
+    Devolve {tabela atual: linhas convertidas}.
+    """
+    qn = cursor.db.ops.quote_name
+    hab = f'{ESQUEMA}.{qn(Hab._meta.db_table)}'
+    resultados = f'{ESQUEMA}.{qn(ResultadoHabEscola._meta.db_table)}'
+    hab_vivo = qn(Hab._meta.db_table)
+    resultados_vivo = qn(ResultadoHabEscola._meta.db_table)
+
+    def t(tabela):
+        return f'{ESQUEMA}.{qn(tabela)}'
+
+    codigos = []
+    if 'core_habilidade1' in legadas:
+        codigos.append(
+            f"SELECT serie_id, disciplina_id, btrim(cd_habilidade) AS cd, dc_habilidade AS dc, 1 AS ordem "
+            f"FROM {t('core_habilidade1')}"
+        )
+    if 'core_habilidade' in legadas:
+        codigos.append(
+            f"SELECT serie_id, disciplina_id, btrim(cd_habilidade), dc_habilidade, 2 "
+            f"FROM {t('core_habilidade')}"
+        )
+    if 'core_resultadohabilidade1' in legadas:
+        codigos.append(
+            f"SELECT l.serie_id, l.disciplina_id, btrim(l.cd_habilidade), '', 3 "
+            f"FROM {t('core_resultadohabilidade1')} r JOIN {t('core_habilidade1')} l ON l.id = r.habilidade_id"
+        )
+    if 'core_resultadohabilidade' in legadas:
+        codigos.append(
+            f"SELECT serie_id, disciplina_id, btrim(cd_habilidade), '', 4 "
+            f"FROM {t('core_resultadohabilidade')}"
+        )
+
+    convertidas = {Hab._meta.db_table: 0, ResultadoHabEscola._meta.db_table: 0}
+    if codigos:
+        cursor.execute(
+            f"""
+            INSERT INTO {hab} (id, serie_id, disciplina_id, cd_hab, dc_hab)
+            SELECT COALESCE(v.id, nextval(pg_get_serial_sequence(%s, 'id'))),
+                   novas.serie_id, novas.disciplina_id, novas.cd, novas.dc
+            FROM (
+                SELECT DISTINCT ON (serie_id, disciplina_id, cd) serie_id, disciplina_id, cd, dc
+                FROM ({" UNION ALL ".join(codigos)}) origem
+                ORDER BY serie_id, disciplina_id, cd, ordem
+            ) novas
+            LEFT JOIN {hab_vivo} v
+              ON v.serie_id = novas.serie_id AND v.disciplina_id = novas.disciplina_id
+             AND btrim(v.cd_hab) = novas.cd
+            WHERE NOT EXISTS (
+                SELECT 1 FROM {hab} h
+                WHERE h.serie_id = novas.serie_id AND h.disciplina_id = novas.disciplina_id
+                  AND btrim(h.cd_hab) = novas.cd
+            )
+            """,
+            [Hab._meta.db_table],
+        )
+        convertidas[Hab._meta.db_table] = cursor.rowcount
+
+    def por_codigo(alias):
+        return (
+            f'JOIN {hab} h ON h.serie_id = {alias}.serie_id AND h.disciplina_id = {alias}.disciplina_id '
+            f'AND btrim(h.cd_hab) = btrim({alias}.cd_habilidade)'
+        )
+
+    fatos = []
+    if 'core_resulthab' in legadas:
+        fatos.append(
+            f"SELECT r.ano, r.esfera_id, h.id AS hab_id, h.serie_id, h.disciplina_id, r.tx_acerto, 1 AS ordem "
+            f"FROM {t('core_resulthab')} r JOIN {hab} h ON h.id = r.hab_id"
+        )
+    if 'core_resultadohabilidade1' in legadas:
+        fatos.append(
+            f"SELECT r.ano, r.esfera_id, h.id, h.serie_id, h.disciplina_id, r.tx_acerto, 2 "
+            f"FROM {t('core_resultadohabilidade1')} r "
+            f"JOIN {t('core_habilidade1')} l ON l.id = r.habilidade_id {por_codigo('l')}"
+        )
+    if 'core_resultadohabilidade' in legadas:
+        fatos.append(
+            f"SELECT r.ano, r.esfera_id, h.id, h.serie_id, h.disciplina_id, r.tx_acerto, 3 "
+            f"FROM {t('core_resultadohabilidade')} r {por_codigo('r')}"
+        )
+
+    if fatos:
+        cursor.execute(
+            f"""
+            INSERT INTO {resultados}
+                (id, ano, nivel, esfera_id, hab_id, serie_id, disciplina_id, tx_acerto)
+            SELECT COALESCE(v.id, nextval(pg_get_serial_sequence(%s, 'id'))),
+                   novos.ano, %s, novos.esfera_id, novos.hab_id, novos.serie_id, novos.disciplina_id,
+                   (CASE WHEN novos.tx_acerto >= 0 THEN round(novos.tx_acerto * %s) END)::smallint
+            FROM (
+                SELECT DISTINCT ON (ano, esfera_id, hab_id) *
+                FROM ({" UNION ALL ".join(fatos)}) origem
+                ORDER BY ano, esfera_id, hab_id, ordem
+            ) novos
+            LEFT JOIN {resultados_vivo} v
+              ON v.ano = novos.ano AND v.esfera_id = novos.esfera_id AND v.hab_id = novos.hab_id
+            WHERE NOT EXISTS (
+                SELECT 1 FROM {resultados} a
+                WHERE a.ano = novos.ano AND a.esfera_id = novos.esfera_id AND a.hab_id = novos.hab_id
+            )
+            """,
+            [ResultadoHabEscola._meta.db_table, ResultadoHabEscola.NIVEL_ESFERA, ResultadoHabEscola.ESCALA_TX],
+        )
+        convertidas[ResultadoHabEscola._meta.db_table] = cursor.rowcount
+    return convertidas
+
+
+# ============================================================
+# APLICAÇÃO
+# ============================================================
+
+def _garantir_particoes(cursor, tabelas):
+    qn = cursor.db.ops.quote_name
+    anos = set()
+    for tabela in set(tabelas) & set(particionamento.tabelas_particionadas()):
+        cursor.execute(f'SELECT DISTINCT {particionamento.COLUNA} FROM {ESQUEMA}.{qn(tabela)}')
+        anos.update(ano for (ano,) in cursor.fetchall() if ano is not None)
+    for ano in sorted(anos):
+        particionamento.garantir_ano(ano)
+
+
+def aplicar_troca(cursor, tabelas, nomes, esvaziar=()):
+    """
+    Substitui todo o conteúdo das tabelas; `esvaziar` são as tabelas fora
+    do backup que as referenciam (sem isso o TRUNCATE é recusado). Devolve
+    {tabela: {'inseridas': n}}.
+    """
+    qn = cursor.db.ops.quote_name
+    cursor.execute('TRUNCATE ' + ', '.join(qn(t) for t in [*tabelas, *esvaziar]))
+    resultado = {}
+    for tabela in tabelas:
+        lista = ', '.join(qn(c) for c in nomes[tabela])
+        cursor.execute(f'INSERT INTO {qn(tabela)} ({lista}) SELECT {lista} FROM {ESQUEMA}.{qn(tabela)}')
+        resultado[tabela] = {'inseridas': cursor.rowcount}
+    return resultado
+
+
+def aplicar_delta(cursor, tabelas, nomes):
+    """
+    Aplica só a diferença. Linhas fora do backup que ainda são referenciadas
+    (por tabelas fora do backup, ou por linhas que o backup mantém) não são
+    removidas. Devolve {tabela: {'inseridas', 'atualizadas', 'removidas',
+    'mantidas'}}.
+    """
+    qn = cursor.db.ops.quote_name
+    chaves, filhas = {}, {}
+    for tabela in tabelas:
+        chaves[tabela] = chave_primaria(cursor, tabela)
+        if not chaves[tabela]:
+            raise ValueError(f'{tabela}: sem chave primária, use o modo troca')
+        filhas[tabela] = referencias(cursor, tabela)
+    resultado = {tabela: {} for tabela in tabelas}
+
+    # Filhas antes das pais: a linha pai só sai depois das que a referenciavam
+    ordem = TopologicalSorter({
+        tabela: {filha for filha, _, _ in filhas[tabela] if filha in tabelas and filha != tabela}
+        for tabela in tabelas
+    }).static_order()
+    for tabela in ordem:
+        copia = f'{ESQUEMA}.{qn(tabela)}'
+        fora = (
+            f'NOT EXISTS (SELECT 1 FROM {copia} AS novo WHERE '
+            + ' AND '.join(f'novo.{qn(c)} = atual.{qn(c)}' for c in chaves[tabela]) + ')'
+        )
+        livre = [
+            f'NOT EXISTS (SELECT 1 FROM {qn(filha)} AS filha WHERE '
+            + ' AND '.join(f'filha.{qn(a)} = atual.{qn(b)}' for a, b in zip(de, para)) + ')'
+            for filha, de, para in filhas[tabela]
+        ]
+        cursor.execute(f'DELETE FROM {qn(tabela)} AS atual WHERE ' + ' AND '.join([fora, *livre]))
+        resultado[tabela]['removidas'] = cursor.rowcount
+        cursor.execute(f'SELECT count(*) FROM {qn(tabela)} AS atual WHERE {fora}')
+        resultado[tabela]['mantidas'] = cursor.fetchone()[0]
+
+    for tabela in tabelas:
+        chave = chaves[tabela]
+        copia = f'{ESQUEMA}.{qn(tabela)}'
+        lista = ', '.join(qn(c) for c in nomes[tabela])
+        resto = [qn(c) for c in nomes[tabela] if c not in chave]
+        if resto:
+            conflito = (
+                'DO UPDATE SET ' + ', '.join(f'{c} = EXCLUDED.{c}' for c in resto)
+                + ' WHERE (' + ', '.join(f'atual.{c}' for c in resto) + ')'
+                + ' IS DISTINCT FROM (' + ', '.join(f'EXCLUDED.{c}' for c in resto) + ')'
+            )
+        else:
+            conflito = 'DO NOTHING'
+        cursor.execute(
+            f'WITH gravadas AS ('
+            f'INSERT INTO {qn(tabela)} AS atual ({lista}) SELECT {lista} FROM {copia} '
+            f'ON CONFLICT ({", ".join(qn(c) for c in chave)}) {conflito} '
+            f'RETURNING (xmax = 0) AS nova) '
+            f'SELECT count(*) FILTER (WHERE nova), count(*) FILTER (WHERE NOT nova) FROM gravadas'
+        )
+        inseridas, atualizadas = cursor.fetchone()
+        resultado[tabela].update(inseridas=inseridas, atualizadas=atualizadas)
+    return resultado
+
+
+def acertar_sequencias(cursor, tabelas, nomes):
+    qn = cursor.db.ops.quote_name
+    for tabela in tabelas:
+        if 'id' not in nomes[tabela]:
+            continue
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [qn(tabela)])
+        sequencia = cursor.fetchone()[0]
+        if sequencia:
+            cursor.execute(
+                f'SELECT setval(%s::regclass, COALESCE(MAX(id), 0) + 1, false) FROM {qn(tabela)}',
+                [sequencia]
+            )
+
+
+def _refazer_hashes(cursor):
+    """O backup não trouxe hash_conteudo: refaz o das linhas restauradas."""
+    cursor.execute(
+        f'SELECT DISTINCT ano FROM {ESQUEMA}.{cursor.db.ops.quote_name(DesempenhoEscola._meta.db_table)}'
+    )
+    anos = [ano for (ano,) in cursor.fetchall()]
+    if anos:
+        recalculo.refazer_hashes(cursor, anos)
+
+
+# ============================================================
+# ORQUESTRAÇÃO
+# ============================================================
+
+def restaurar(arquivo, modo='troca', tabelas=None, processos=None, simular=False,
+              manter_esquema=False, pg_restore='pg_restore', progresso=None):
+    """
+    Restaura `arquivo` nas tabelas do Django.
+
+    Devolve {'tabelas': {tabela: {'backup', 'copia', 'atuais', 'inseridas',
+    ...}}, 'legadas': {tabela: {'backup', 'copia'}}, 'esvaziadas', 'erros',
+    'aplicado', 'segundos'}. Com qualquer erro (tabela do backup sem
+    destino, falha de carga ou de contagem) nada é aplicado.
+    """
+    if modo not in MODOS:
+        raise ValueError(f'Modo inválido: {modo}')
+    if connection.vendor != 'postgresql':
+        raise RuntimeError('Restauração disponível apenas no PostgreSQL')
+
+    inicio = time.perf_counter()
+    no_arquivo = entradas(arquivo, pg_restore)
+    atuais = tabelas_core()
+
+    def pedida(tabela):
+        return not tabelas or tabela in tabelas
+
+    # As legadas só entram se algum dos destinos da conversão foi pedido,
+    # e então os dois são restaurados (os resultados citam as Hab criadas)
+    legadas = [t for t in LEGADAS if t in no_arquivo]
+    if not any(pedida(t) for t in CONVERTIDAS):
+        legadas = []
+    vivas = [
+        t for t in atuais
+        if (t in no_arquivo and pedida(t)) or (legadas and t in CONVERTIDAS)
+    ]
+    r = {
+        'tabelas': {t: {} for t in vivas},
+        'legadas': {t: {} for t in legadas},
+        'esvaziadas': [],
+        'erros': {},
+        'aplicado': False,
+        'segundos': 0.0,
+    }
+    for tabela in sorted(set(no_arquivo) - set(atuais) - set(LEGADAS)):
+        if pedida(tabela):
+            r['erros'][tabela] = 'não existe no esquema atual e não tem conversão; nada seria restaurado'
+    for tabela in legadas:
+        if tabela in REQUER and REQUER[tabela] not in no_arquivo:
+            r['erros'][tabela] = f'conversão exige {REQUER[tabela]} no mesmo backup'
+    if r['erros'] or not vivas:
+        r['segundos'] = time.perf_counter() - inicio
+        return r
+
+    extraidas = [t for t in vivas if t in no_arquivo] + legadas
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        permitidas = {t: colunas(cursor, t) for t in vivas}
+        permitidas.update({t: [c.split()[0] for c in LEGADAS[t]] for t in legadas})
+        if modo == 'troca':
+            r['esvaziadas'] = dependentes(cursor, vivas)
+        preparar_esquema(cursor, vivas, legadas)
+    # As threads abrem conexões próprias; a transação da principal não as vê
+    connection.close()
+
+    nomes = {}
+    try:
+        with ThreadPoolExecutor(max_workers=processos or min(len(extraidas), os.cpu_count() or 1)) as pool:
+            futuros = {
+                pool.submit(carregar_tabela, arquivo, t, no_arquivo[t], permitidas[t], pg_restore): t
+                for t in extraidas
+            }
+            for futuro, tabela in futuros.items():
+                contagem = r['tabelas'].get(tabela, r['legadas'].get(tabela))
+                try:
+                    contagem['backup'], nomes[tabela] = futuro.result()
+                except Exception as erro:
+                    r['erros'][tabela] = str(erro)
+                if progresso:
+                    progresso(tabela, r)
+
+        with connection.cursor() as cursor:
+            for tabela in extraidas:
+                contagem = r['tabelas'].get(tabela, r['legadas'].get(tabela))
+                cursor.execute(f'SELECT count(*) FROM {ESQUEMA}.{qn(tabela)}')
+                contagem['copia'] = cursor.fetchone()[0]
+                lidas = contagem.get('backup')
+                if lidas is not None and lidas != contagem['copia']:
+                    r['erros'][tabela] = f'{lidas} linhas no backup, {contagem["copia"]} restauradas'
+            for tabela in vivas:
+                cursor.execute(f'SELECT count(*) FROM {qn(tabela)}')
+                r['tabelas'][tabela]['atuais'] = cursor.fetchone()[0]
+
+            if not r['erros'] and legadas:
+                for tabela, n in converter_legadas(cursor, legadas).items():
+                    r['tabelas'][tabela]['convertidas'] = n
+                    nomes[tabela] = list(dict.fromkeys([*nomes.get(tabela, ()), *CONVERTIDAS[tabela]]))
+
+        if r['erros']:
+            r['segundos'] = time.perf_counter() - inicio
+            return r
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            # FKs do Django são DEFERRABLE: a ordem das tabelas não importa
+            cursor.execute('SET CONSTRAINTS ALL DEFERRED')
+            _garantir_particoes(cursor, vivas)
+            if modo == 'troca':
+                aplicadas = aplicar_troca(cursor, vivas, nomes, r['esvaziadas'])
+            else:
+                aplicadas = aplicar_delta(cursor, vivas, nomes)
+            for tabela, contagem in aplicadas.items():
+                r['tabelas'][tabela].update(contagem)
+            acertar_sequencias(cursor, vivas, nomes)
+            desempenho = DesempenhoEscola._meta.db_table
+            if desempenho in vivas and 'hash_conteudo' not in nomes[desempenho]:
+                _refazer_hashes(cursor)
+            if simular:
+                transaction.set_rollback(True)
+        r['aplicado'] = not simular
+    finally:
+        if not manter_esquema:
+            with connection.cursor() as cursor:
+                remover_esquema(cursor)
+
+    if r['aplicado']:
+        # SQL direto não dispara os signals de invalidação
+        dimensoes.invalidar(boletins=True)
+        resultados = ResultadoHabEscola._meta.db_table
+        if (
+            (resultados in vivas or resultados in r['esvaziadas'])
+            and EstatisticaHabilidade._meta.db_table not in vivas
+        ):
+            estatisticas.atualizar()
+    r['segundos'] = time.perf_counter() - inicio
+    return r
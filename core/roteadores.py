@@ -0,0 +1,169 @@
+"""
+Roteamento das leituras dos painéis para réplicas de leitura.
+
+Configuração (settings):
+    DATABASES['replica1'] = {...}   # PostgreSQL em streaming replication ou cópia SQLite
+    REPLICAS_LEITURA = ['replica1']
+    REPLICA_ATRASO_MAXIMO = 30      # segundos de atraso de replicação tolerados
+    REPLICA_FIXAR_SEGUNDOS = 15     # leituras no primário após uma gravação pela web
+
+Só as requisições GET/HEAD fora do admin leem das réplicas (o middleware
+escolhe uma réplica por requisição); admin, gravações e comandos de
+gerenciamento (importações) usam sempre o `default`. Apenas os modelos do
+app core são roteados: sessão e autenticação ficam no primário.
+
+Depois de uma gravação pela web (um POST no admin, por exemplo) o navegador
+recebe um cookie que fixa suas leituras no primário por alguns segundos,
+para que quem editou veja a própria edição.
+
+Réplicas fora do ar ou atrasadas demais saem do rodízio; a verificação é
+refeita a cada VERIFICACAO_SEGUNDOS, por processo. Sem réplicas saudáveis
+tudo volta para o `default`.
+"""
+import contextvars
+import random
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+
+COOKIE_FIXAR = 'sabe_primario'
+METODOS_LEITURA = ('GET', 'HEAD', 'OPTIONS')
+PREFIXOS_PRIMARIO = ('/admin/',)
+VERIFICACAO_SEGUNDOS = 10
+
+# Réplica escolhida para a requisição atual (None = primário)
+_replica = contextvars.ContextVar('sabe_replica', default=None)
+
+# alias -> (saudável, instante da verificação)
+_saude = {}
+
+
+def replicas():
+    return list(getattr(settings, 'REPLICAS_LEITURA', []))
+
+
+# ============================================================
+# SAÚDE DAS RÉPLICAS
+# ============================================================
+
+def atraso(alias):
+    """Atraso de replicação em segundos (0 para cópias e para o primário)."""
+    conexao = connections[alias]
+    if conexao.vendor != 'postgresql':
+        conexao.ensure_connection()
+        return 0.0
+    with conexao.cursor() as cursor:
+        # Sem escrita pendente de replay o atraso é zero, mesmo com o primário ocioso
+        cursor.execute(
+            """
+            SELECT CASE
+                WHEN NOT pg_is_in_recovery()
+                  OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+            END
+            """
+        )
+        return float(cursor.fetchone()[0])
+
+
+def saudavel(alias):
+    agora = time.monotonic()
+    estado = _saude.get(alias)
+    if estado and agora - estado[1] < VERIFICACAO_SEGUNDOS:
+        return estado[0]
+    try:
+        ok = atraso(alias) <= getattr(settings, 'REPLICA_ATRASO_MAXIMO', 30)
+    except DatabaseError:
+        ok = False
+        connections[alias].close()
+    _saude[alias] = (ok, agora)
+    return ok
+
+
+def escolher_replica():
+    saudaveis = [alias for alias in replicas() if saudavel(alias)]
+    return random.choice(saudaveis) if saudaveis else None
+
+
+# ============================================================
+# USO NAS VIEWS
+# ============================================================
+
+def banco_leitura():
+    """
+    Alias para as consultas SQL escritas à mão. Elas usam o dialeto do
+    primário, então uma réplica de outro banco (cópia SQLite) só atende o ORM.
+    """
+    alias = _replica.get()
+    if alias is None or connections[alias].vendor != connections[DEFAULT_DB_ALIAS].vendor:
+        return DEFAULT_DB_ALIAS
+    return alias
+
+
+@contextmanager
+def primario():
+    """Força as leituras do bloco no primário."""
+    token = _replica.set(None)
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+# ============================================================
+# ROTEADOR E MIDDLEWARE
+# ============================================================
+
+class RoteadorLeitura:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != 'core':
+            return None
+        return _replica.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        bancos = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in bancos and obj2._state.db in bancos:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Réplicas recebem o esquema por replicação (ou cópia do arquivo)
+        if db in replicas():
+            return False
+        return None
+
+
+class LeituraReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _replica.set(self._escolher(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _replica.reset(token)
+
+        if request.method not in METODOS_LEITURA and response.status_code < 400:
+            response.set_cookie(
+                COOKIE_FIXAR, '1',
+                max_age=getattr(settings, 'REPLICA_FIXAR_SEGUNDOS', 15),
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+    def _escolher(self, request):
+        if (
+            not replicas()
+            or request.method not in METODOS_LEITURA
+            or COOKIE_FIXAR in request.COOKIES
+            or request.path_info.startswith(PREFIXOS_PRIMARIO)
+        ):
+            return None
+        return escolher_replica()
@@ -0,0 +1,25 @@
+"""
+Configurações do projeto, escolhidas pela variável de ambiente SABE_AMBIENTE:
+
+    dev   (padrão) DEBUG ligado e hosts da rede local; credenciais do
+                   ambiente ou do arquivo .env
+    prod           sem DEBUG, templates em cache, conexões persistentes,
+                   cache compartilhado e estáticos comprimidos
+
+Exemplo:
+    SABE_AMBIENTE=prod SECRET_KEY=... DB_PASSWORD=... ALLOWED_HOSTS=sabe.exemplo.gov.br \
+        gunicorn core.wsgi
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+
+AMBIENTE = os.environ.get('SABE_AMBIENTE', 'dev')
+
+if AMBIENTE == 'prod':
+    from .prod import *  # noqa: F401,F403
+elif AMBIENTE == 'dev':
+    from .dev import *  # noqa: F401,F403
+else:
+    raise ImproperlyConfigured(f'SABE_AMBIENTE inválido: {AMBIENTE!r} (use dev ou prod)')
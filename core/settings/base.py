@@ -0,0 +1,202 @@
+"""
+Django settings for core project: configurações comuns a todos os
+ambientes. Os valores que mudam por ambiente vêm de variáveis de ambiente;
+dev.py e prod.py completam o resto (ver core/settings/__init__.py).
+
+Generated by 'django-admin startproject' using Django 6.0.2.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/6.0/topics/settings/
+
+For the full list of settings and their values, see
+https://docs.djangoproject.com/en/6.0/ref/settings/
+"""
+
+import os
+from pathlib import Path
+
+from django.core.exceptions import ImproperlyConfigured
+
+# Build paths inside the project like this: BASE_DIR / 'subdir'.
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+
+def carregar_env(caminho=BASE_DIR / '.env'):
+    """
+    Lê linhas NOME=valor de um arquivo .env (fora do git) para os.environ,
+    sem sobrescrever variáveis já definidas no ambiente.
+    """
+    if not caminho.exists():
+        return
+    for linha in caminho.read_text(encoding='utf-8').splitlines():
+        linha = linha.strip()
+        if not linha or linha.startswith('#') or '=' not in linha:
+            continue
+        nome, valor = linha.split('=', 1)
+        os.environ.setdefault(nome.strip(), valor.strip().strip('"\''))
+
+
+def lista_env(nome, padrao=()):
+    """Variável de ambiente com valores separados por vírgula."""
+    valor = os.environ.get(nome)
+    if valor is None:
+        return list(padrao)
+    return [item.strip() for item in valor.split(',') if item.strip()]
+
+
+def obrigatoria(nome):
+    valor = os.environ.get(nome)
+    if not valor:
+        raise ImproperlyConfigured(f'Defina a variável de ambiente {nome} (ou no arquivo .env)')
+    return valor
+
+
+carregar_env()
+
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = os.environ.get('SECRET_KEY')
+
+# SECURITY WARNING: don't run with debug turned on in production!
+DEBUG = False
+
+ALLOWED_HOSTS = lista_env('ALLOWED_HOSTS')
+
+# Application definition
+
+INSTALLED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'core',
+    ]
+
+MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.roteadores.LeituraReplicaMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+ROOT_URLCONF = 'core.urls'
+
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+                'core.context_processors.cache_fragmentos',
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = 'core.wsgi.application'
+
+
+# Database
+# https://docs.djangoproject.com/en/6.0/ref/settings/#databases
+
+# Conexões: persistentes por padrão (reaproveitadas por até DB_CONN_MAX_AGE
+# segundos) ou, com DB_POOL=1, um pool do psycopg 3 em cada processo de
+# worker. O Django não combina os dois. Com pool, o total de conexões é
+# workers x DB_POOL_MAX e precisa caber no max_connections do PostgreSQL.
+DB_POOL = os.environ.get('DB_POOL', '0') == '1'
+DB_POOL_MIN = int(os.environ.get('DB_POOL_MIN', 2))
+DB_POOL_MAX = int(os.environ.get('DB_POOL_MAX', 8))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+
+DATABASES = {
+     'default': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('DB_NAME', 'teste'),
+        'USER': os.environ.get('DB_USER', 'postgres'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        'CONN_MAX_AGE': 0 if DB_POOL else DB_CONN_MAX_AGE,
+        # Testa a conexão reaproveitada antes do primeiro uso em cada requisição
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'pool': {
+                'min_size': DB_POOL_MIN,
+                'max_size': DB_POOL_MAX,
+                'timeout': DB_POOL_TIMEOUT,
+            },
+        } if DB_POOL else {},
+    }
+
+    # Réplica de leitura (PostgreSQL em streaming replication ou, localmente,
+    # uma cópia SQLite) e acrescente o alias em REPLICAS_LEITURA:
+    # 'replica1': {
+    #     'ENGINE': 'django.db.backends.postgresql',
+    #     'NAME': 'teste',
+    #     'USER': 'postgres',
+    #     'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+    #     'HOST': 'replica1',
+    #     'PORT': '5432',
+    # },
+}
+
+# Leituras dos painéis vão para as réplicas saudáveis (ver core/roteadores.py)
+DATABASE_ROUTERS = ['core.roteadores.RoteadorLeitura']
+REPLICAS_LEITURA = []
+REPLICA_ATRASO_MAXIMO = 30
+REPLICA_FIXAR_SEGUNDOS = 15
+
+# Password validation
+# https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    },
+]
+
+
+# Internationalization
+# https://docs.djangoproject.com/en/6.0/topics/i18n/
+
+LANGUAGE_CODE = 'en-us'
+
+TIME_ZONE = 'UTC'
+
+USE_I18N = True
+
+USE_TZ = True
+
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/6.0/howto/static-files/
+
+STATIC_URL = 'static/'
+STATIC_ROOT = Path(os.environ.get('STATIC_ROOT', BASE_DIR / 'staticfiles'))
+
+# Boletins publicados como arquivos estáticos (core/publicacao.py)
+BOLETINS_DIR = Path(os.environ.get('BOLETINS_DIR', BASE_DIR / 'boletins_publicados'))
+# 'X-Accel-Redirect' (nginx, location interna em BOLETINS_SENDFILE_PREFIXO) ou
+# 'X-Sendfile' (Apache); vazio = o próprio worker entrega o arquivo
+BOLETINS_SENDFILE = os.environ.get('BOLETINS_SENDFILE') or None
+BOLETINS_SENDFILE_PREFIXO = os.environ.get('BOLETINS_SENDFILE_PREFIXO', '/boletins-publicados/')
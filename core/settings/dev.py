@@ -0,0 +1,27 @@
+"""
+Desenvolvimento: DEBUG ligado e hosts da máquina local. Com DEBUG o Django
+guarda cada query em connection.queries; não use em produção.
+
+SECRET_KEY e DB_PASSWORD não têm valor padrão: defina-as no ambiente ou
+no arquivo .env da raiz do projeto (ignorado pelo git), por exemplo:
+
+    SECRET_KEY=<python -c "from django.core.management.utils import get_random_secret_key as g; print(g())">
+    DB_PASSWORD=<senha do postgres local>
+"""
+from .base import *  # noqa: F401,F403
+from .base import DATABASES, lista_env, obrigatoria
+
+
+SECRET_KEY = obrigatoria('SECRET_KEY')
+
+DEBUG = True
+
+ALLOWED_HOSTS = lista_env('ALLOWED_HOSTS', ['192.168.0.148', 'localhost', '127.0.0.1'])
+
+DATABASES['default']['PASSWORD'] = obrigatoria('DB_PASSWORD')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
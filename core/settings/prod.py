@@ -0,0 +1,62 @@
+"""
+Produção: sem DEBUG (nenhuma query guardada por requisição), templates
+compilados uma vez por processo, conexões persistentes, cache Redis
+compartilhado entre os workers e os comandos de importação (a versão de
+dados de core/dimensoes.py precisa ser a mesma para todos) e estáticos
+comprimidos com nomes versionados.
+"""
+import os
+
+from .base import *  # noqa: F401,F403
+from .base import DATABASES, DB_POOL, MIDDLEWARE, TEMPLATES, lista_env, obrigatoria
+
+
+SECRET_KEY = obrigatoria('SECRET_KEY')
+
+DEBUG = False
+
+ALLOWED_HOSTS = lista_env('ALLOWED_HOSTS')
+if not ALLOWED_HOSTS:
+    obrigatoria('ALLOWED_HOSTS')
+
+DATABASES['default']['PASSWORD'] = obrigatoria('DB_PASSWORD')
+if not DB_POOL:
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 600))
+
+# Templates compilados uma vez por processo
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+        'KEY_PREFIX': 'sabe',
+        'TIMEOUT': 60 * 15,
+    },
+}
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Estáticos comprimidos (gzip/brotli) e servidos pelo próprio worker com
+# cache longo, via WhiteNoise; sem ele, só nomes versionados por hash.
+try:
+    import whitenoise  # noqa: F401
+except ImportError:
+    BACKEND_ESTATICOS = 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'
+else:
+    BACKEND_ESTATICOS = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1,
+        'whitenoise.middleware.WhiteNoiseMiddleware',
+    )
+
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': BACKEND_ESTATICOS},
+}
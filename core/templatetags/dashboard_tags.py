@@ -1,9 +0,0 @@
-from django import template
-
-register = template.Library()
-
-@register.filter
-def get_item(dictionary, key):
-    if dictionary:
-        return dictionary.get(key)
-    return None
\ No newline at end of file
@@ -1,11 +1,61 @@
+"""
+Filtros e tags dos painéis (biblioteca única: `{% load painel_tags %}`).
+
+Todos são chamados dentro de laços aninhados (anos x esferas x séries),
+então cada busca é O(1) e nenhum filtro converte valores sem necessidade.
+"""
 from django import template
 
 register = template.Library()
 
+
 @register.filter
-def dict_key(d, key):
-    """Retorna o valor do dicionário para a chave fornecida."""
-    return d.get(key)
+def get_item(container, chave):
+    """
+    `container[chave]` para dicionários (por chave) e listas/tuplas (por
+    posição). Devolve None se não existir; índices negativos não voltam ao
+    fim da lista (`idx|add:"-1"` no primeiro ano não é o último ano).
+    """
+    if container is None:
+        return None
+    if isinstance(container, dict):
+        return container.get(chave)
+    try:
+        indice = int(chave)
+    except (TypeError, ValueError):
+        return None
+    if indice < 0:
+        return None
+    try:
+        return container[indice]
+    except (IndexError, KeyError, TypeError):
+        return None
+
+
+@register.filter
+def dict_key(d, chave):
+    """Valor do dicionário para a chave fornecida (None se `d` for vazio)."""
+    return d.get(chave) if d else None
+
+
+# Nome antigo usado por comparativo_habilidade_escolas
+register.filter('dict_get', dict_key)
+
+
+@register.simple_tag
+def pivot(matriz, *chaves):
+    """
+    Percorre uma matriz de dicionários aninhados em uma única chamada:
+    `{% pivot matriz esfera.id ano as desempenho %}` equivale a
+    `matriz[esfera.id][ano]`, com None se algum nível faltar.
+    """
+    valor = matriz
+    for chave in chaves:
+        if not valor:
+            return None
+        valor = valor.get(chave)
+    return valor
+
 
 @register.filter
 def br_decimal(value, arg=1):
@@ -13,27 +63,23 @@ def br_decimal(value, arg=1):
     if value is None:
         return ''
     try:
-        # Converte para float para garantir que funcione com Decimal
-        num = float(value)
-        formatted = f"{num:.{arg}f}".replace('.', ',')
-        return formatted
+        # format() aceita int, float e Decimal sem converter entre eles
+        return format(value, f'.{int(arg)}f').replace('.', ',')
     except (ValueError, TypeError):
         return value
-    
-
 
 
 @register.filter
 def sub(value, arg):
-    try:
-        return float(value) - float(arg)
-    except:
+    """value - arg, preservando o tipo quando os dois são do mesmo tipo numérico."""
+    if value is None or arg is None or value == '' or arg == '':
         return None
-
-@register.filter
-def get_item(lista, index):
     try:
-        return lista[int(index)]
-    except:
+        return value - arg
+    except TypeError:
+        # Decimal com float, ou textos numéricos
+        pass
+    try:
+        return float(value) - float(arg)
+    except (TypeError, ValueError):
         return None
-    
@@ -0,0 +1,80 @@
+"""Busca de escolas e habilidades sem o índice do PostgreSQL (índice em memória / icontains)."""
+from unittest import mock
+
+from django.test import TestCase
+
+from core import busca
+from core.models import Disciplina, Escola, Hab, Localidade, Serie
+
+
+@mock.patch.object(busca, 'tem_suporte', return_value=False)
+class BuscaMemoriaTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        sede = Localidade.objects.create(nome='Sede')
+        distrito = Localidade.objects.create(nome='Distrito')
+        for id, inep, nome, bairro, gestor, localidade in (
+            (1, '29000001', 'Escola Municipal São João', 'Centro', 'Ana Souza', sede),
+            (2, '29000002', 'Escola Rural Boa Ação', 'Capão', 'João Lima', distrito),
+            (3, '29000003', 'Creche Pequeno Príncipe', 'Centro', 'Maria Dias', sede),
+        ):
+            Escola.objects.create(
+                id=id, inep=inep, nome=nome, endereco='Rua', bairrodistrito=bairro,
+                gestor=gestor, localidade=localidade,
+            )
+        serie = Serie.objects.create(nome='5º ano')
+        disciplina = Disciplina.objects.create(nome='Matemática', codigo='MT')
+        for cd_hab, dc_hab in (
+            ('EF05MA03', 'Identificar e representar frações menores e maiores que a unidade'),
+            ('EF05MA04', 'Identificar frações equivalentes'),
+        ):
+            Hab.objects.create(serie=serie, disciplina=disciplina, cd_hab=cd_hab, dc_hab=dc_hab)
+
+    def setUp(self):
+        # o índice em memória é global do processo: começa vazio em cada teste
+        busca._indice = (None, [])
+
+    def nomes(self, resultado):
+        return [e['nome'] for e in resultado]
+
+    def test_normalizar(self, _):
+        self.assertEqual(busca.normalizar('Ação'), 'acao')
+        self.assertEqual(busca.normalizar(None), '')
+
+    def test_sem_acento_e_parcial(self, _):
+        self.assertEqual(self.nomes(busca.buscar('sao joa', alias='default')), ['Escola Municipal São João'])
+        self.assertEqual(self.nomes(busca.buscar('CAPAO', alias='default')), ['Escola Rural Boa Ação'])
+
+    def test_inep_exato_primeiro(self, _):
+        resultado = busca.buscar('29000002', alias='default')
+        self.assertEqual(resultado[0]['id'], 2)
+        self.assertEqual(resultado[0]['localidade'], 'Distrito')
+
+    def test_todas_as_palavras(self, _):
+        self.assertEqual(self.nomes(busca.buscar('centro creche', alias='default')), ['Creche Pequeno Príncipe'])
+        self.assertEqual(busca.buscar('centro capao', alias='default'), [])
+
+    def test_empate_ordenado_pelo_nome(self, _):
+        # "joao" começa uma palavra nas duas (nome e gestor): empate, vale o nome
+        self.assertEqual(
+            self.nomes(busca.buscar('joao', alias='default')),
+            ['Escola Municipal São João', 'Escola Rural Boa Ação'],
+        )
+
+    def test_termo_curto_e_limite(self, _):
+        self.assertEqual(busca.buscar('e', alias='default'), [])
+        self.assertEqual(busca.buscar('  ', alias='default'), [])
+        self.assertEqual(len(busca.buscar('escola', limite=1, alias='default')), 1)
+
+    def test_indice_refeito_quando_a_versao_muda(self, _):
+        busca.buscar('escola', alias='default')
+        busca._indice = ('outra versao', busca._indice[1][:1])
+        self.assertEqual(len(busca.buscar('escola', alias='default')), 2)
+
+    def test_habilidades_icontains(self, _):
+        resultado = busca.buscar_habilidades('frações equivalentes', alias='default')
+        self.assertEqual([h['cd_hab'] for h in resultado], ['EF05MA04'])
+        self.assertIsNone(resultado[0]['tx_acerto_rede'])
+
+        resultado = busca.buscar_habilidades('ef05ma03', alias='default')
+        self.assertEqual([h['cd_hab'] for h in resultado], ['EF05MA03'])
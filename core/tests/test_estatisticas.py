@@ -0,0 +1,110 @@
+"""EstatisticaHabilidade: cálculo, atualização por ano e por habilidade."""
+from decimal import Decimal
+
+from django.test import TestCase
+
+from core import estatisticas
+from core.models import (
+    Disciplina, Escola, Esfera, EstatisticaHabilidade, Hab, Localidade,
+    ResultadoHabEscola, Serie,
+)
+
+
+class CalcularTestCase(TestCase):
+    def test_medidas_e_histograma(self):
+        estat = estatisticas.calcular([40, 60, 80])
+        self.assertEqual(estat['media'], Decimal('60.00'))
+        self.assertEqual(estat['mediana'], Decimal('60.00'))
+        self.assertEqual(estat['p10'], Decimal('44.00'))
+        self.assertEqual(estat['p90'], Decimal('76.00'))
+        self.assertEqual(estat['total_escolas'], 3)
+        self.assertEqual(estat['escolas_abaixo_50'], 1)
+        self.assertEqual(estat['escolas_abaixo_75'], 2)
+        self.assertEqual(sum(estat['histograma']), 3)
+        self.assertEqual(estat['histograma'][80], 1)
+
+    def test_um_valor(self):
+        estat = estatisticas.calcular([100])
+        self.assertEqual(estat['p10'], Decimal('100.00'))
+        self.assertEqual(estat['histograma'][100], 1)
+
+
+class AtualizarTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sede = Localidade.objects.create(nome='Sede')
+        cls.distrito = Localidade.objects.create(nome='Distrito')
+        cls.serie = Serie.objects.create(nome='5º ano')
+        cls.disciplina = Disciplina.objects.create(nome='Matemática', codigo='MT')
+        cls.hab = Hab.objects.create(serie=cls.serie, disciplina=cls.disciplina, cd_hab='EF05MT01', dc_hab='A')
+        cls.outra = Hab.objects.create(serie=cls.serie, disciplina=cls.disciplina, cd_hab='EF05MT02', dc_hab='B')
+        cls.escolas = [
+            Escola.objects.create(
+                id=i, inep=f'2900000{i}', nome=f'Escola {i}', endereco='Rua', bairrodistrito='Centro',
+                gestor='Gestor', localidade=localidade,
+            )
+            for i, localidade in ((1, cls.sede), (2, cls.sede), (3, cls.distrito))
+        ]
+        for escola, tx in zip(cls.escolas, (40, 60, 80)):
+            for hab in (cls.hab, cls.outra):
+                cls.resultado(escola, hab, tx)
+        # Linhas de esfera não entram nas estatísticas das escolas
+        ResultadoHabEscola.objects.create(
+            ano=2024, nivel=ResultadoHabEscola.NIVEL_ESFERA, esfera=Esfera.objects.create(nome='MUNICIPAL'),
+            serie=cls.serie, disciplina=cls.disciplina, hab=cls.hab,
+            tx_acerto=ResultadoHabEscola.para_pontos_base(10),
+        )
+
+    @classmethod
+    def resultado(cls, escola, hab, tx, ano=2024):
+        return ResultadoHabEscola.objects.create(
+            ano=ano, escola=escola, serie=cls.serie, disciplina=cls.disciplina, hab=hab,
+            tx_acerto=ResultadoHabEscola.para_pontos_base(tx),
+        )
+
+    def estatistica(self, hab, localidade=None):
+        if localidade is None:
+            return EstatisticaHabilidade.objects.get(hab=hab, nivel=EstatisticaHabilidade.NIVEL_REDE)
+        return EstatisticaHabilidade.objects.get(
+            hab=hab, nivel=EstatisticaHabilidade.NIVEL_LOCALIDADE, localidade=localidade
+        )
+
+    def test_rede_e_localidades(self):
+        totais = estatisticas.atualizar([2024])
+        # Duas habilidades: rede + duas localidades cada
+        self.assertEqual(totais, {2024: 6})
+
+        rede = self.estatistica(self.hab)
+        self.assertEqual(rede.media, Decimal('60.00'))
+        self.assertEqual(rede.total_escolas, 3)
+        self.assertEqual(rede.escolas_abaixo(50), 1)
+
+        sede = self.estatistica(self.hab, self.sede)
+        self.assertEqual(sede.media, Decimal('50.00'))
+        self.assertEqual(sede.total_escolas, 2)
+
+    def test_recalcular_substitui_as_linhas_do_ano(self):
+        estatisticas.atualizar([2024])
+        estatisticas.atualizar([2024])
+        self.assertEqual(EstatisticaHabilidade.objects.filter(ano=2024).count(), 6)
+
+    def test_atualizar_ano_so_das_habilidades_informadas(self):
+        estatisticas.atualizar([2024])
+        ResultadoHabEscola.objects.filter(hab=self.outra).update(tx_acerto=0)
+        ResultadoHabEscola.objects.filter(hab=self.hab, escola=self.escolas[0]).update(tx_acerto=10000)
+
+        estatisticas.atualizar_ano(2024, habs=[self.hab.id])
+        self.assertEqual(self.estatistica(self.hab).media, Decimal('80.00'))
+        # A outra habilidade não foi recalculada
+        self.assertEqual(self.estatistica(self.outra).media, Decimal('60.00'))
+
+    def test_edicao_avulsa_recalcula_a_habilidade_ao_confirmar(self):
+        estatisticas.atualizar([2024])
+        resultado = ResultadoHabEscola.objects.get(hab=self.hab, escola=self.escolas[2])
+        resultado.tx_acerto = ResultadoHabEscola.para_pontos_base(20)
+        with self.captureOnCommitCallbacks(execute=True):
+            resultado.save()
+
+        self.assertEqual(self.estatistica(self.hab).media, Decimal('40.00'))
+        self.assertEqual(self.estatistica(self.hab, self.distrito).media, Decimal('20.00'))
+        self.assertEqual(self.estatistica(self.outra).media, Decimal('60.00'))
@@ -0,0 +1,130 @@
+"""Importação incremental: merge pela chave natural e hash de conteúdo."""
+import csv
+import os
+import tempfile
+from decimal import Decimal
+
+from django.test import TestCase
+
+from core import importacao
+from core.models import (
+    DesempenhoEscola, Disciplina, Escola, Hab, Localidade, ResultadoHabEscola, Serie,
+)
+
+
+class ImportacaoTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        localidade = Localidade.objects.create(nome='Sede')
+        cls.escola = Escola.objects.create(
+            id=1, inep='29000001', nome='Escola Teste', endereco='Rua A',
+            bairrodistrito='Centro', gestor='Gestor', localidade=localidade,
+        )
+        cls.serie = Serie.objects.create(nome='5º ano')
+        cls.disciplina = Disciplina.objects.create(nome='Língua Portuguesa', codigo='LP')
+        cls.hab = Hab.objects.create(
+            serie=cls.serie, disciplina=cls.disciplina, cd_hab='EF05LP01', dc_hab='Ler textos',
+        )
+
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(self.pasta.cleanup)
+
+    def arquivo(self, nome, cabecalho, linhas):
+        caminho = os.path.join(self.pasta.name, nome)
+        with open(caminho, 'w', encoding='utf-8', newline='') as f:
+            escritor = csv.writer(f, delimiter=';')
+            escritor.writerow(cabecalho)
+            escritor.writerows(linhas)
+        return caminho
+
+    def desempenho(self, nome='desempenho.csv', proficiencia='210.50'):
+        valores = {
+            'escola_id': self.escola.id, 'ano': 2024,
+            'disciplina_id': self.disciplina.id, 'serie_id': self.serie.id,
+            'alunos_previstos': 40, 'alunos_avaliados': 30, 'percentual_avaliados': '75.00',
+            'proficiencia_media': proficiencia,
+            # Soma 50: a importação reescala como o save() faria
+            'abaixo_basico': 10, 'basico': 15, 'adequado': 15, 'avancado': 10,
+        }
+        cabecalho = importacao.colunas_arquivo('desempenho')
+        return self.arquivo(nome, cabecalho, [[valores.get(c, '') for c in cabecalho]])
+
+    def importar(self, caminhos, fato='desempenho'):
+        return importacao.importar_arquivos(caminhos, fato, processos=1)
+
+    def test_reimportar_o_mesmo_arquivo_nao_grava(self):
+        caminho = self.desempenho()
+        r = self.importar([caminho])
+        self.assertEqual((r['inseridos'], r['atualizados'], r['inalterados']), (1, 0, 0))
+
+        r = self.importar([caminho])
+        self.assertEqual((r['inseridos'], r['atualizados'], r['inalterados']), (0, 0, 1))
+
+    def test_linha_alterada_e_atualizada(self):
+        self.importar([self.desempenho()])
+        r = self.importar([self.desempenho(proficiencia='215.00')])
+        self.assertEqual((r['inseridos'], r['atualizados']), (0, 1))
+        self.assertEqual(DesempenhoEscola.objects.get().proficiencia_media, Decimal('215.00'))
+
+    def test_grava_e_faz_o_hash_do_mesmo_que_o_save(self):
+        self.importar([self.desempenho()])
+        d = DesempenhoEscola.objects.get()
+        self.assertEqual(d.taxa_participacao, Decimal('75.00'))
+        self.assertEqual(d.abaixo_basico + d.basico + d.adequado + d.avancado, Decimal('100.00'))
+        self.assertEqual(d.hash_conteudo, d.calcular_hash())
+
+        # Salvar pelo ORM não muda o hash: a reimportação continua inalterada
+        d.save()
+        d.refresh_from_db()
+        self.assertEqual(d.hash_conteudo, d.calcular_hash())
+        r = self.importar([self.desempenho()])
+        self.assertEqual(r['inalterados'], 1)
+
+    def test_dimensoes_por_texto(self):
+        cabecalho = ['inep', 'ano', 'disciplina', 'serie'] + list(DesempenhoEscola.CAMPOS_CONTEUDO)
+        valores = {
+            'inep': '29000001', 'ano': 2024, 'disciplina': 'LP', 'serie': '5 ano',
+            'alunos_previstos': 40, 'alunos_avaliados': 30, 'percentual_avaliados': '75.00',
+            'proficiencia_media': '210.50',
+            'abaixo_basico': 25, 'basico': 25, 'adequado': 25, 'avancado': 25,
+        }
+        caminho = self.arquivo('texto.csv', cabecalho, [[valores.get(c, '') for c in cabecalho]])
+        r = self.importar([caminho])
+        self.assertEqual(r['inseridos'], 1)
+        self.assertEqual(r['dimensoes_criadas'], 0)
+        d = DesempenhoEscola.objects.get()
+        self.assertEqual((d.escola_id, d.serie_id, d.disciplina_id), (1, self.serie.id, self.disciplina.id))
+
+    def test_escola_desconhecida_rejeita_a_linha(self):
+        cabecalho = ['inep', 'ano', 'disciplina', 'serie'] + list(DesempenhoEscola.CAMPOS_CONTEUDO)
+        valores = {
+            'inep': '29999999', 'ano': 2024, 'disciplina': 'LP', 'serie': '5º ano',
+            'alunos_previstos': 40, 'alunos_avaliados': 30, 'percentual_avaliados': '75.00',
+            'proficiencia_media': '210.50',
+        }
+        caminho = self.arquivo('desconhecida.csv', cabecalho, [[valores.get(c, '') for c in cabecalho]])
+        r = self.importar([caminho])
+        self.assertEqual((r['inseridos'], r['rejeitados']), (0, 1))
+        self.assertFalse(DesempenhoEscola.objects.exists())
+
+    def test_taxa_fora_da_faixa_recusa_o_arquivo(self):
+        cabecalho = importacao.colunas_arquivo('habilidade')
+        linha = [2024, self.escola.id, self.serie.id, self.disciplina.id, self.hab.id]
+        ruim = self.arquivo('ruim.csv', cabecalho, [linha + ['40'], linha + ['105']])
+
+        r = self.importar([ruim], fato='habilidade')
+        self.assertIn(ruim, r['erros'])
+        self.assertIn('fora da faixa', r['erros'][ruim])
+        self.assertFalse(ResultadoHabEscola.objects.exists())
+
+    def test_habilidade_em_pontos_base(self):
+        cabecalho = importacao.colunas_arquivo('habilidade')
+        linhas = [
+            [2024, self.escola.id, self.serie.id, self.disciplina.id, self.hab.id, '45.37'],
+        ]
+        r = self.importar([self.arquivo('hab.csv', cabecalho, linhas)], fato='habilidade')
+        self.assertEqual(r['inseridos'], 1)
+        resultado = ResultadoHabEscola.objects.get()
+        self.assertEqual(resultado.tx_acerto, 4537)
+        self.assertEqual(resultado.nivel, ResultadoHabEscola.NIVEL_ESCOLA)
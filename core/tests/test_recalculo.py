@@ -0,0 +1,96 @@
+"""Recálculo em lote dos campos derivados de DesempenhoEscola e DesempenhoEsfera."""
+from decimal import Decimal
+
+from django.test import TestCase
+
+from core import recalculo
+from core.models import (
+    DesempenhoEscola, DesempenhoEsfera, Disciplina, Escola, Esfera, Localidade, Serie,
+)
+
+
+class RecalcularTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        localidade = Localidade.objects.create(nome='Sede')
+        cls.serie = Serie.objects.create(nome='5º ano')
+        cls.disciplina = Disciplina.objects.create(nome='Matemática', codigo='MT')
+        escolas = [
+            Escola.objects.create(
+                id=i, inep=f'2900000{i}', nome=f'Escola {i}', endereco='Rua', bairrodistrito='Centro',
+                gestor='Gestor', localidade=localidade,
+            )
+            for i in (1, 2)
+        ]
+        # Escola 1 em 2023 e 2024 (variação), escola 2 só em 2024
+        for escola, ano, proficiencia in ((escolas[0], 2023, 200), (escolas[0], 2024, 210), (escolas[1], 2024, 230)):
+            DesempenhoEscola.objects.create(
+                escola=escola, ano=ano, serie=cls.serie, disciplina=cls.disciplina,
+                alunos_previstos=40, alunos_avaliados=30, percentual_avaliados=75,
+                proficiencia_media=proficiencia,
+                abaixo_basico=25, basico=25, adequado=25, avancado=25,
+            )
+
+    def escola(self, ano=2024, escola_id=1):
+        return DesempenhoEscola.objects.get(ano=ano, escola_id=escola_id)
+
+    def test_grava_so_o_que_mudou_e_refaz_o_hash(self):
+        # update() não passa pelo save(): simula valores derivados desatualizados
+        DesempenhoEscola.objects.filter(ano=2024, escola_id=1).update(
+            taxa_participacao=0, posicao_municipio=None, variacao_ano_anterior=None,
+        )
+        r = recalculo.recalcular(DesempenhoEscola.objects.filter(ano=2024), publicar=False)
+
+        d = self.escola()
+        self.assertEqual(d.taxa_participacao, Decimal('75.00'))
+        self.assertEqual(d.posicao_municipio, 2)
+        self.assertEqual(d.variacao_ano_anterior, Decimal('10.00'))
+        self.assertEqual(d.hash_conteudo, d.calcular_hash())
+        self.assertEqual(self.escola(escola_id=2).posicao_municipio, 1)
+        self.assertEqual(r['anos'], [2024])
+        self.assertIsNone(r['boletins'])
+
+        r = recalculo.recalcular(DesempenhoEscola.objects.filter(ano=2024), publicar=False)
+        self.assertEqual(r['linhas'], 0)
+
+    def test_niveis_somam_100(self):
+        DesempenhoEscola.objects.filter(ano=2024, escola_id=1).update(
+            abaixo_basico=10, basico=10, adequado=10, avancado=10,
+        )
+        recalculo.recalcular(DesempenhoEscola.objects.filter(ano=2024), etapas=['niveis'], publicar=False)
+        d = self.escola()
+        self.assertEqual(
+            (d.abaixo_basico, d.basico, d.adequado, d.avancado),
+            (Decimal('25.00'),) * 4,
+        )
+
+    def test_simular_nao_grava(self):
+        DesempenhoEscola.objects.filter(ano=2024, escola_id=1).update(taxa_participacao=0)
+        r = recalculo.recalcular(DesempenhoEscola.objects.filter(ano=2024), simular=True)
+        self.assertGreater(r['linhas'], 0)
+        self.assertEqual(self.escola().taxa_participacao, Decimal('0.00'))
+
+    def test_etapa_invalida(self):
+        with self.assertRaises(ValueError):
+            recalculo.recalcular(DesempenhoEscola.objects.all(), etapas=['ranking'])
+
+    def test_esferas_mantem_a_posicao_importada(self):
+        esferas = [Esfera.objects.create(nome=nome) for nome in ('ESTADUAL', 'MUNICIPAL')]
+        for esfera, proficiencia, posicao in zip(esferas, (200, 220), (7, 3)):
+            DesempenhoEsfera.objects.create(
+                esfera=esfera, ano=2024, serie=self.serie, disciplina=self.disciplina,
+                alunos_previstos=100, alunos_avaliados=90, proficiencia_media=proficiencia,
+                abaixo_basico=25, basico=25, adequado=25, avancado=25, posicao_municipio=posicao,
+            )
+        DesempenhoEsfera.objects.update(percentual_avaliados=0)
+
+        r = recalculo.recalcular(DesempenhoEsfera.objects.all(), publicar=False)
+        self.assertNotIn('posicao', r['etapas'])
+        self.assertEqual(
+            list(DesempenhoEsfera.objects.order_by('esfera__nome').values_list('posicao_municipio', flat=True)),
+            [7, 3],
+        )
+        self.assertEqual(
+            set(DesempenhoEsfera.objects.values_list('percentual_avaliados', flat=True)),
+            {Decimal('90.00')},
+        )
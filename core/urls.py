@@ -41,8 +41,12 @@ urlpatterns = [
     path('dashboard/relatorios/pdf/', views.relatorio_pdf, name='relatorio_pdf'),
     path('dashboard/boletim-html/<int:escola_id>/', views.boletim_escola, name='boletim_escola_html'),
     path('boletim/<int:escola_id>/', views.boletim_escola, name='boletim_escola'),
+    path('boletim/<int:escola_id>/pdf/', views.boletim_escola_pdf, name='boletim_escola_pdf'),
+    path('dashboard/grafico/<int:escola_id>/<str:tipo>/', views.grafico_escola, name='grafico_escola'),
     path('dashboard/boletim_escola/', views.selecionar_escola_boletim, name='selecionar_escola_boletim'),
     path('dashboard/boletim_escola/', views.selecionar_escola_boletim, name='selecionar_escola_boletim'),
+    path('dashboard/escolas/busca/', views.buscar_escolas, name='buscar_escolas'),
+    path('dashboard/habilidades/busca/', views.buscar_habilidades, name='buscar_habilidades'),
     path('escolas-participantes/', views.relatorio_escolas_participantes, name='relatorio_escolas_participantes'),
     path('dashboard/painel-esferas/', views.painel_esferas, name='painel_esferas'),
     path('dashboard/comparativo-habilidades/', views.comparativo_habilidades, name='comparativo_habilidades'),
@@ -4,6 +4,9 @@ from django.http import JsonResponse, HttpResponse
 from matplotlib.style import context
 from urllib3 import request
 from .models import *
+from django.db import connections
+from . import dimensoes
+from .roteadores import banco_leitura
 
 
 def dashboard_principal(request):
@@ -156,120 +159,298 @@ def detalhes_escola(request, escola_id):
     })
 
 from django.db.models import Avg, Sum, Max
+from itertools import combinations
 
-def comparacao_anos(request):
-
-    anos = DesempenhoEscola.objects.values_list('ano', flat=True).distinct().order_by('-ano')
-
-    ano1 = request.GET.get('ano1')
-    ano2 = request.GET.get('ano2')
 
-    if not ano1 and len(anos) > 0:
-        ano1 = anos[0]
-
-    if not ano2 and len(anos) > 1:
-        ano2 = anos[1]
+def _indicadores_por_ano(anos):
+    """
+    Indicadores de DesempenhoEscola para vários anos em uma única query.
 
-    def calcular_dados(ano):
-        qs = DesempenhoEscola.objects.filter(ano=ano)
+    A CTE marca, via ROW_NUMBER, a linha de maior alunos_avaliados de cada
+    (escola, série, ano) — a mesma regra de "MAX por série" de antes — e a
+    primeira linha de cada escola por ano, série e disciplina. O SELECT
+    agrupa por (ano, série, disciplina, localidade); os totais do ano e as
+    quebras por série, disciplina e localidade são somas desses grupos.
+    """
+    marcadores = ', '.join(['%s'] * len(anos))
+    sql = f"""
+        WITH base AS (
+            SELECT
+                d.ano, d.serie_id, d.disciplina_id, e.localidade_id, d.escola_id,
+                d.proficiencia_media, d.alunos_avaliados,
+                ROW_NUMBER() OVER (
+                    PARTITION BY d.escola_id, d.serie_id, d.ano
+                    ORDER BY d.alunos_avaliados DESC
+                ) AS rn_alunos,
+                ROW_NUMBER() OVER (PARTITION BY d.escola_id, d.ano ORDER BY d.id) AS rn_ano,
+                ROW_NUMBER() OVER (PARTITION BY d.escola_id, d.ano, d.serie_id ORDER BY d.id) AS rn_serie,
+                ROW_NUMBER() OVER (PARTITION BY d.escola_id, d.ano, d.disciplina_id ORDER BY d.id) AS rn_disc
+            FROM {DesempenhoEscola._meta.db_table} d
+            JOIN {Escola._meta.db_table} e ON e.id = d.escola_id
+            WHERE d.ano IN ({marcadores})
+        )
+        SELECT
+            ano, serie_id, disciplina_id, localidade_id,
+            SUM(proficiencia_media),
+            COUNT(*),
+            SUM(CASE WHEN rn_alunos = 1 THEN alunos_avaliados ELSE 0 END),
+            SUM(alunos_avaliados),
+            SUM(CASE WHEN rn_ano = 1 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN rn_serie = 1 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN rn_disc = 1 THEN 1 ELSE 0 END)
+        FROM base
+        GROUP BY ano, serie_id, disciplina_id, localidade_id
+    """
+    with connections[banco_leitura()].cursor() as cursor:
+        cursor.execute(sql, [int(a) for a in anos])
+        linhas = cursor.fetchall()
+
+    def _novo():
+        return {'soma': 0.0, 'linhas': 0, 'alunos': 0, 'escolas': 0}
+
+    total = {}
+    quebras = {'serie': {}, 'disciplina': {}, 'localidade': {}}
+
+    for ano, serie_id, disc_id, loc_id, soma, n, alunos_dedup, alunos_soma, esc_ano, esc_serie, esc_disc in linhas:
+        soma = float(soma or 0)
+        alunos_dedup = int(alunos_dedup or 0)
+
+        for destino, alunos, escolas in (
+            (total.setdefault(ano, _novo()), alunos_dedup, esc_ano),
+            (quebras['serie'].setdefault(serie_id, {}).setdefault(ano, _novo()), alunos_dedup, esc_serie),
+            # dentro de uma disciplina não há dupla contagem: soma simples
+            (quebras['disciplina'].setdefault(disc_id, {}).setdefault(ano, _novo()), int(alunos_soma or 0), esc_disc),
+            (quebras['localidade'].setdefault(loc_id, {}).setdefault(ano, _novo()), alunos_dedup, esc_ano),
+        ):
+            destino['soma'] += soma
+            destino['linhas'] += n
+            destino['alunos'] += alunos
+            destino['escolas'] += int(escolas or 0)
+
+    def _fechar(d):
+        return {
+            'media': round(d['soma'] / d['linhas'], 2) if d['linhas'] else 0,
+            'alunos': d['alunos'],
+            'escolas': d['escolas'],
+        }
 
-        media = qs.aggregate(media=Avg('proficiencia_media'))['media'] or 0
+    total = {ano: _fechar(d) for ano, d in total.items()}
+    quebras = {
+        nome: {chave: {ano: _fechar(d) for ano, d in por_ano.items()} for chave, por_ano in grupos.items()}
+        for nome, grupos in quebras.items()
+    }
+    return total, quebras
 
-        # Conta alunos apenas 1 vez por série (usa MAX ao invés de SUM)
-        alunos = qs.values(
-            'escola_id', 'serie_id'
-        ).annotate(
-            total=Max('alunos_avaliados')
-        ).aggregate(
-            soma=Sum('total')
-        )['soma'] or 0
 
-        escolas = qs.values('escola_id').distinct().count()
+def _variacao(antes, depois):
+    return round((depois - antes) / antes * 100, 2) if antes else 0
 
-        return {
-            'media': media,
-            'alunos': alunos,
-            'escolas': escolas
-        }
 
-    dados_ano1 = dados_ano2 = variacao = None
+def comparacao_anos(request):
 
-    if ano1 and ano2:
-        dados_ano1 = calcular_dados(ano1)
-        dados_ano2 = calcular_dados(ano2)
+    anos = dimensoes.anos_desempenho()
 
-        media1 = dados_ano1['media']
-        media2 = dados_ano2['media']
+    # aceita ?anos=2023&anos=2024 (ou 2023,2024) e os antigos ano1/ano2
+    selecionados = []
+    for valor in request.GET.getlist('anos') + [request.GET.get('ano1'), request.GET.get('ano2')]:
+        for parte in (valor or '').split(','):
+            if parte.strip().isdigit() and int(parte) not in selecionados:
+                selecionados.append(int(parte))
+    if not selecionados:
+        selecionados = list(anos[:2])
+    selecionados.sort()
 
-        alunos1 = dados_ano1['alunos']
-        alunos2 = dados_ano2['alunos']
+    dados = []
+    variacoes = []
+    quebras = []
+
+    if selecionados:
+        total, por_quebra = _indicadores_por_ano(selecionados)
+        vazio = {'media': 0, 'alunos': 0, 'escolas': 0}
+
+        dados = [dict(vazio, **total.get(ano, {}), ano=ano) for ano in selecionados]
+
+        for d1, d2 in combinations(dados, 2):
+            variacoes.append({
+                'ano1': d1['ano'],
+                'ano2': d2['ano'],
+                'media': _variacao(d1['media'], d2['media']),
+                'alunos': _variacao(d1['alunos'], d2['alunos']),
+                'escolas': _variacao(d1['escolas'], d2['escolas']),
+            })
 
-        variacao = {
-            'media': round(((media2 - media1) / media1 * 100), 2) if media1 else 0,
-            'alunos': round(((alunos2 - alunos1) / alunos1 * 100), 2) if alunos1 else 0
+        nomes = {
+            'serie': {s.id: s.nome for s in dimensoes.series()},
+            'disciplina': {d.id: d.nome for d in dimensoes.disciplinas()},
+            'localidade': {l.id: l.nome for l in dimensoes.localidades()},
         }
+        titulos = {'serie': 'Série', 'disciplina': 'Disciplina', 'localidade': 'Localidade'}
+        for nome, grupos in por_quebra.items():
+            linhas = [
+                {
+                    'nome': nomes[nome].get(chave, chave),
+                    'anos': [por_ano.get(ano) for ano in selecionados],
+                }
+                for chave, por_ano in grupos.items()
+            ]
+            linhas.sort(key=lambda l: str(l['nome']))
+            quebras.append({'titulo': titulos[nome], 'linhas': linhas})
 
     return render(request, 'dashboard/comparacao_anos.html', {
         'anos_disponiveis': anos,
-        'ano1': ano1,
-        'ano2': ano2,
-        'dados_ano1': dados_ano1,
-        'dados_ano2': dados_ano2,
-        'variacao': variacao
+        'anos_selecionados': selecionados,
+        'dados': dados,
+        'variacoes': variacoes,
+        'quebras': quebras,
     })
-from django.db.models import Avg
+
+
+from django.db.models import Avg, Q
 from .models import Escola, Serie, DesempenhoEscola
 
 
-def comparacao_escolas(request):
+def _ids(request, *nomes):
+    """Lê uma lista de ids inteiros de um ou mais parâmetros GET (repetidos ou únicos)."""
+    ids = []
+    for nome in nomes:
+        for valor in request.GET.getlist(nome):
+            for parte in valor.split(','):
+                if parte.strip().isdigit() and int(parte) not in ids:
+                    ids.append(int(parte))
+    return ids
 
-    escolas = Escola.objects.all().order_by('nome')
-    series = Serie.objects.all().order_by('nome')
-    anos = DesempenhoEscola.objects.values_list('ano', flat=True).distinct().order_by('ano')
 
-    escola1_id = request.GET.get('escola1')
-    escola2_id = request.GET.get('escola2')
-    serie_id = request.GET.get('serie')
+def _inteiro(request, nome):
+    """Parâmetro GET inteiro (None se ausente ou inválido, em vez de erro 500)."""
+    valor = request.GET.get(nome, '').strip()
+    return int(valor) if valor.isdigit() else None
 
-    dados = []
 
-    escola1 = Escola.objects.filter(id=escola1_id).first()
-    escola2 = Escola.objects.filter(id=escola2_id).first()
-    serie = Serie.objects.filter(id=serie_id).first()
-
-    if escola1_id and escola2_id and serie_id:
-
-        for ano in anos:
-            d1 = DesempenhoEscola.objects.filter(
-                escola_id=escola1_id,
-                serie_id=serie_id,
-                ano=ano
-            ).aggregate(media=Avg('proficiencia_media'))['media'] or 0
-
-            d2 = DesempenhoEscola.objects.filter(
-                escola_id=escola2_id,
-                serie_id=serie_id,
-                ano=ano
-            ).aggregate(media=Avg('proficiencia_media'))['media'] or 0
-
-            dados.append({
-                'ano': ano,
-                'e1': round(d1, 2),
-                'e2': round(d2, 2),
-                'dif': round(d2 - d1, 2)
-            })
+def comparar_unidades(escolas=(), localidades=(), series=(), disciplinas=(),
+                      ano_inicio=None, ano_fim=None, por_serie_disciplina=False):
+    """
+    Compara qualquer número de escolas e/ou localidades ao longo dos anos.
 
+    Tudo vem de uma única query agrupada por ano (e, opcionalmente, por
+    série/disciplina): cada unidade vira uma coluna Avg(..., filter=Q(...))
+    e a média municipal é o Avg sem filtro sobre o mesmo recorte. O
+    resultado é pivotado em matrizes unidade × ano com as diferenças em
+    relação à primeira unidade e à média municipal.
+    """
+    nomes_escola = dict(dimensoes.escolas())
+    nomes_localidade = {l.id: l.nome for l in dimensoes.localidades()}
+
+    unidades = [
+        {'nome': nomes_escola.get(i, f'Escola {i}'), 'tipo': 'escola', 'filtro': Q(escola_id=i)}
+        for i in escolas
+    ] + [
+        {'nome': nomes_localidade.get(i, f'Localidade {i}'), 'tipo': 'localidade',
+         'filtro': Q(escola__localidade_id=i)}
+        for i in localidades
+    ]
+    if not unidades:
+        return {'anos': [], 'fatias': []}
+
+    qs = DesempenhoEscola.objects.all()
+    if series:
+        qs = qs.filter(serie_id__in=series)
+    if disciplinas:
+        qs = qs.filter(disciplina_id__in=disciplinas)
+    if ano_inicio:
+        qs = qs.filter(ano__gte=ano_inicio)
+    if ano_fim:
+        qs = qs.filter(ano__lte=ano_fim)
+
+    agrupamento = ['serie_id', 'disciplina_id', 'ano'] if por_serie_disciplina else ['ano']
+    agregados = {'municipio': Avg('proficiencia_media')}
+    for i, unidade in enumerate(unidades):
+        agregados[f'u{i}'] = Avg('proficiencia_media', filter=unidade['filtro'])
+
+    linhas = qs.values(*agrupamento).annotate(**agregados).order_by(*agrupamento)
+
+    # ── Pivot: fatia (série/disciplina ou geral) → unidade × ano ─────────
+    nomes_serie = {s.id: s.nome for s in dimensoes.series()}
+    nomes_disc = {d.id: d.nome for d in dimensoes.disciplinas()}
+    anos = []
+    por_fatia = {}
+    for linha in linhas:
+        if linha['ano'] not in anos:
+            anos.append(linha['ano'])
+        chave = (linha['serie_id'], linha['disciplina_id']) if por_serie_disciplina else None
+        por_fatia.setdefault(chave, {})[linha['ano']] = linha
+    anos.sort()
+
+    def _num(valor):
+        return round(float(valor), 2) if valor is not None else None
+
+    def _dif(a, b):
+        return round(a - b, 2) if a is not None and b is not None else None
+
+    fatias = []
+    for chave, por_ano in por_fatia.items():
+        municipio = [_num(por_ano.get(ano, {}).get('municipio')) for ano in anos]
+        referencia = [_num(por_ano.get(ano, {}).get('u0')) for ano in anos]
+
+        matriz = []
+        for i, unidade in enumerate(unidades):
+            valores = []
+            for j, ano in enumerate(anos):
+                media = _num(por_ano.get(ano, {}).get(f'u{i}'))
+                valores.append({
+                    'ano': ano,
+                    'media': media,
+                    'dif_primeira': _dif(media, referencia[j]) if i else None,
+                    'dif_municipio': _dif(media, municipio[j]),
+                })
+            matriz.append({'nome': unidade['nome'], 'tipo': unidade['tipo'], 'valores': valores})
+
+        titulo = (
+            f'{nomes_serie.get(chave[0], chave[0])} — {nomes_disc.get(chave[1], chave[1])}'
+            if chave else 'Geral'
+        )
+        fatias.append({'titulo': titulo, 'municipio': municipio, 'matriz': matriz})
+
+    return {'anos': anos, 'fatias': fatias}
+
+
+def comparacao_escolas(request):
+
+    # escola1/escola2 mantidos para os links antigos
+    escolas_ids = _ids(request, 'escolas', 'escola1', 'escola2')
+    localidades_ids = _ids(request, 'localidades')
+    series_ids = _ids(request, 'serie', 'series')
+    disciplinas_ids = _ids(request, 'disciplinas')
+    ano_inicio = _inteiro(request, 'ano_inicio')
+    ano_fim = _inteiro(request, 'ano_fim')
+    por_serie_disciplina = request.GET.get('separar') == '1'
+
+    resultado = comparar_unidades(
+        escolas=escolas_ids,
+        localidades=localidades_ids,
+        series=series_ids,
+        disciplinas=disciplinas_ids,
+        ano_inicio=ano_inicio,
+        ano_fim=ano_fim,
+        por_serie_disciplina=por_serie_disciplina,
+    )
+
+    # Só as escolas escolhidas vão para a página; as demais vêm da busca
+    nomes = dict(dimensoes.escolas())
     return render(request, 'dashboard/comparativo_escola.html', {
-        'escolas': escolas,
-        'series': series,
-        'anos': anos,
-        'dados': dados,
-        'escola1': escola1,
-        'escola2': escola2,
-        'serie': serie,
-        'escola1_id': escola1_id,
-        'escola2_id': escola2_id,
-        'serie_id': serie_id
+        'escolas': [(id, nomes[id]) for id in escolas_ids if id in nomes],
+        'localidades': dimensoes.localidades(),
+        'series': dimensoes.series(),
+        'disciplinas': dimensoes.disciplinas(),
+        'anos_disponiveis': sorted(dimensoes.anos_desempenho()),
+        'anos': resultado['anos'],
+        'fatias': resultado['fatias'],
+        'escolas_ids': escolas_ids,
+        'localidades_ids': localidades_ids,
+        'series_ids': series_ids,
+        'disciplinas_ids': disciplinas_ids,
+        'ano_inicio': ano_inicio or '',
+        'ano_fim': ano_fim or '',
+        'separar': por_serie_disciplina,
     })
 
 
@@ -284,6 +465,7 @@ from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.units import cm
 
 from .models import Escola, Localidade, Serie, Disciplina, DesempenhoEscola
+from . import graficos
 
 
 # ============================================================
@@ -386,23 +568,23 @@ def relatorio_pdf(request):
         'escola', 'disciplina', 'serie', 'escola__localidade'
     )
 
-    localidade = request.GET.get('localidade')
-    escola = request.GET.get('escola')
-    serie = request.GET.get('serie')
-    ano_inicio = request.GET.get('ano_inicio')
-    ano_fim = request.GET.get('ano_fim')
+    localidade = _inteiro(request, 'localidade')
+    escola = _inteiro(request, 'escola')
+    serie = _inteiro(request, 'serie')
+    ano_inicio = _inteiro(request, 'ano_inicio')
+    ano_fim = _inteiro(request, 'ano_fim')
 
     if localidade:
-        queryset = queryset.filter(escola__localidade_id=int(localidade))
+        queryset = queryset.filter(escola__localidade_id=localidade)
 
     if escola:
-        queryset = queryset.filter(escola_id=int(escola))
+        queryset = queryset.filter(escola_id=escola)
 
     if serie:
-        queryset = queryset.filter(serie_id=int(serie))
+        queryset = queryset.filter(serie_id=serie)
 
     if ano_inicio and ano_fim:
-        queryset = queryset.filter(ano__range=[int(ano_inicio), int(ano_fim)])
+        queryset = queryset.filter(ano__range=[ano_inicio, ano_fim])
 
     dados = queryset.values(
         'ano',
@@ -462,6 +644,16 @@ def relatorio_pdf(request):
     ]))
 
     elementos.append(tabela_pdf)
+
+    # Relatório de uma escola: gráficos desenhados no servidor (do cache)
+    if escola:
+        ano_grafico = ano_fim if ano_inicio and ano_fim else graficos.ultimo_ano(escola)
+        for tipo in graficos.TIPOS:
+            figura = graficos.flowable(escola, ano_grafico, tipo, doc.width)
+            if figura is not None:
+                elementos.append(Spacer(1, 18))
+                elementos.append(figura)
+
     doc.build(elementos)
 
     return response
@@ -592,9 +784,22 @@ for linha in boletim_completo:
 from collections import defaultdict
 
 from django.shortcuts import render, get_object_or_404
+from django.http import Http404
 from .models import Escola, Serie, Disciplina, DesempenhoEscola
+from . import graficos, publicacao
 
 def boletim_escola(request, escola_id):
+    """
+    Boletim publicado (arquivo estático, sem consultar o banco) quando ainda
+    corresponde aos dados atuais; senão, montado na hora.
+    """
+    caminho = publicacao.publicado(escola_id, 'html')
+    if caminho is not None:
+        return publicacao.servir(caminho, 'html')
+    return renderizar_boletim(request, escola_id)
+
+
+def renderizar_boletim(request, escola_id):
     escola = get_object_or_404(Escola, id=escola_id)
 
     series = Serie.objects.all().order_by('nome')
@@ -678,40 +883,9 @@ def boletim_escola(request, escola_id):
             distribuicao.append(linha_dist)
 
     # --- GRÁFICO: agregação por disciplina no último ano ---
+    # (a imagem é desenhada no servidor por grafico_escola, com os mesmos dados)
     ultimo_ano = anos[-1] if anos else None
-    grafico_data = {}
-
-    for item in distribuicao:
-        disciplina = item['disciplina']
-        dados_ano = next((d for d in item['anos'] if d['ano'] == ultimo_ano), None)
-        if dados_ano and all(v is not None for v in [dados_ano['abaixo_basico'], dados_ano['basico'], dados_ano['adequado'], dados_ano['avancado']]):
-            if disciplina not in grafico_data:
-                grafico_data[disciplina] = {
-                    'soma_ab': 0,
-                    'soma_b': 0,
-                    'soma_ad': 0,
-                    'soma_av': 0,
-                    'count': 0
-                }
-            grafico_data[disciplina]['soma_ab'] += dados_ano['abaixo_basico']
-            grafico_data[disciplina]['soma_b'] += dados_ano['basico']
-            grafico_data[disciplina]['soma_ad'] += dados_ano['adequado']
-            grafico_data[disciplina]['soma_av'] += dados_ano['avancado']
-            grafico_data[disciplina]['count'] += 1
-
-    dados_grafico = []
-    for disciplina, valores in grafico_data.items():
-        count = valores['count']
-        if count > 0:
-            dados_grafico.append({
-                'disciplina': disciplina,
-                'abaixo_basico': round(valores['soma_ab'] / count, 2),
-                'basico': round(valores['soma_b'] / count, 2),
-                'adequado': round(valores['soma_ad'] / count, 2),
-                'avancado': round(valores['soma_av'] / count, 2),
-            })
-
-    dados_grafico.sort(key=lambda x: x['disciplina'])
+    dados_grafico = graficos.agregar_distribuicao(distribuicao, ultimo_ano)
     # ---------------------------------------------------------
 
     return render(request, 'dashboard/boletim_escola.html', {
@@ -723,6 +897,7 @@ def boletim_escola(request, escola_id):
         'colspan_dist': 2 + (len(anos) * 4),
         'dados_grafico': dados_grafico,
         'ultimo_ano': ultimo_ano,
+        'versao_escola': dimensoes.versao_escola(escola.id),
     })
 
 
@@ -921,10 +1096,47 @@ from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 from .models import Escola, DesempenhoEscola
+from . import busca
+from django.urls import reverse
+from urllib.parse import urlencode
+
+
+def grafico_escola(request, escola_id, tipo):
+    """
+    Gráfico do boletim desenhado no servidor (SVG por padrão, ?formato=png).
+    Usa o último ano da escola se ?ano= não for informado.
+    """
+    if tipo not in graficos.TIPOS:
+        raise Http404('Tipo de gráfico inválido')
+    formato = request.GET.get('formato', 'svg')
+    if formato not in graficos.FORMATOS:
+        raise Http404('Formato inválido')
+    ano = request.GET.get('ano')
+    ano = int(ano) if ano and ano.isdigit() else graficos.ultimo_ano(escola_id)
+    if ano is None:
+        raise Http404('Escola sem resultados')
+
+    try:
+        conteudo = graficos.imagem(escola_id, ano, tipo, formato)
+    except ImportError:
+        raise Http404('Formato indisponível neste servidor')
+    if conteudo is None:
+        raise Http404('Sem dados para o gráfico')
+    response = HttpResponse(conteudo, content_type=graficos.FORMATOS[formato])
+    # A URL não muda quando os dados mudam; o navegador revalida a cada hora
+    response['Cache-Control'] = 'max-age=3600'
+    return response
+
 
+def boletim_escola_pdf(request, escola_id):
+    """PDF do boletim: o publicado quando em dia, senão gerado na hora."""
+    caminho = publicacao.publicado(escola_id, 'pdf')
+    if caminho is not None:
+        return publicacao.servir(caminho, 'pdf')
+    return renderizar_boletim_pdf(request, escola_id)
 
 
-def boletim_escola_pdf(request, escola_id): #antiga fucnionando
+def renderizar_boletim_pdf(request, escola_id): #antiga fucnionando
     escola = get_object_or_404(Escola, id=escola_id)
 
     desempenhos = (
@@ -998,16 +1210,56 @@ def boletim_escola_pdf(request, escola_id): #antiga fucnionando
 
     elementos.append(tabela_pdf)
 
+    ultimo_ano = graficos.ultimo_ano(escola.id)
+    for tipo in graficos.TIPOS:
+        figura = graficos.flowable(escola.id, ultimo_ano, tipo, doc.width)
+        if figura is not None:
+            elementos.append(Spacer(1, 18))
+            elementos.append(figura)
+
     doc.build(elementos)
 
     return response
 
 def selecionar_escola_boletim(request):
-    escolas = Escola.objects.all().order_by('nome')
+    # A lista vem da busca (typeahead em buscar_escolas); ?q= atende sem JavaScript
+    q = request.GET.get('q', '').strip()
     return render(request, 'dashboard/selecionar_escola_boletim.html', {
-        'escolas': escolas
+        'escolas': busca.buscar(q, busca.LIMITE_MAXIMO),
+        'q': q,
     })
 
+
+def buscar_escolas(request):
+    """Typeahead: escolas por nome, INEP, bairro ou gestor (?q=, ?limite=)."""
+    limite = request.GET.get('limite', '')
+    limite = min(int(limite), busca.LIMITE_MAXIMO) if limite.isdigit() else busca.LIMITE_PADRAO
+    return JsonResponse({'resultados': busca.buscar(request.GET.get('q'), limite)})
+
+
+def buscar_habilidades(request):
+    """
+    Habilidades por tema na descrição (?q=frações), mais relevantes primeiro,
+    com a média de acerto da rede no último ano e o link para a análise por
+    escolas. Filtros opcionais: ?serie=, ?disciplina=, ?limite=.
+    """
+    limite = request.GET.get('limite', '')
+    limite = min(int(limite), busca.LIMITE_MAXIMO) if limite.isdigit() else busca.LIMITE_PADRAO
+    serie, disciplina = request.GET.get('serie', ''), request.GET.get('disciplina', '')
+    resultados = busca.buscar_habilidades(
+        request.GET.get('q'),
+        serie=int(serie) if serie.isdigit() else None,
+        disciplina=int(disciplina) if disciplina.isdigit() else None,
+        limite=limite,
+    )
+    analise = reverse('comparativo_habilidade_escolas')
+    for r in resultados:
+        params = {'serie': r['serie_id'], 'disciplina': r['disciplina_id']}
+        if r['ano']:
+            params['ano'] = r['ano']
+        r['url'] = f'{analise}?{urlencode(params)}'
+    return JsonResponse({'resultados': resultados})
+
 #####$$$$$$$$$$$$$$$$$$$$$$$$$
 
 def classificar_padrao_desempenho(serie, disciplina, proficiencia):
@@ -1358,33 +1610,54 @@ def classificar_nivel(disciplina_nome, serie_nome, proficiencia):
     return None
 
 
+def classificador_nivel(disciplina_nome, serie_nome):
+    """
+    Versão pré-resolvida de classificar_nivel para uma disciplina/série fixa:
+    busca as faixas uma única vez e devolve uma função que só as percorre.
+    Útil quando a mesma combinação é classificada para muitas células.
+    """
+    faixas = PADROES_SAEB_2024.get((disciplina_nome.strip(), serie_nome.strip()))
+    if not faixas:
+        return lambda proficiencia: None
+
+    faixas = [
+        (li, ls, {'nivel': nivel, 'cor': CORES_NIVEL.get(nivel, 'secondary')})
+        for nivel, li, ls in faixas
+    ]
+
+    def classificar(proficiencia):
+        if proficiencia is None:
+            return None
+        for li, ls, resultado in faixas:
+            if (li is None or proficiencia >= li) and (ls is None or proficiencia <= ls):
+                return resultado
+        return None
+
+    return classificar
+
+
 def painel_esferas(request):
     disciplina_id = request.GET.get('disciplina')
     serie_id = request.GET.get('serie')
 
-    disciplina = None
-    serie = None
-    if disciplina_id:
-        try:
-            disciplina = Disciplina.objects.get(pk=disciplina_id)
-        except Disciplina.DoesNotExist:
-            pass
-    if serie_id:
-        try:
-            serie = Serie.objects.get(pk=serie_id)
-        except Serie.DoesNotExist:
-            pass
+    # Dimensões vêm do cache: nenhuma query para montar filtros e contagens
+    todas_disciplinas = dimensoes.disciplinas()
+    todas_series = dimensoes.series()
+    esferas = dimensoes.esferas()
+
+    disciplina = next((d for d in todas_disciplinas if str(d.pk) == disciplina_id), None)
+    serie = next((s for s in todas_series if str(s.pk) == serie_id), None)
 
     if not disciplina:
-        disciplina = Disciplina.objects.first()
+        disciplina = todas_disciplinas[0] if todas_disciplinas else None
     if not serie:
-        serie = Serie.objects.first()
+        serie = todas_series[0] if todas_series else None
 
     # Garante que temos disciplina e série para continuar
     if not disciplina or not serie:
         context = {
-            'todas_disciplinas': Disciplina.objects.all(),
-            'todas_series': Serie.objects.all(),
+            'todas_disciplinas': todas_disciplinas,
+            'todas_series': todas_series,
             'disciplina': None,
             'serie': None,
             'anos': [], 'esferas': [], 'matriz': {},
@@ -1393,77 +1666,59 @@ def painel_esferas(request):
         }
         return render(request, 'dashboard/painel_esferas.html', context)
 
+    # Única leitura da tabela de fatos: o recorte disciplina/série inteiro
+    desempenhos = list(
+        DesempenhoEsfera.objects.filter(
+            disciplina=disciplina,
+            serie=serie
+        ).order_by('ano')
+    )
 
-    desempenhos = DesempenhoEsfera.objects.filter(
-        disciplina=disciplina,
-        serie=serie
-    ).select_related('esfera').order_by('ano', 'esfera__nome')
+    classificar = classificador_nivel(disciplina.nome, serie.nome)
+    esferas_por_id = {e.id: e for e in esferas}
 
-    anos = sorted(set(d.ano for d in desempenhos))
-    esferas = Esfera.objects.all().order_by('nome')
+    anos = sorted({d.ano for d in desempenhos})
 
     # Matriz: [esfera][ano] = desempenho ou None
     # Já enriquecemos cada desempenho com o padrão SAEB
-    matriz = {}
-    for esfera in esferas:
-        matriz[esfera.id] = {ano: None for ano in anos}
+    matriz = {esfera.id: {ano: None for ano in anos} for esfera in esferas}
 
     for d in desempenhos:
-        d.padrao_saeb = classificar_nivel(
-            disciplina.nome,
-            serie.nome,
-            d.proficiencia_media
-        )
-        matriz[d.esfera_id][d.ano] = d
-
-    total_esferas = Esfera.objects.count()
-    total_desempenhos = DesempenhoEsfera.objects.count()
-    anos_disponiveis = (
-        DesempenhoEsfera.objects
-        .values_list('ano', flat=True)
-        .distinct()
-        .order_by('-ano')
-    )
-    ultimo_ano = anos_disponiveis.first() if anos_disponiveis else None
-
-    ranking = []
-    if ultimo_ano:
-        desempenhos_ranking = DesempenhoEsfera.objects.filter(
-            ano=ultimo_ano,
-            disciplina=disciplina,
-            serie=serie
-        ).select_related('esfera').order_by('-proficiencia_media')[:10]
-
-        for item in desempenhos_ranking:
-            item.soma_ab = item.abaixo_basico + item.basico
-            item.soma_aa = item.adequado + item.avancado
-            item.padrao_saeb = classificar_nivel(
-                disciplina.nome,
-                serie.nome,
-                item.proficiencia_media
-            )
-            ranking.append(item)
-
-    evolucao = DesempenhoEsfera.objects.filter(
-        disciplina=disciplina,
-        serie=serie
-    ).values('ano').annotate(
-        media_proficiencia=Avg('proficiencia_media'),
-        total_avaliados=Sum('alunos_avaliados')
-    ).order_by('ano')
+        if d.esfera_id in esferas_por_id:
+            d.esfera = esferas_por_id[d.esfera_id]
+        d.padrao_saeb = classificar(d.proficiencia_media)
+        matriz.setdefault(d.esfera_id, {ano: None for ano in anos})[d.ano] = d
+
+    anos_disponiveis = dimensoes.anos_esfera()
+    ultimo_ano = anos_disponiveis[0] if anos_disponiveis else None
+
+    ranking = sorted(
+        (d for d in desempenhos if d.ano == ultimo_ano),
+        key=lambda d: d.proficiencia_media,
+        reverse=True
+    )[:10]
+    for item in ranking:
+        item.soma_ab = item.abaixo_basico + item.basico
+        item.soma_aa = item.adequado + item.avancado
+
+    # Evolução: média e total de avaliados por ano, no mesmo recorte
+    por_ano = {}
+    for d in desempenhos:
+        ponto = por_ano.setdefault(d.ano, {'soma': 0, 'n': 0, 'avaliados': 0})
+        ponto['soma'] += d.proficiencia_media
+        ponto['n'] += 1
+        ponto['avaliados'] += d.alunos_avaliados
 
-    # Classifica também cada ponto da evolução
     evolucao_com_padrao = []
-    for ponto in evolucao:
-        ponto['padrao_saeb'] = classificar_nivel(
-            disciplina.nome,
-            serie.nome,
-            ponto['media_proficiencia']
-        )
-        evolucao_com_padrao.append(ponto)
-
-    todas_disciplinas = Disciplina.objects.all()
-    todas_series = Serie.objects.all()
+    for ano in anos:
+        ponto = por_ano[ano]
+        media = ponto['soma'] / ponto['n']
+        evolucao_com_padrao.append({
+            'ano': ano,
+            'media_proficiencia': media,
+            'total_avaliados': ponto['avaliados'],
+            'padrao_saeb': classificar(media),
+        })
 
     context = {
         'disciplina': disciplina,
@@ -1473,8 +1728,8 @@ def painel_esferas(request):
         'anos': anos,
         'esferas': esferas,
         'matriz': matriz,
-        'total_esferas': total_esferas,
-        'total_desempenhos': total_desempenhos,
+        'total_esferas': len(esferas),
+        'total_desempenhos': dimensoes.total_desempenhos_esfera(),
         'ultimo_ano': ultimo_ano,
         'ranking': ranking,
         'evolucao': evolucao_com_padrao,
@@ -1632,12 +1887,9 @@ def painel_comparativo_geral(request, municipio_id=None):
     # analise das habilidades por esfera - 04_03_2026
 
 from django.shortcuts import render, get_object_or_404
-from django.db.models import Avg
-from .models import ResultHab, Hab, Esfera, Serie, Disciplina
+from .models import ResultadoHabEscola, Hab, Esfera, Serie, Disciplina
+
 
-from django.shortcuts import render, get_object_or_404
-from .models import ResultHab, Hab, Esfera
-from django.db.models import Prefetch
 def comparativo_habilidades(request):
     # Filtros
     esfera_id = request.GET.get('esfera')
@@ -1649,20 +1901,18 @@ def comparativo_habilidades(request):
     if esfera_id:
         esfera = get_object_or_404(Esfera, id=esfera_id)
     
-    # Base queryset para resultados
-    resultados_base = ResultHab.objects.all()
+    # Base queryset para resultados (linhas de esfera da tabela fato única)
+    resultados_base = ResultadoHabEscola.objects.filter(nivel=ResultadoHabEscola.NIVEL_ESFERA)
     if esfera:
         resultados_base = resultados_base.filter(esfera=esfera)
     
     # Lista de anos disponíveis (baseada nos filtros aplicados)
-    anos = []
-    if resultados_base.exists():
-        anos = (
-            resultados_base
-            .values_list('ano', flat=True)
-            .distinct()
-            .order_by('ano')
-        )
+    anos = list(
+        resultados_base
+        .values_list('ano', flat=True)
+        .distinct()
+        .order_by('ano')
+    )
     
     # Base queryset para habilidades
     habilidades_base = Hab.objects.all()
@@ -1686,7 +1936,7 @@ def comparativo_habilidades(request):
     )
     
     # Listas para os selects do filtro
-    esferas = Esfera.objects.all().order_by('nome')
+    esferas = dimensoes.esferas()
     
     # Séries disponíveis (baseado na esfera selecionada)
     series = Serie.objects.all()
@@ -1713,29 +1963,25 @@ def comparativo_habilidades(request):
     dados_grafico = []
     
     if esfera and anos:
+        # Todas as taxas da esfera em uma leitura: (hab_id, ano) -> tx_acerto
+        taxas = {
+            (hab_id, ano): tx / ResultadoHabEscola.ESCALA_TX
+            for hab_id, ano, tx in resultados_base.values_list('hab_id', 'ano', 'tx_acerto')
+            if tx is not None
+        }
+
         for hab in habilidades:
             linha = {
                 'serie': hab.serie.nome,
                 'disciplina': hab.disciplina.nome,
                 'codigo': hab.cd_hab,
                 'descricao': hab.dc_hab,
-                'anos': []
+                'anos': [
+                    {'ano': ano, 'tx_acerto': taxas.get((hab.id, ano))}
+                    for ano in anos
+                ]
             }
             
-            for ano in anos:
-                resultado = ResultHab.objects.filter(
-                    esfera=esfera,
-                    hab=hab,
-                    ano=ano
-                ).first()
-                
-                tx_acerto = float(resultado.tx_acerto) if resultado and resultado.tx_acerto is not None else None
-                
-                linha['anos'].append({
-                    'ano': ano,
-                    'tx_acerto': tx_acerto
-                })
-            
             tabela.append(linha)
             
             # Dados para gráfico
@@ -1747,9 +1993,6 @@ def comparativo_habilidades(request):
             }
             dados_grafico.append(linha_grafico)
     
-    # Converter anos para lista
-    anos_list = list(anos)
-    
     context = {
         'esferas': esferas,
         'series': series,
@@ -1757,7 +2000,7 @@ def comparativo_habilidades(request):
         'esfera_selecionada': esfera,
         'serie_selecionada': int(serie_id) if serie_id else None,
         'disciplina_selecionada': int(disciplina_id) if disciplina_id else None,
-        'anos': anos_list,
+        'anos': anos,
         'tabela': tabela,
         'dados_grafico': dados_grafico
     }
@@ -1777,62 +2020,128 @@ from django.shortcuts import render
 from .models import DesempenhoEscola, Serie, Disciplina
 
 
-def dashboard_desempenho(request):
-
-    ano = request.GET.get("ano")
-    serie = request.GET.get("serie")
-    disciplina = request.GET.get("disciplina")
-
-    dados = DesempenhoEscola.objects.all()
+def _resumo_desempenho(ano=None, serie=None, disciplina=None):
+    """
+    Agrega DesempenhoEscola por (série, disciplina) em uma única query.
 
+    Os alunos seguem a mesma regra de comparacao_anos: conta-se o MAX de
+    alunos avaliados por (escola, série, ano), para não somar o mesmo aluno
+    uma vez por disciplina. As janelas marcam a primeira linha de cada
+    (escola, série, ano), (escola, série) e escola, de modo que as somas de
+    cada grupo possam ser consolidadas por série e no total sem nova query.
+    """
+    filtros = []
+    params = []
     if ano:
-        dados = dados.filter(ano=ano)
-
+        filtros.append('d.ano = %s')
+        params.append(int(ano))
     if serie:
-        dados = dados.filter(serie_id=serie)
-
+        filtros.append('d.serie_id = %s')
+        params.append(int(serie))
     if disciplina:
-        dados = dados.filter(disciplina_id=disciplina)
+        filtros.append('d.disciplina_id = %s')
+        params.append(int(disciplina))
+    where = f"WHERE {' AND '.join(filtros)}" if filtros else ''
+
+    sql = f"""
+        WITH base AS (
+            SELECT
+                d.serie_id, d.disciplina_id, d.escola_id,
+                d.proficiencia_media, d.alunos_avaliados,
+                ROW_NUMBER() OVER (
+                    PARTITION BY d.escola_id, d.serie_id, d.ano
+                    ORDER BY d.alunos_avaliados DESC
+                ) AS rn_alunos,
+                ROW_NUMBER() OVER (PARTITION BY d.escola_id, d.serie_id ORDER BY d.id) AS rn_escola_serie,
+                ROW_NUMBER() OVER (PARTITION BY d.escola_id ORDER BY d.id) AS rn_escola
+            FROM {DesempenhoEscola._meta.db_table} d
+            {where}
+        )
+        SELECT
+            b.serie_id, s.nome, b.disciplina_id, di.nome,
+            SUM(b.proficiencia_media),
+            COUNT(*),
+            COUNT(DISTINCT b.escola_id),
+            SUM(CASE WHEN b.rn_alunos = 1 THEN b.alunos_avaliados ELSE 0 END),
+            SUM(CASE WHEN b.rn_escola_serie = 1 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN b.rn_escola = 1 THEN 1 ELSE 0 END)
+        FROM base b
+        JOIN {Serie._meta.db_table} s ON s.id = b.serie_id
+        JOIN {Disciplina._meta.db_table} di ON di.id = b.disciplina_id
+        GROUP BY b.serie_id, s.nome, b.disciplina_id, di.nome
+        ORDER BY b.serie_id, b.disciplina_id
+    """
+    with connections[banco_leitura()].cursor() as cursor:
+        cursor.execute(sql, params)
+        return [
+            {
+                'serie_id': r[0], 'serie': r[1],
+                'disciplina_id': r[2], 'disciplina': r[3],
+                'soma_prof': float(r[4] or 0), 'linhas': r[5],
+                'escolas': r[6], 'alunos': int(r[7] or 0),
+                'escolas_serie': int(r[8] or 0), 'escolas_total': int(r[9] or 0),
+            }
+            for r in cursor.fetchall()
+        ]
 
-    # indicadores
-    media = dados.aggregate(
-        m=Avg("proficiencia_media")
-    )["m"] or 0
 
-    total_escolas = dados.values("escola").distinct().count()
+def dashboard_desempenho(request):
 
-    total_alunos = dados.aggregate(
-        t=Avg("alunos_avaliados")
-    )["t"] or 0
+    ano = request.GET.get("ano")
+    serie = request.GET.get("serie")
+    disciplina = request.GET.get("disciplina")
 
+    grupos = _resumo_desempenho(ano, serie, disciplina)
+
+    # consolida por série (mantendo a quebra por disciplina)
+    por_serie = {}
+    colunas_disciplina = []
+    for g in grupos:
+        if g['disciplina'] not in colunas_disciplina:
+            colunas_disciplina.append(g['disciplina'])
+
+        bloco = por_serie.setdefault(g['serie_id'], {
+            'serie': g['serie'],
+            'soma_prof': 0.0,
+            'linhas': 0,
+            'escolas': 0,
+            'alunos': 0,
+            'disciplinas': {},
+        })
+        bloco['soma_prof'] += g['soma_prof']
+        bloco['linhas'] += g['linhas']
+        bloco['escolas'] += g['escolas_serie']
+        bloco['alunos'] += g['alunos']
+        bloco['disciplinas'][g['disciplina']] = {
+            'valor': round(g['soma_prof'] / g['linhas'], 1) if g['linhas'] else None,
+            'escolas': g['escolas'],
+        }
+
+    # indicadores
+    total_linhas = sum(g['linhas'] for g in grupos)
+    media = sum(g['soma_prof'] for g in grupos) / total_linhas if total_linhas else 0
+    total_escolas = sum(g['escolas_total'] for g in grupos)
+    total_alunos = sum(g['alunos'] for g in grupos)
 
-    # gráfico por série
+    # gráfico e tabela por série
     labels = []
     valores = []
-
-    for s in Serie.objects.all():
-
-        valor = dados.filter(
-            serie=s
-        ).aggregate(
-            v=Avg("proficiencia_media")
-        )["v"]
-
-        if valor is not None:
-
-            labels.append(s.nome)
-
-            valores.append(float(valor))   # ← CORREÇÃO
-
-
-    # tabela
     tabela = []
 
-    for i in range(len(labels)):
+    for bloco in por_serie.values():
+        valor = bloco['soma_prof'] / bloco['linhas']
+
+        labels.append(bloco['serie'])
+        valores.append(valor)
 
         tabela.append({
-            "serie": labels[i],
-            "valor": round(valores[i],1)
+            "serie": bloco['serie'],
+            "valor": round(valor, 1),
+            "escolas": bloco['escolas'],
+            "alunos": bloco['alunos'],
+            "disciplinas": [
+                bloco['disciplinas'].get(nome) for nome in colunas_disciplina
+            ],
         })
 
 
@@ -1842,14 +2151,12 @@ def dashboard_desempenho(request):
         "valores": json.dumps(valores),
 
         "tabela": tabela,
+        "colunas_disciplina": colunas_disciplina,
 
-        "anos": DesempenhoEscola.objects.values_list(
-            "ano",
-            flat=True
-        ).distinct(),
+        "anos": dimensoes.anos_desempenho(),
 
-        "series": Serie.objects.all(),
-        "disciplinas": Disciplina.objects.all(),
+        "series": dimensoes.series(),
+        "disciplinas": dimensoes.disciplinas(),
 
         "media": round(float(media),1),
         "total_escolas": total_escolas,
@@ -1880,7 +2187,7 @@ def dashboard_desempenho(request):
 from django.db.models import Avg, Count, Q
 from django.views.generic import TemplateView
 from .models import (
-    ResultadoHabEscola, DesempenhoEscola,
+    ResultadoHabEscola, DesempenhoEscola, Escola, Hab, EstatisticaHabilidade,
     Localidade, Serie, Disciplina
 )
 
@@ -1901,15 +2208,10 @@ class ComparativoLocalidadeView(TemplateView):
         limiar        = float(self.request.GET.get('limiar', LIMIAR_PADRAO))
 
         # ── Opções para o formulário ──────────────────────────────────────
-        context['anos'] = (
-            ResultadoHabEscola.objects
-            .values_list('ano', flat=True)
-            .distinct()
-            .order_by('-ano')
-        )
-        context['series']      = Serie.objects.order_by('nome')
-        context['disciplinas'] = Disciplina.objects.order_by('nome')
-        context['localidades'] = Localidade.objects.order_by('nome')
+        context['anos']        = dimensoes.anos_habilidades_escola()
+        context['series']      = sorted(dimensoes.series(), key=lambda s: s.nome)
+        context['disciplinas'] = sorted(dimensoes.disciplinas(), key=lambda d: d.nome)
+        context['localidades'] = dimensoes.localidades()
         context['filtros'] = {
             'ano':           int(ano)           if ano           else None,
             'serie_id':      int(serie_id)      if serie_id      else None,
@@ -1925,123 +2227,78 @@ class ComparativoLocalidadeView(TemplateView):
         context['dados_prontos'] = True
         context['limiar'] = limiar
 
-        # ── Querysets base ────────────────────────────────────────────────
-        filtro_base = dict(ano=ano, serie_id=serie_id, disciplina_id=disciplina_id)
-        filtro_loc  = {'escola__localidade_id': localidade_id} if localidade_id else {}
-
-        # QS de Habilidades: Filtra por ano, série, disciplina, localidade
-        # E EXCLUI QUALQUER REGISTRO ONDE TX_ACERTO SEJA -1
-        qs_hab = ResultadoHabEscola.objects.filter(
-            **filtro_base, **filtro_loc
-        ).exclude(
-            tx_acerto=-1.00 # <--- AQUI ESTÁ A NOVA CONDIÇÃO DE EXCLUSÃO
-        ).select_related('escola', 'escola__localidade', 'hab')
-
-        # Agora, para garantir que uma escola inteira seja removida se *qualquer* de suas habilidades
-        # para o filtro atual tiver -1, precisamos de um passo intermediário.
-        # Primeiro, identificamos as escolas que possuem pelo menos UMA habilidade VÁLIDA (não -1).
-        escolas_com_habs_validas_ids = qs_hab.values_list('escola_id', flat=True).distinct()
-
-        # Filtra o qs_hab novamente para incluir apenas as escolas que têm habilidades válidas
-        qs_hab = qs_hab.filter(escola_id__in=escolas_com_habs_validas_ids)
-
-
-        # QS de Desempenho: Usado para buscar dados adicionais das escolas que JÁ ESTÃO no qs_hab
-        qs_desemp = DesempenhoEscola.objects.filter(
-            escola_id__in=escolas_com_habs_validas_ids, # Filtra pelo ID das escolas que têm habilidades válidas
-            **filtro_base, **filtro_loc
-        ).select_related('escola', 'escola__localidade')
-
-        # ─────────────────────────────────────────────────────────────────
-        # 1. DESEMPENHO POR ESCOLA
-        # ─────────────────────────────────────────────────────────────────
-        desempenho_por_escola = {
-            d.escola_id: d
-            for d in qs_desemp
-        }
-
-        # ─────────────────────────────────────────────────────────────────
-        # 2. ESTATÍSTICAS DE HABILIDADES POR ESCOLA
-        #    Este queryset já garante que só teremos escolas com dados de habilidades válidos
-        # ─────────────────────────────────────────────────────────────────
-        habs_por_escola_qs = (
-            qs_hab
-            .values(
-                'escola__id',
-                'escola__nome',
-                'escola__bairrodistrito',
-                'escola__localidade__id',
-                'escola__localidade__nome',
-            )
-            .annotate(
-                media_habs=Avg('tx_acerto'),
-                total_habs=Count('hab', distinct=True),
-                habs_baixo=Count(
-                    'hab',
-                    filter=Q(tx_acerto__lt=limiar),
-                    distinct=True
-                ),
-            )
-            .order_by('escola__localidade__nome', 'escola__nome')
+        # ── Uma única instrução SQL ───────────────────────────────────────
+        # A CTE `base` lê ResultadoHabEscola uma vez (o PostgreSQL materializa
+        # CTEs referenciadas mais de uma vez); os três ramos do UNION ALL
+        # devolvem, juntos, as estatísticas por escola (já com o
+        # DesempenhoEscola correspondente), por habilidade e o detalhe das
+        # habilidades abaixo do limiar.
+        #
+        # As estatísticas por habilidade vêm de EstatisticaHabilidade (lookup
+        # indexado, com o limiar respondido pelo histograma); o ramo 'hab' da
+        # CTE só é usado enquanto a tabela não foi calculada para o filtro.
+        estatisticas = self._estatisticas(ano, serie_id, disciplina_id, localidade_id, limiar)
+        linhas = self._consultar(
+            ano, serie_id, disciplina_id, localidade_id, limiar,
+            incluir_habs=not estatisticas
         )
 
+        escolas_rows = [l for l in linhas if l[0] == 'escola']
+        habs_rows    = estatisticas or [l for l in linhas if l[0] == 'hab']
+        baixas_rows  = [l for l in linhas if l[0] == 'baixa']
+
         # ─────────────────────────────────────────────────────────────────
-        # 3. MONTA ESTRUTURA POR LOCALIDADE
-        #    Popula apenas com as escolas que estão em habs_por_escola_qs
+        # 1. ESTRUTURA POR LOCALIDADE (escolas + totais consolidados)
         # ─────────────────────────────────────────────────────────────────
+        escolas_rows.sort(key=lambda l: (l[9] or '', l[6] or ''))
         por_localidade = {}
 
-        for row in habs_por_escola_qs:
-            escola_id = row['escola__id']
-            loc_nome  = row['escola__localidade__nome'] or 'Sem Localidade'
-
-            desemp = desempenho_por_escola.get(escola_id) # Pode ser None se não houver DesempenhoEscola para essa escola/filtro
+        for (_, escola_id, _, media_habs, total_habs, habs_baixo, nome, bairro, _, loc_nome,
+             previstos, avaliados, perc, taxa, profic, ab, ba, ad, av, variacao, posicao, meta) in escolas_rows:
+            loc_nome = loc_nome or 'Sem Localidade'
 
             escola_data = {
                 'id':    escola_id,
-                'nome':  row['escola__nome'],
-                'bairro': row['escola__bairrodistrito'],
+                'nome':  nome,
+                'bairro': bairro,
 
-                # Participação
-                'alunos_previstos':  desemp.alunos_previstos     if desemp else None,
-                'alunos_avaliados':  desemp.alunos_avaliados     if desemp else None,
-                'perc_avaliados':    desemp.percentual_avaliados if desemp else None,
-                'taxa_participacao': desemp.taxa_participacao    if desemp else None,
+                # Participação (None se não houver DesempenhoEscola para o filtro)
+                'alunos_previstos':  previstos,
+                'alunos_avaliados':  avaliados,
+                'perc_avaliados':    perc,
+                'taxa_participacao': taxa,
 
                 # Proficiência e níveis
-                'proficiencia_media': desemp.proficiencia_media    if desemp else None,
-                'abaixo_basico':      desemp.abaixo_basico         if desemp else None,
-                'basico':             desemp.basico                if desemp else None,
-                'adequado':           desemp.adequado              if desemp else None,
-                'avancado':           desemp.avancado              if desemp else None,
-                'variacao':           desemp.variacao_ano_anterior if desemp else None,
-                'posicao_municipio':  desemp.posicao_municipio     if desemp else None,
-                'meta':               desemp.meta_estabelecida     if desemp else None,
+                'proficiencia_media': profic,
+                'abaixo_basico':      ab,
+                'basico':             ba,
+                'adequado':           ad,
+                'avancado':           av,
+                'variacao':           variacao,
+                'posicao_municipio':  posicao,
+                'meta':               meta,
 
                 # Habilidades SaBE
-                'media_habs': row['media_habs'],
-                'total_habs': row['total_habs'],
-                'habs_baixo': row['habs_baixo'],
+                'media_habs': media_habs,
+                'total_habs': total_habs,
+                'habs_baixo': habs_baixo,
             }
 
-            por_localidade.setdefault(loc_nome, {
+            bloco = por_localidade.setdefault(loc_nome, {
                 'escolas':        [],
                 '_sum_previstos':  0,
                 '_sum_avaliados':  0,
                 '_sum_profic':     [],
                 '_sum_media_habs': [],
             })
-
-            bloco = por_localidade[loc_nome]
             bloco['escolas'].append(escola_data)
 
-            if desemp: # Só soma se houver dados de desempenho
-                bloco['_sum_previstos'] += desemp.alunos_previstos or 0
-                bloco['_sum_avaliados'] += desemp.alunos_avaliados or 0
-                if desemp.proficiencia_media is not None:
-                    bloco['_sum_profic'].append(float(desemp.proficiencia_media))
-            if row['media_habs'] is not None: # Só soma se houver média de habilidades
-                bloco['_sum_media_habs'].append(float(row['media_habs']))
+            bloco['_sum_previstos'] += previstos or 0
+            bloco['_sum_avaliados'] += avaliados or 0
+            if profic is not None:
+                bloco['_sum_profic'].append(float(profic))
+            if media_habs is not None:
+                bloco['_sum_media_habs'].append(float(media_habs))
 
         # Totais consolidados por localidade
         for loc_nome, bloco in por_localidade.items():
@@ -2066,48 +2323,145 @@ class ComparativoLocalidadeView(TemplateView):
         context['por_localidade'] = dict(sorted(por_localidade.items()))
 
         # ─────────────────────────────────────────────────────────────────
-        # 4. HABILIDADES COM BAIXO DESEMPENHO — VISÃO GERAL DA REDE
+        # 2. HABILIDADES COM BAIXO DESEMPENHO — VISÃO GERAL DA REDE
         # ─────────────────────────────────────────────────────────────────
-        habs_rede = list(
-            qs_hab # Usa o qs_hab já filtrado
-            .values('hab__cd_hab', 'hab__dc_hab')
-            .annotate(
-                media_rede=Avg('tx_acerto'),
-                escolas_baixo=Count(
-                    'escola',
-                    filter=Q(tx_acerto__lt=limiar),
-                    distinct=True
-                ),
-                total_escolas=Count('escola', distinct=True),
-            )
-            .order_by('media_rede')
+        habs_rede = sorted(
+            (
+                {
+                    'hab__cd_hab':   cd_hab,
+                    'hab__dc_hab':   dc_hab,
+                    'media_rede':    media,
+                    'escolas_baixo': baixo,
+                    'total_escolas': total,
+                }
+                for _, _, _, media, total, baixo, cd_hab, dc_hab, *_ in habs_rows
+            ),
+            key=lambda h: h['media_rede']
         )
+        descricoes = {l[2]: (l[6], l[7]) for l in habs_rows}
 
         context['habs_rede']       = habs_rede
         context['habs_baixo_rede'] = [h for h in habs_rede if h['media_rede'] < limiar]
 
         # ─────────────────────────────────────────────────────────────────
-        # 5. HABILIDADES BAIXAS DETALHADAS POR ESCOLA (collapse)
+        # 3. HABILIDADES BAIXAS DETALHADAS POR ESCOLA (collapse)
         # ─────────────────────────────────────────────────────────────────
-        habs_baixas_detalhe = (
-            qs_hab # Usa o qs_hab já filtrado
-            .filter(tx_acerto__lt=limiar)
-            .values(
-                'escola__id',
-                'hab__cd_hab',
-                'hab__dc_hab',
-                'tx_acerto',
-            )
-            .order_by('escola__id', 'tx_acerto')
-        )
-
         habs_baixo_por_escola = {}
-        for row in habs_baixas_detalhe:
-            eid = row['escola__id']
-            habs_baixo_por_escola.setdefault(eid, []).append(row)
+        for _, eid, hab_id, tx_acerto, *_ in sorted(baixas_rows, key=lambda l: (l[1], l[3])):
+            cd_hab, dc_hab = descricoes.get(hab_id, ('', ''))
+            habs_baixo_por_escola.setdefault(eid, []).append({
+                'escola__id':  eid,
+                'hab__cd_hab': cd_hab,
+                'hab__dc_hab': dc_hab,
+                'tx_acerto':   tx_acerto,
+            })
 
         context['habs_baixo_por_escola'] = habs_baixo_por_escola
 
         return context
 
+    def _estatisticas(self, ano, serie_id, disciplina_id, localidade_id, limiar):
+        """Linhas 'hab' montadas a partir de EstatisticaHabilidade (vazio se não calculada)."""
+        filtro = dict(ano=ano, serie_id=serie_id, disciplina_id=disciplina_id)
+        if localidade_id:
+            filtro.update(nivel=EstatisticaHabilidade.NIVEL_LOCALIDADE, localidade_id=localidade_id)
+        else:
+            filtro.update(nivel=EstatisticaHabilidade.NIVEL_REDE)
+
+        return [
+            ('hab', None, e.hab_id, e.media, e.total_escolas, e.escolas_abaixo(limiar),
+             e.hab.cd_hab, e.hab.dc_hab)
+            for e in EstatisticaHabilidade.objects.filter(**filtro).select_related('hab')
+        ]
+
+    def _consultar(self, ano, serie_id, disciplina_id, localidade_id, limiar, incluir_habs=True):
+        """
+        Executa a CTE e devolve linhas marcadas pelo primeiro campo:
+        'escola', 'hab' ou 'baixa'. Todas têm 22 colunas (as que não se
+        aplicam ao tipo vêm NULL). Com incluir_habs=False o ramo 'hab' é
+        omitido.
+        """
+        res   = ResultadoHabEscola._meta.db_table
+        esc   = Escola._meta.db_table
+        loc   = Localidade._meta.db_table
+        hab   = Hab._meta.db_table
+        desp  = DesempenhoEscola._meta.db_table
+        nulos = ', '.join(['NULL'] * 12)
+        # tx_acerto está em pontos-base: o limiar é convertido na entrada e
+        # as médias/taxas voltam em percentual na projeção
+        escala = f'{ResultadoHabEscola.ESCALA_TX}.0'
+        limiar = ResultadoHabEscola.para_pontos_base(limiar)
+
+        filtro_loc = ''
+        params_base = [int(ano), int(serie_id), int(disciplina_id)]
+        if localidade_id:
+            filtro_loc = f'AND r.escola_id IN (SELECT id FROM {esc} WHERE localidade_id = %s)'
+            params_base.append(int(localidade_id))
+
+        ramo_habs = ''
+        params_habs = []
+        if incluir_habs:
+            ramo_habs = f"""SELECT 'hab', NULL, a.hab_id, a.media, a.total, a.baixo,
+                   h.cd_hab, h.dc_hab, NULL, NULL, {nulos}
+            FROM (
+                SELECT hab_id,
+                       AVG(tx_acerto) / {escala} AS media,
+                       COUNT(DISTINCT escola_id) AS total,
+                       COUNT(DISTINCT CASE WHEN tx_acerto < %s THEN escola_id END) AS baixo
+                FROM base
+                GROUP BY hab_id
+            ) a
+            JOIN {hab} h ON h.id = a.hab_id
+
+            UNION ALL
+
+            """
+            params_habs = [limiar]
+
+        sql = f"""
+            WITH base AS (
+                SELECT r.escola_id, r.hab_id, r.tx_acerto
+                FROM {res} r
+                WHERE r.ano = %s AND r.serie_id = %s AND r.disciplina_id = %s
+                  AND r.nivel = 'escola'
+                  AND r.tx_acerto IS NOT NULL
+                  {filtro_loc}
+            )
+            SELECT 'escola', a.escola_id, NULL, a.media, a.total, a.baixo,
+                   e.nome, e.bairrodistrito, e.localidade_id, l.nome,
+                   d.alunos_previstos, d.alunos_avaliados, d.percentual_avaliados,
+                   d.taxa_participacao, d.proficiencia_media,
+                   d.abaixo_basico, d.basico, d.adequado, d.avancado,
+                   d.variacao_ano_anterior, d.posicao_municipio, d.meta_estabelecida
+            FROM (
+                SELECT escola_id,
+                       AVG(tx_acerto) / {escala} AS media,
+                       COUNT(DISTINCT hab_id) AS total,
+                       COUNT(DISTINCT CASE WHEN tx_acerto < %s THEN hab_id END) AS baixo
+                FROM base
+                GROUP BY escola_id
+            ) a
+            JOIN {esc} e ON e.id = a.escola_id
+            LEFT JOIN {loc} l ON l.id = e.localidade_id
+            LEFT JOIN {desp} d
+                   ON d.escola_id = a.escola_id
+                  AND d.ano = %s AND d.serie_id = %s AND d.disciplina_id = %s
+
+            UNION ALL
+
+            {ramo_habs}SELECT 'baixa', escola_id, hab_id,
+                   (tx_acerto / {escala})::numeric(5, 2), NULL, NULL,
+                   NULL, NULL, NULL, NULL, {nulos}
+            FROM base
+            WHERE tx_acerto < %s
+        """
+        params = params_base + [
+            limiar, int(ano), int(serie_id), int(disciplina_id),
+            *params_habs,
+            limiar,
+        ]
+        with connections[banco_leitura()].cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
 